@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口动作状态机
+功能：避免同一个按钮被反复触发整套"激活-粘贴-点击-最小化"流程
+每个窗口的动作按 idle -> sending -> awaiting_confirmation -> cooldown -> idle 推进：
+- idle: 检测到需要操作的状态时开始发送
+- sending: 正在执行动作，期间同一窗口的命中被忽略
+- awaiting_confirmation: 动作完成后继续检测，按钮消失即确认成功；确认期内按钮仍然存在（例如多停留一帧）不会重复发送
+- cooldown: 确认成功后的冷却期，或发送失败、确认超时后的重试等待（指数退避），
+  重试次数用完后放弃一段时间，冷却期内不检测该窗口
+各状态之间的转换次数和停留时间记录到 MetricsRegistry；
+确认结果明确的命中分数交给阈值校准器：发送后按钮消失记为"确认存在"，
+发送前在同一位置出现过的近似命中（略低于阈值）也记为"确认存在"；
+文本确实粘贴到了输入框、点击发送后按钮却没有消失的命中记为"确认不存在"（误触发）
+"""
+
+import logging
+import threading
+import time
+
+from metrics import NULL_METRICS
+
+log = logging.getLogger(__name__)
+
+IDLE = 'idle'
+SENDING = 'sending'
+AWAITING_CONFIRMATION = 'awaiting_confirmation'
+COOLDOWN = 'cooldown'
+
+
+class ActionState:
+    """
+    单个窗口的动作状态，保存在 WindowState.action 中，由 ActionGuard 修改
+    """
+
+    def __init__(self):
+        self.phase = IDLE
+        # 进入当前状态的时间（time.monotonic()）
+        self.since = time.monotonic()
+        # 等待确认的截止时间
+        self.deadline = 0.0
+        # 正在发送或等待确认的状态名称、命中时的匹配分数、命中区域和开始发送的时间
+        self.name = None
+        self.score = None
+        self.box = None
+        self.started = 0.0
+        # 动作是否已被验证生效（例如粘贴后输入框发生了变化），只有验证过的发送未生效才说明命中是误触发
+        self.verified = False
+        # 连续未确认成功的次数
+        self.failures = 0
+
+
+class ActionGuard:
+    """
+    各窗口动作状态的转换规则（线程安全）
+
+    Args:
+        cooldown: 确认发送成功后的冷却时间（秒）
+        confirm_timeout: 发送后等待按钮消失的时间（秒），超过后视为发送未生效
+        max_retries: 发送未生效后最多重试的次数，用完后等待 backoff_max 秒再重新开始
+        backoff_base: 第一次重试前的等待时间（秒）
+        backoff_factor: 每次重试等待时间的放大倍数
+        backoff_max: 重试等待时间的上限（秒）
+        metrics: 记录转换次数和各状态停留时间的 MetricsRegistry
+        calibrator: 记录确认结果的 ThresholdCalibrator，为 None 时不记录
+        near_miss_window: 发送前多长时间内（秒）的近似命中在发送确认后记为确认存在
+    """
+
+    def __init__(self, cooldown=10.0, confirm_timeout=3.0, max_retries=2, backoff_base=5.0,
+                 backoff_factor=2.0, backoff_max=120.0, metrics=NULL_METRICS, calibrator=None,
+                 near_miss_window=30.0):
+        self.configure(cooldown, confirm_timeout, max_retries, backoff_base, backoff_factor, backoff_max)
+        self.metrics = metrics
+        self.calibrator = calibrator
+        self.near_miss_window = near_miss_window
+        self._lock = threading.Lock()
+
+        # 统计计数
+        self.transitions = {}
+        self.confirmed = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.suppressed = 0
+
+    def configure(self, cooldown, confirm_timeout, max_retries, backoff_base, backoff_factor, backoff_max):
+        """
+        更新转换规则，正在进行中的冷却期和确认期不受影响
+        """
+        self.cooldown = cooldown
+        self.confirm_timeout = confirm_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_factor = max(1.0, backoff_factor)
+        self.backoff_max = max(backoff_base, backoff_max)
+
+    def _transition(self, state, phase, now):
+        action = state.action
+        self.metrics.observe('action_' + action.phase, now - action.since)
+        self.metrics.inc('action_transitions', source=action.phase, target=phase)
+        key = f"{action.phase}->{phase}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        log.debug("窗口 %s 动作状态: %s -> %s", state.title, action.phase, phase)
+        action.phase = phase
+        action.since = now
+
+    def _fail(self, state, now, reason):
+        """
+        发送失败或未生效：按失败次数指数退避后重试，重试次数用完后放弃一段时间
+        """
+        action = state.action
+        action.failures += 1
+        if action.failures > self.max_retries:
+            self.gave_up += 1
+            self.metrics.inc('action_gave_up')
+            log.error("❌ %s，已重试 %s 次仍未生效，%.0f 秒内不再发送 (%s)",
+                      reason, self.max_retries, self.backoff_max, state.title)
+            delay = self.backoff_max
+            action.failures = 0
+        else:
+            self.retries += 1
+            self.metrics.inc('action_retries')
+            delay = min(self.backoff_max, self.backoff_base * self.backoff_factor ** (action.failures - 1))
+            log.warning("⚠️  %s，%.1f 秒后第 %s 次重试 (%s)", reason, delay, action.failures, state.title)
+        state.start_cooldown(delay)
+        self._transition(state, COOLDOWN, now)
+
+    def _record(self, samples):
+        """
+        把确认结果 [(状态名称, 分数, 是否存在), ...] 交给阈值校准器（在锁外调用，校准器可能写文件）
+        """
+        if self.calibrator is None:
+            return
+        for name, score, present in samples:
+            if score is not None:
+                self.calibrator.record(name, score, present)
+
+    def refresh(self, state, now=None):
+        """
+        冷却期结束后回到 idle，在规划搜索区域前调用
+        等待确认的窗口保持原状态，直到下一次检测到该窗口（例如窗口被最小化期间）
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if state.action.phase == COOLDOWN and not state.in_cooldown(now):
+                self._transition(state, IDLE, now)
+
+    def observe(self, state, hit, now=None):
+        """
+        用一次检测结果推进窗口的动作状态
+        Args:
+            hit: 本次检测到的需要操作的命中，没有时为 None
+        返回: 是否应该对该命中执行动作
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            trigger, samples, confirmed = self._observe(state, hit, now)
+        if confirmed is not None and self.calibrator is not None:
+            # 发送前同一位置略低于阈值的匹配也是这个按钮
+            name, box, started = confirmed
+            near = state.take_near_misses(name, box, started - self.near_miss_window, started)
+            samples.extend((name, score, True) for score in near)
+        self._record(samples)
+        return trigger
+
+    def _observe(self, state, hit, now):
+        """
+        返回: (是否触发, 校准样本 [(状态名称, 分数, 是否存在), ...], 确认成功时为 (状态名称, 命中区域, 开始发送的时间))
+        """
+        action = state.action
+        if action.phase == IDLE:
+            if hit is None:
+                # 按钮已经消失（例如重试等待期间被用户处理），重新计算失败次数
+                action.failures = 0
+            return hit is not None, [], None
+        if action.phase == AWAITING_CONFIRMATION:
+            if hit is None or hit.name != action.name:
+                self.confirmed += 1
+                self.metrics.inc('action_confirmed')
+                action.failures = 0
+                state.start_cooldown(self.cooldown)
+                self._transition(state, COOLDOWN, now)
+                # 执行动作后按钮消失，说明命中是真实的
+                return False, [(action.name, action.score, True)], (action.name, action.box, action.started)
+            if now >= action.deadline:
+                # 文本已确认粘贴到输入框、点击后按钮仍不消失，说明命中的不是真正的按钮；
+                # 未验证的发送（例如点错了位置）不能说明命中是否真实
+                samples = [(action.name, action.score, False)] if action.verified else []
+                self._fail(state, now, f"发送后状态 {hit.name} 仍然存在")
+                return False, samples, None
+            self.suppressed += 1
+            self.metrics.inc('action_suppressed')
+            return False, [], None
+        # 发送中或冷却中的命中不触发
+        if hit is not None:
+            self.suppressed += 1
+            self.metrics.inc('action_suppressed')
+        return False, [], None
+
+    def begin(self, state, hit, now=None):
+        """
+        开始执行动作（idle -> sending）
+        返回: 是否可以执行，窗口正在发送、等待确认或冷却中时返回 False
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            action = state.action
+            if action.phase == COOLDOWN and not state.in_cooldown(now):
+                self._transition(state, IDLE, now)
+            if action.phase != IDLE:
+                self.suppressed += 1
+                self.metrics.inc('action_suppressed')
+                return False
+            action.name = hit.name
+            action.score = hit.score
+            action.box = hit.box
+            action.started = now
+            action.verified = False
+            self._transition(state, SENDING, now)
+            return True
+
+    def finish(self, state, ok, verified=False, now=None):
+        """
+        动作执行完成：成功时等待检测确认（sending -> awaiting_confirmation），失败时退避后重试
+        Args:
+            verified: 动作是否已被验证生效（例如粘贴后输入框发生了变化）
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if state.action.phase != SENDING:
+                return
+            if ok:
+                state.action.verified = verified
+                state.last_send_time = time.time()
+                state.action.deadline = now + self.confirm_timeout
+                self._transition(state, AWAITING_CONFIRMATION, now)
+            else:
+                # 动作本身失败（例如无法激活窗口）不能说明命中是否真实，不记录校准样本
+                self._fail(state, now, "发送失败")
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'transitions': dict(self.transitions),
+                'confirmed': self.confirmed,
+                'retries': self.retries,
+                'gave_up': self.gave_up,
+                'suppressed': self.suppressed,
+            }
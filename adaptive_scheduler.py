@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应轮询调度器
+功能：替代固定间隔的 time.sleep(monitor_interval)
+- 刚发送消息后、预计AI助手即将停止前、画面正在变化时使用最短间隔快速轮询
+- 长时间无变化时按指数退避逐步拉长间隔
+- 间隔始终保持在配置的最小/最大范围内
+- 统计反应时间和每小时CPU占用，便于权衡调参
+"""
+
+import collections
+import time
+
+# 反应时间统计只保留最近的样本数
+REACTION_WINDOW = 500
+
+
+class AdaptivePollingScheduler:
+    """
+    自适应轮询调度器
+
+    Args:
+        min_interval: 最短轮询间隔（秒）
+        max_interval: 最长轮询间隔（秒）
+        backoff_factor: 无变化时每次间隔放大的倍数
+        fast_ticks_after_send: 发送消息后保持最短间隔的轮询次数
+        pre_stop_lead: 在预计停止时间之前多少秒开始快速轮询
+    """
+
+    def __init__(self, min_interval=2.0, max_interval=30.0, backoff_factor=1.5,
+                 fast_ticks_after_send=3, pre_stop_lead=5.0):
+        self.fast_ticks_after_send = fast_ticks_after_send
+        self.configure(min_interval, max_interval, backoff_factor, pre_stop_lead)
+
+        self.current_interval = self.min_interval
+        self._fast_ticks_left = 0
+        self._last_send_time = None
+        self._button_visible = False
+        self._last_tick_time = None
+
+        # AI助手从发送到停止的典型工作时长（指数移动平均）
+        self.typical_work_duration = None
+
+        # 统计数据
+        self.ticks = 0
+        self.reaction_times = collections.deque(maxlen=REACTION_WINDOW)
+        # 累计测得的反应时间次数（reaction_times 只保留最近的部分）
+        self.reaction_count = 0
+        self._start_wall = time.monotonic()
+        self._start_cpu = time.process_time()
+
+    def configure(self, min_interval, max_interval, backoff_factor, pre_stop_lead):
+        """
+        修改轮询参数（配置热加载时使用），已学习的工作时长等状态保留
+        """
+        self.min_interval = max(0.1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.backoff_factor = max(1.0, backoff_factor)
+        self.pre_stop_lead = pre_stop_lead
+
+    def record_tick(self, button_found=False, frame_changed=False, sent=False):
+        """
+        记录一次监控结果并计算下一次轮询间隔
+        返回: 下一次轮询前等待的秒数
+        """
+        now = time.monotonic()
+        self.ticks += 1
+
+        # 按钮刚出现：记录反应时间上限（距上一次轮询的间隔）并学习典型工作时长
+        if button_found and not self._button_visible:
+            if self._last_tick_time is not None:
+                self.reaction_times.append(now - self._last_tick_time)
+                self.reaction_count += 1
+            if self._last_send_time is not None:
+                duration = now - self._last_send_time
+                if self.typical_work_duration is None:
+                    self.typical_work_duration = duration
+                else:
+                    self.typical_work_duration = 0.7 * self.typical_work_duration + 0.3 * duration
+        self._button_visible = button_found and not sent
+        self._last_tick_time = now
+
+        if sent:
+            self._last_send_time = now
+            self._fast_ticks_left = self.fast_ticks_after_send
+
+        if self._fast_ticks_left > 0:
+            self._fast_ticks_left -= 1
+            interval = self.min_interval
+        elif frame_changed:
+            interval = self.min_interval
+        else:
+            interval = self.current_interval * self.backoff_factor
+
+        interval = self._limit_by_expected_stop(now, interval)
+        self.current_interval = min(self.max_interval, max(self.min_interval, interval))
+        return self.current_interval
+
+    def _limit_by_expected_stop(self, now, interval):
+        """
+        在预计停止时间附近缩短间隔
+        """
+        if self._last_send_time is None or self.typical_work_duration is None:
+            return interval
+
+        expected_stop = self._last_send_time + self.typical_work_duration
+        wake_at = expected_stop - self.pre_stop_lead
+        if wake_at <= now <= expected_stop + self.pre_stop_lead:
+            return self.min_interval
+        if now < wake_at:
+            # 不要睡过快速轮询窗口的开始时间
+            return min(interval, wake_at - now)
+        return interval
+
+    def get_stats(self):
+        """
+        返回调度统计信息
+        """
+        wall = time.monotonic() - self._start_wall
+        cpu = time.process_time() - self._start_cpu
+        hours = wall / 3600 if wall > 0 else 0
+        reactions = sorted(self.reaction_times)
+        return {
+            'ticks': self.ticks,
+            'current_interval': round(self.current_interval, 2),
+            'typical_work_duration': round(self.typical_work_duration, 1) if self.typical_work_duration else None,
+            'reaction_mean_seconds': round(sum(reactions) / len(reactions), 2) if reactions else None,
+            'reaction_max_seconds': round(reactions[-1], 2) if reactions else None,
+            'ticks_per_hour': round(self.ticks / hours, 1) if hours else None,
+            'cpu_seconds_per_hour': round(cpu / hours, 1) if hours else None,
+        }
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+匹配器基准测试
+功能：在录制的画面上比较 exhaustive、pyramid 与 tiled 匹配器的耗时和准确度
+
+用法：
+    python benchmark_matcher.py [画面文件或目录 ...] --template dd.PNG --embed
+使用 --embed 时会把模板随机贴入画面，以贴入位置作为标准答案；
+否则以 exhaustive 匹配器的结果作为标准答案。
+"""
+
+import argparse
+import os
+import random
+import time
+import cv2
+
+from template_cache import TemplateCache
+from matchers import ExhaustiveMatcher, PyramidMatcher, TiledMatcher
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def load_frames(paths):
+    """
+    读取画面文件，目录会展开为其中的图片
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+
+    frames = []
+    for file in files:
+        frame = cv2.imread(file)
+        if frame is None:
+            print(f"⚠️  无法读取画面 {file}，已跳过")
+            continue
+        frames.append((file, frame))
+    return frames
+
+
+def embed_template(frame, template, rng):
+    """
+    把模板贴入画面的随机位置
+    返回: (新画面, 贴入位置)
+    """
+    frame = frame.copy()
+    h, w = template.shape[:2]
+    x = rng.randint(0, frame.shape[1] - w)
+    y = rng.randint(0, frame.shape[0] - h)
+    frame[y:y + h, x:x + w] = template
+    return frame, (x, y)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(frames, template, matchers, iterations, embed, tolerance, seed):
+    rng = random.Random(seed)
+    cases = []
+    for name, frame in frames:
+        if embed:
+            frame, truth = embed_template(frame, template.bgr, rng)
+        else:
+            truth = None
+        cases.append((name, frame, truth))
+
+    reference = ExhaustiveMatcher()
+    results = {}
+    for matcher_name, matcher in matchers.items():
+        latencies = []
+        correct = 0
+        score_diffs = []
+        for name, frame, truth in cases:
+            expected = truth
+            if expected is None:
+                ref_val, expected = reference.match(frame, template)
+            else:
+                ref_val = None
+
+            for _ in range(iterations):
+                start = time.perf_counter()
+                max_val, max_loc = matcher.match(frame, template)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            if abs(max_loc[0] - expected[0]) <= tolerance and abs(max_loc[1] - expected[1]) <= tolerance:
+                correct += 1
+            if ref_val is not None:
+                score_diffs.append(abs(max_val - ref_val))
+
+        results[matcher_name] = {
+            'mean_ms': sum(latencies) / len(latencies),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'accuracy': correct / len(cases),
+            'max_score_diff': max(score_diffs) if score_diffs else None,
+        }
+    return results
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="比较模板匹配器的耗时和准确度")
+    parser.add_argument('frames', nargs='*', default=['detection_result.png'],
+                        help="录制的画面文件或目录")
+    parser.add_argument('--template', default='dd.PNG', help="模板图片路径")
+    parser.add_argument('--iterations', type=int, default=5, help="每个画面重复匹配的次数")
+    parser.add_argument('--embed', action='store_true', help="把模板随机贴入画面作为标准答案")
+    parser.add_argument('--tolerance', type=int, default=2, help="位置判定为正确的像素误差")
+    parser.add_argument('--levels', type=int, default=1, help="pyramid 匹配器的层级")
+    parser.add_argument('--color', action='store_true', help="pyramid 粗匹配使用彩色图")
+    parser.add_argument('--tile-size', type=int, default=1024, help="tiled 匹配器每块的边长")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    template = TemplateCache(pyramid_levels=max(2, args.levels)).get(args.template)
+    if template is None:
+        print(f"❌ 错误: 无法加载模板 {args.template}")
+        return
+
+    frames = load_frames(args.frames)
+    if not frames:
+        print("❌ 错误: 没有可用的画面")
+        return
+
+    matchers = {
+        'exhaustive': ExhaustiveMatcher(),
+        'pyramid': PyramidMatcher(levels=args.levels, grayscale=not args.color),
+        'tiled': TiledMatcher(tile_size=args.tile_size),
+    }
+    try:
+        results = run_benchmark(frames, template, matchers, args.iterations,
+                                args.embed, args.tolerance, args.seed)
+    finally:
+        for matcher in matchers.values():
+            matcher.close()
+
+    print(f"画面数量: {len(frames)}, 每个画面重复 {args.iterations} 次")
+    print(f"{'匹配器':<12}{'平均(ms)':>10}{'P50(ms)':>10}{'P95(ms)':>10}{'准确率':>8}{'最大分差':>10}")
+    for name, r in results.items():
+        diff = '-' if r['max_score_diff'] is None else f"{r['max_score_diff']:.4f}"
+        print(f"{name:<12}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['accuracy']:>8.0%}{diff:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口标题分类基准测试
+功能：在大量合成窗口标题上比较原有的逐个关键词判断与编译后的分类器（含/不含缓存）
+
+用法：
+    python benchmark_window_classifier.py --titles 3000 --rounds 20
+"""
+
+import argparse
+import random
+import time
+
+from window_classifier import (
+    WindowTitleClassifier, DEFAULT_EXCLUDE_KEYWORDS,
+    DEFAULT_TRAE_INDICATORS, DEFAULT_INTERFERING_KEYWORDS
+)
+
+LEGACY_INTERFERING_KEYWORDS = ["Chrome", "chrome", "Firefox", "firefox", "Edge", "edge",
+                               "浏览器", "Browser", "browser"]
+
+
+def legacy_classify(window_title):
+    """
+    原有实现：_is_trae_window 与 detect_interfering_windows 中的关键词循环
+    """
+    window_title_lower = window_title.lower()
+    is_trae = False
+    excluded = False
+    for exclude in DEFAULT_EXCLUDE_KEYWORDS:
+        if exclude in window_title_lower:
+            excluded = True
+            break
+    if not excluded and 'trae' in window_title_lower:
+        for indicator in DEFAULT_TRAE_INDICATORS:
+            if indicator in window_title_lower:
+                is_trae = True
+                break
+    if is_trae:
+        return 'trae'
+    for keyword in LEGACY_INTERFERING_KEYWORDS:
+        if keyword in window_title:
+            return 'interfering'
+    return None
+
+
+def make_titles(count, seed):
+    """
+    生成合成窗口标题，包含Trae窗口、浏览器和其他常见应用
+    """
+    rng = random.Random(seed)
+    files = ['main.py', 'app.js', 'README.md', 'config.json', 'notes.txt', 'index.ts']
+    apps = ['Visual Studio Code', 'Slack', 'Spotify', 'Windows 资源管理器', 'WeChat', '设置',
+            'Task Manager', 'Discord', 'Photoshop', 'Postman']
+    titles = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.1:
+            titles.append(f"{rng.choice(files)} - project{i % 50} - Trae")
+        elif kind < 0.3:
+            titles.append(f"Page {i} - {rng.choice(['Google Chrome', 'Mozilla Firefox', 'Microsoft Edge'])}")
+        elif kind < 0.4:
+            titles.append(f"Windows PowerShell {i}")
+        else:
+            titles.append(f"{rng.choice(apps)} - document {i}")
+    return titles
+
+
+def time_rounds(func, titles, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for title in titles:
+            func(title)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(titles)) * 1e6
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="比较窗口标题分类的耗时")
+    parser.add_argument('--titles', type=int, default=3000, help="合成窗口标题数量")
+    parser.add_argument('--rounds', type=int, default=20, help="重复分类的轮数（模拟多次监控循环）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    titles = make_titles(args.titles, args.seed)
+    classifier = WindowTitleClassifier(interfering_keywords=DEFAULT_INTERFERING_KEYWORDS)
+
+    mismatches = sum(1 for t in titles if legacy_classify(t) != classifier.classify(t))
+    classifier.classify.cache_clear()
+
+    legacy_us = time_rounds(legacy_classify, titles, args.rounds)
+    compiled_us = time_rounds(classifier._classify_uncached, titles, args.rounds)
+    cached_us = time_rounds(classifier.classify, titles, args.rounds)
+
+    print(f"标题数量: {len(titles)}, 轮数: {args.rounds}, 与原实现结果不一致: {mismatches}")
+    print(f"{'实现':<16}{'每个标题(微秒)':>16}{'加速比':>10}")
+    for name, us in (('原有关键词循环', legacy_us), ('编译正则', compiled_us), ('编译正则+LRU', cached_us)):
+        print(f"{name:<16}{us:>16.3f}{legacy_us / us:>10.1f}x")
+    print(f"缓存统计: {classifier.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+匹配阈值校准报告
+功能：读取监控器运行时记录的匹配分数（threshold_calibration.json），
+按状态显示"确认存在"和"确认不存在"两类分数的分布，以及推导出的阈值（或只有确认存在样本时的阈值上限）
+
+用法：
+    python calibrate_threshold.py [--file threshold_calibration.json] [--miss-weight 2]
+"""
+
+import argparse
+import os
+
+from threshold_calibrator import ThresholdCalibrator, HISTOGRAM_BINS
+
+
+def summarize(samples):
+    if not samples:
+        return "无样本"
+    ordered = sorted(samples)
+    return (f"{len(ordered)}个, 最低 {ordered[0]:.3f}, 中位数 {ordered[len(ordered) // 2]:.3f}, "
+            f"最高 {ordered[-1]:.3f}")
+
+
+def print_histogram(positives, negatives, step=5, width=40):
+    """
+    以文本条形图显示两类分数的分布，每行合并 step 个分桶
+    """
+    rows = []
+    for start in range(0, HISTOGRAM_BINS, step):
+        pos = sum(positives.counts[start:start + step]) if positives else 0
+        neg = sum(negatives.counts[start:start + step]) if negatives else 0
+        if pos or neg:
+            rows.append((start, pos, neg))
+    if not rows:
+        return
+    peak = max(max(pos, neg) for _, pos, neg in rows)
+    for start, pos, neg in rows:
+        low = start / HISTOGRAM_BINS
+        high = (start + step) / HISTOGRAM_BINS
+        pos_bar = '+' * max(1 if pos else 0, round(pos / peak * width))
+        neg_bar = '-' * max(1 if neg else 0, round(neg / peak * width))
+        print(f"  {low:.2f}-{high:.2f} | 存在 {pos:>4} {pos_bar}")
+        print(f"  {'':9} | 不存在 {neg:>3} {neg_bar}")
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="查看匹配分数分布和推导出的阈值")
+    parser.add_argument('--file', default='threshold_calibration.json', help="校准结果文件")
+    parser.add_argument('--miss-weight', type=float, default=1.0, help="漏检相对误检的代价权重")
+    parser.add_argument('--min-threshold', type=float, default=0.75, help="阈值下限")
+    parser.add_argument('--max-threshold', type=float, default=0.98, help="阈值上限")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"❌ 找不到校准结果 {args.file}，请先运行监控器一段时间（至少触发几次发送）")
+        return
+
+    calibrator = ThresholdCalibrator(
+        path=args.file,
+        bounds=(args.min_threshold, args.max_threshold),
+        miss_weight=args.miss_weight,
+        min_positive=1,
+        min_negative=1
+    )
+    names = sorted(set(calibrator._positives) | set(calibrator._negatives))
+    for name in names:
+        positives = calibrator._positives.get(name)
+        negatives = calibrator._negatives.get(name)
+        print(f"状态 {name}")
+        print(f"  确认存在: {summarize(positives.samples if positives else None)}")
+        print(f"  确认不存在: {summarize(negatives.samples if negatives else None)}")
+        print_histogram(positives, negatives)
+        derived = calibrator.derive(name)
+        saved = calibrator.threshold_for(name, None)
+        print(f"  当前保存的阈值: {'-' if saved is None else f'{saved:.3f}'}, "
+              f"按当前分布推导的阈值: {'样本不足' if derived is None else f'{derived:.3f}'}")
+        if derived is None:
+            ceiling = calibrator.derive_ceiling(name)
+            print(f"  只按确认存在的分数推导的阈值上限: {'样本不足' if ceiling is None else f'{ceiling:.3f}'}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+屏幕截图后端
+功能：只截取指定区域 (x, y, w, h)，结果以 BGR 格式写入预先分配、可重复使用的 NumPy 缓冲区
+坐标均为虚拟桌面坐标：多显示器时副显示器可能位于主显示器左侧或上方，坐标为负
+- pyautogui: 使用 pyautogui.screenshot(region=...)，跨平台，但每帧都会分配新的 PIL 图像
+- gdi: 使用 Win32 BitBlt 直接从屏幕 DC 复制指定区域，每帧不分配内存（仅 Windows，Windows 下的默认后端）
+- printwindow: 在 gdi 的基础上用 PrintWindow 截取窗口自身的内容，窗口被遮挡或不在前台时也能截图（仅 Windows）
+- file: 从图片文件读取画面，用于在无桌面的 Linux 上测试
+- fake_window: 在 file 的基础上模拟按窗口截图，用于在 Linux 上测试后台截图
+"""
+
+import collections
+import os
+import sys
+import threading
+import cv2
+import numpy as np
+
+from metrics import NULL_METRICS
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# 未配置截图后端时使用的后端：Windows 下使用不分配内存的 gdi
+DEFAULT_CAPTURE_BACKEND = 'gdi' if sys.platform == 'win32' else 'pyautogui'
+
+# PrintWindow 标志：让使用硬件加速渲染的窗口（Chromium/Electron）也输出完整内容
+PW_RENDERFULLCONTENT = 0x00000002
+
+
+def rect_to_bbox(rect):
+    """
+    将 (left, top, right, bottom) 转换为 (x, y, w, h)
+    """
+    left, top, right, bottom = rect
+    return (left, top, right - left, bottom - top)
+
+
+def clip_bbox(bbox, screen_bounds):
+    """
+    将区域裁剪到屏幕范围内
+    Args:
+        screen_bounds: 虚拟桌面范围 (x, y, w, h)，原点可以为负
+    返回: 裁剪后的 (x, y, w, h)，区域为空时返回 None
+    """
+    x, y, w, h = bbox
+    sx, sy, sw, sh = screen_bounds
+    x0 = max(sx, int(x))
+    y0 = max(sy, int(y))
+    x1 = min(sx + sw, int(x + w))
+    y1 = min(sy + sh, int(y + h))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+class FrameBuffer:
+    """
+    可重复使用的画面缓冲区
+    内部只保留一块连续内存，get 返回其前部的视图；只有需要更大的尺寸时才重新分配，
+    ROI 小区域和整窗画面交替截取时不会反复分配
+    """
+
+    def __init__(self, channels=3):
+        self.channels = channels
+        self._storage = None
+        self.allocations = 0
+
+    def get(self, width, height):
+        """
+        获取指定尺寸的缓冲区（内容未初始化，与上一次 get 返回的数组共用内存）
+        """
+        shape = (height, width, self.channels) if self.channels > 1 else (height, width)
+        size = width * height * self.channels
+        if self._storage is None or self._storage.size < size:
+            self._storage = np.empty(size, dtype=np.uint8)
+            self.allocations += 1
+        return self._storage[:size].reshape(shape)
+
+
+def _virtual_screen_bounds():
+    """
+    返回: Windows 虚拟桌面（所有显示器的外接矩形）的范围 (x, y, w, h)
+    """
+    import win32api
+    import win32con
+    return (win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN))
+
+
+class CaptureBackend:
+    """
+    截图后端基类
+    """
+
+    name = "base"
+    # 是否能截取不在前台、被遮挡的窗口（grab_window 不依赖窗口在屏幕上可见）
+    supports_background = False
+
+    def __init__(self):
+        self.frame_buffer = FrameBuffer()
+        self.grabs = 0
+        # 记录截图和颜色转换耗时的 MetricsRegistry，由监控器设置
+        self.metrics = NULL_METRICS
+        # 检测线程和执行操作时的画面探测可能同时截图
+        self._lock = threading.Lock()
+
+    def get_screen_bounds(self):
+        """
+        返回: 虚拟桌面（所有显示器）的范围 (x, y, w, h)
+        """
+        raise NotImplementedError
+
+    def grab(self, bbox=None, frame_buffer=None):
+        """
+        截取指定区域，bbox 为 None 时截取整个屏幕
+        Args:
+            frame_buffer: 写入的目标缓冲区，默认使用后端内部的缓冲区
+        返回: BGR 画面（指向缓冲区，下一次写入同一缓冲区时会被覆盖），失败时返回 None
+        """
+        frame_buffer = frame_buffer or self.frame_buffer
+        with self._lock:
+            screen_bounds = self.get_screen_bounds()
+            if bbox is None:
+                bbox = screen_bounds
+            bbox = clip_bbox(bbox, screen_bounds)
+            if bbox is None:
+                return None
+            with self.metrics.step('capture'):
+                frame = self._grab_into(bbox, frame_buffer.get(bbox[2], bbox[3]))
+            if frame is not None:
+                self.grabs += 1
+            return frame
+
+    def _grab_into(self, bbox, out):
+        """
+        将区域内容写入 out，返回 out 或 None
+        """
+        raise NotImplementedError
+
+    def grab_window(self, hwnd, rect, frame_buffer=None):
+        """
+        截取窗口的内容
+        默认截取窗口在屏幕上所占的区域（窗口需要在前台且未被遮挡），
+        supports_background 为 True 的后端直接截取窗口自身的内容
+        Args:
+            hwnd: 窗口句柄
+            rect: 窗口区域 (x, y, w, h)，返回的画面与该区域一一对应
+        返回: BGR 画面，失败时返回 None
+        """
+        return self.grab(rect, frame_buffer)
+
+    def close(self):
+        pass
+
+
+class PyAutoGUICapture(CaptureBackend):
+    """
+    基于 pyautogui 的区域截图
+    """
+
+    name = "pyautogui"
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def get_screen_bounds(self):
+        # pyautogui.size() 只包含主显示器，Windows 下改用虚拟桌面范围
+        if sys.platform == 'win32':
+            return _virtual_screen_bounds()
+        size = self._pyautogui.size()
+        return (0, 0, size[0], size[1])
+
+    def _grab_into(self, bbox, out):
+        x, y, w, h = bbox
+        size = self._pyautogui.size()
+        if x < 0 or y < 0 or x + w > size[0] or y + h > size[1]:
+            # pyautogui 只能截取主显示器，其他显示器上的区域用 ImageGrab 按虚拟桌面截取
+            from PIL import ImageGrab
+            screenshot = ImageGrab.grab(bbox=(x, y, x + w, y + h), all_screens=True)
+        else:
+            screenshot = self._pyautogui.screenshot(region=bbox)
+        # PIL 导出原始数据时直接按 BGR 顺序输出（这一次复制无法避免），省去单独的颜色转换
+        with self.metrics.step('color_convert'):
+            bgr = np.frombuffer(screenshot.tobytes('raw', 'BGR'), dtype=np.uint8)
+            np.copyto(out, bgr.reshape(out.shape))
+        return out
+
+
+class GDICapture(CaptureBackend):
+    """
+    基于 Win32 BitBlt 的区域截图，只复制需要的区域
+    位图按尺寸缓存，像素通过 GetDIBits 直接读入预先分配的 BGRA 缓冲区，每帧不再分配内存
+    """
+
+    name = "gdi"
+    # 缓存的位图数量（ROI 小区域和整窗画面的尺寸不同，需要同时保留）
+    max_bitmaps = 4
+
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        import win32gui
+        import win32ui
+        import win32con
+        import win32api
+        self._ctypes = ctypes
+        self._gdi32 = ctypes.windll.gdi32
+        self._win32gui = win32gui
+        self._win32ui = win32ui
+        self._win32con = win32con
+        self._win32api = win32api
+        self._bitmaps = collections.OrderedDict()
+        self._bgra_buffer = FrameBuffer(channels=4)
+        # BITMAPINFOHEADER(40 字节) + 一个调色板项，只修改宽高
+        self._bitmap_info = (ctypes.c_uint32 * 11)()
+        self._bitmap_info[0] = 40
+
+    def get_screen_bounds(self):
+        return _virtual_screen_bounds()
+
+    def _get_bitmap(self, src_dc, w, h):
+        """
+        返回 w x h 的兼容位图，按尺寸缓存，超过 max_bitmaps 时删除最久未用的
+        """
+        bitmap = self._bitmaps.get((w, h))
+        if bitmap is not None:
+            self._bitmaps.move_to_end((w, h))
+            return bitmap
+        bitmap = self._win32ui.CreateBitmap()
+        bitmap.CreateCompatibleBitmap(src_dc, w, h)
+        self._bitmaps[(w, h)] = bitmap
+        while len(self._bitmaps) > self.max_bitmaps:
+            _, old = self._bitmaps.popitem(last=False)
+            self._win32gui.DeleteObject(old.GetHandle())
+        return bitmap
+
+    def _bitmap_to_bgr(self, mem_dc, bitmap, w, h, out):
+        """
+        读取位图像素并转换为 BGR 写入 out（调用时位图不能选入任何 DC）
+        """
+        info = self._bitmap_info
+        info[1] = w
+        # 高度为负表示自上而下的行顺序，与 NumPy 数组一致
+        info[2] = (-h) & 0xFFFFFFFF
+        # biPlanes=1, biBitCount=32, biCompression=BI_RGB
+        info[3] = 1 | (32 << 16)
+        info[4] = 0
+        bgra = self._bgra_buffer.get(w, h)
+        lines = self._gdi32.GetDIBits(mem_dc.GetSafeHdc(), bitmap.GetHandle(), 0, h,
+                                      self._ctypes.c_void_p(bgra.ctypes.data),
+                                      self._ctypes.byref(info), 0)
+        if lines != h:
+            return None
+        with self.metrics.step('color_convert'):
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=out)
+        return out
+
+    def _grab_into(self, bbox, out):
+        x, y, w, h = bbox
+        desktop = self._win32gui.GetDesktopWindow()
+        desktop_dc = self._win32gui.GetWindowDC(desktop)
+        src_dc = self._win32ui.CreateDCFromHandle(desktop_dc)
+        mem_dc = src_dc.CreateCompatibleDC()
+        try:
+            bitmap = self._get_bitmap(src_dc, w, h)
+            previous = mem_dc.SelectObject(bitmap)
+            mem_dc.BitBlt((0, 0), (w, h), src_dc, (x, y), self._win32con.SRCCOPY)
+            mem_dc.SelectObject(previous)
+            return self._bitmap_to_bgr(mem_dc, bitmap, w, h, out)
+        finally:
+            mem_dc.DeleteDC()
+            src_dc.DeleteDC()
+            self._win32gui.ReleaseDC(desktop, desktop_dc)
+
+    def close(self):
+        for bitmap in self._bitmaps.values():
+            self._win32gui.DeleteObject(bitmap.GetHandle())
+        self._bitmaps.clear()
+
+
+class PrintWindowCapture(GDICapture):
+    """
+    基于 PrintWindow 的窗口截图：窗口把自身内容绘制到内存 DC，
+    不需要窗口在前台，被其他窗口遮挡时也能得到完整内容（最小化的窗口除外）
+    grab 仍按 gdi 方式截取屏幕区域，供执行操作时的画面探测使用
+    """
+
+    name = "printwindow"
+    supports_background = True
+
+    def __init__(self):
+        super().__init__()
+        self._user32 = self._ctypes.windll.user32
+
+    def grab_window(self, hwnd, rect, frame_buffer=None):
+        frame_buffer = frame_buffer or self.frame_buffer
+        _, _, w, h = rect
+        if w <= 0 or h <= 0:
+            return None
+        with self._lock:
+            with self.metrics.step('capture'):
+                frame = self._print_window(hwnd, w, h, frame_buffer.get(w, h))
+            if frame is not None:
+                self.grabs += 1
+            return frame
+
+    def _print_window(self, hwnd, w, h, out):
+        window_dc = self._win32gui.GetWindowDC(hwnd)
+        src_dc = self._win32ui.CreateDCFromHandle(window_dc)
+        mem_dc = src_dc.CreateCompatibleDC()
+        try:
+            bitmap = self._get_bitmap(src_dc, w, h)
+            previous = mem_dc.SelectObject(bitmap)
+            printed = self._user32.PrintWindow(hwnd, mem_dc.GetSafeHdc(), PW_RENDERFULLCONTENT)
+            mem_dc.SelectObject(previous)
+            if not printed:
+                return None
+            return self._bitmap_to_bgr(mem_dc, bitmap, w, h, out)
+        finally:
+            mem_dc.DeleteDC()
+            src_dc.DeleteDC()
+            self._win32gui.ReleaseDC(hwnd, window_dc)
+
+
+class FileCapture(CaptureBackend):
+    """
+    基于图片文件的假截图后端，用于测试和回放
+    source 可以是单个图片、图片目录或列表（元素为图片路径或 BGR 数组），每次 grab 依次切换到下一张（循环）
+
+    Args:
+        source: 图片来源
+        advance: 每次 grab 后是否切换到下一张
+        origin: 画面左上角的虚拟桌面坐标 (x, y)，用于模拟主显示器左侧或上方的显示器
+    """
+
+    name = "file"
+
+    def __init__(self, source, advance=True, origin=(0, 0)):
+        super().__init__()
+        self.origin = tuple(origin)
+        if isinstance(source, (list, tuple)):
+            paths = list(source)
+        elif os.path.isdir(source):
+            paths = [os.path.join(source, name) for name in sorted(os.listdir(source))
+                     if name.lower().endswith(IMAGE_EXTENSIONS)]
+        else:
+            paths = [source]
+
+        self.frames = []
+        for path in paths:
+            if isinstance(path, np.ndarray):
+                self.frames.append(path)
+                continue
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError(f"无法读取画面 {path}")
+            self.frames.append(image)
+        if not self.frames:
+            raise ValueError(f"没有可用的画面: {source}")
+
+        self.advance = advance
+        self.index = 0
+
+    def set_frame(self, image):
+        """
+        直接替换当前画面（BGR）
+        """
+        self.frames[self.index] = image
+
+    def get_screen_bounds(self):
+        h, w = self.frames[self.index].shape[:2]
+        return (self.origin[0], self.origin[1], w, h)
+
+    def _grab_into(self, bbox, out):
+        x, y, w, h = bbox
+        x -= self.origin[0]
+        y -= self.origin[1]
+        np.copyto(out, self.frames[self.index][y:y + h, x:x + w])
+        if self.advance:
+            self.index = (self.index + 1) % len(self.frames)
+        return out
+
+
+class FakeWindowCapture(FileCapture):
+    """
+    模拟 PrintWindow 的假截图后端，用于在 Linux 上测试后台截图
+    grab_window 默认从当前画面中裁剪窗口区域；通过 set_window_frame 设置的窗口
+    使用单独的画面，模拟窗口被其他窗口遮挡时屏幕上看不到、但窗口内容仍可截取的情况
+    """
+
+    name = "fake_window"
+    supports_background = True
+
+    def __init__(self, source, advance=True, origin=(0, 0)):
+        super().__init__(source, advance, origin)
+        self._window_frames = {}
+        self.window_grabs = 0
+
+    def set_window_frame(self, hwnd, image):
+        """
+        设置窗口自身的画面（BGR，尺寸与窗口区域相同），为 None 时恢复为从屏幕画面中裁剪
+        """
+        if image is None:
+            self._window_frames.pop(hwnd, None)
+        else:
+            self._window_frames[hwnd] = image
+
+    def grab_window(self, hwnd, rect, frame_buffer=None):
+        frame_buffer = frame_buffer or self.frame_buffer
+        x, y, w, h = rect
+        if w <= 0 or h <= 0:
+            return None
+        with self._lock:
+            image = self._window_frames.get(hwnd)
+            if image is None:
+                x -= self.origin[0]
+                y -= self.origin[1]
+                image = self.frames[self.index][max(0, y):y + h, max(0, x):x + w]
+            if image.shape[:2] != (h, w):
+                return None
+            with self.metrics.step('capture'):
+                out = frame_buffer.get(w, h)
+                np.copyto(out, image)
+            self.grabs += 1
+            self.window_grabs += 1
+            return out
+
+
+CAPTURE_BACKENDS = {
+    PyAutoGUICapture.name: PyAutoGUICapture,
+    GDICapture.name: GDICapture,
+    PrintWindowCapture.name: PrintWindowCapture,
+    FileCapture.name: FileCapture,
+    FakeWindowCapture.name: FakeWindowCapture,
+}
+
+
+def create_capture_backend(name=DEFAULT_CAPTURE_BACKEND, **options):
+    """
+    根据名称创建截图后端
+    """
+    backend_class = CAPTURE_BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(f"未知的截图后端: {name}")
+    return backend_class(**options)
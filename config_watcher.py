@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置文件热加载
+功能：
+- validate_config: 按 CONFIG_SCHEMA 检查配置项的类型和取值范围
+- ConfigWatcher: 定期检查配置文件的修改时间和大小（一次 os.stat），
+  变化时重新读取并校验，通过校验后交给监控器在两轮监控之间应用
+"""
+
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def number(minimum=None, maximum=None, integer=False):
+    """
+    数值检查，integer 为 True 时只接受整数
+    """
+    def check(value):
+        if not _is_number(value) or (integer and not isinstance(value, int)):
+            return "应为整数" if integer else "应为数值"
+        if minimum is not None and value < minimum:
+            return f"不能小于 {minimum}"
+        if maximum is not None and value > maximum:
+            return f"不能大于 {maximum}"
+        return None
+    return check
+
+
+def boolean(value):
+    return None if isinstance(value, bool) else "应为 true 或 false"
+
+
+def string(value):
+    return None if isinstance(value, str) else "应为字符串"
+
+
+def optional(check):
+    """
+    允许为 null
+    """
+    def check_optional(value):
+        return None if value is None else check(value)
+    return check_optional
+
+
+def list_of(check, length=None):
+    """
+    列表检查，length 不为 None 时要求固定长度
+    """
+    def check_list(value):
+        if not isinstance(value, list):
+            return "应为列表"
+        if length is not None and len(value) != length:
+            return f"应包含 {length} 个元素"
+        for i, item in enumerate(value):
+            error = check(item)
+            if error:
+                return f"第 {i + 1} 项{error}"
+        return None
+    return check_list
+
+
+def choice(*options):
+    def check(value):
+        return None if value in options else f"应为 {', '.join(map(str, options))} 之一"
+    return check
+
+
+REGION = list_of(number(), length=4)
+
+# 状态模板（detection_settings.templates 的每一项）
+TEMPLATE_SCHEMA = {
+    'name': string,
+    'image': string,
+    'threshold': number(0, 1),
+    'action': string,
+    'priority': number(),
+    'region': optional(REGION),
+}
+TEMPLATE_REQUIRED = ('name', 'image')
+
+
+def template_item(value):
+    if not isinstance(value, dict):
+        return "应为对象"
+    for key in TEMPLATE_REQUIRED:
+        if key not in value:
+            return f"缺少 {key}"
+    errors = _check_section(value, TEMPLATE_SCHEMA)
+    return errors[0] if errors else None
+
+
+# 各配置节中需要检查的配置项，未列出的配置项（如 description）不检查
+CONFIG_SCHEMA = {
+    'monitor_settings': {
+        'interval_seconds': number(0.1),
+        'adaptive_polling': boolean,
+        'min_interval_seconds': number(0.1),
+        'backoff_factor': number(1),
+        'pre_stop_lead_seconds': number(0),
+        'pipeline': boolean,
+        'detection_workers': number(1, integer=True),
+        'queue_size': number(1, integer=True),
+        'config_reload_seconds': number(0),
+        'state_file': optional(string),
+        'state_save_seconds': number(1),
+        'state_max_age_seconds': number(0),
+    },
+    'message_settings': {
+        'trigger_message': string,
+        'action_pause_seconds': number(0),
+        'wait_timeout_seconds': number(0),
+    },
+    'detection_settings': {
+        'match_threshold': number(0, 1),
+        'target_button_image': string,
+        'roi_padding': number(0, integer=True),
+        'roi_max_misses': number(0, integer=True),
+        'search_region': optional(REGION),
+        'templates': optional(list_of(template_item)),
+        'scale_min': number(0.1),
+        'scale_max': number(0.1),
+        'scale_step': number(0.01),
+        'auto_threshold': boolean,
+        'near_miss_margin': number(0, 1),
+        'calibration_file': optional(string),
+        'threshold_hysteresis': number(0, 1),
+        'threshold_bounds': list_of(number(0, 1), length=2),
+        'change_detection': boolean,
+        'change_tolerance': number(0),
+        'max_staleness_seconds': number(0),
+        'matcher': choice('exhaustive', 'pyramid', 'tiled'),
+        'pyramid_levels': number(0, integer=True),
+        'pyramid_grayscale': boolean,
+        'pyramid_candidates': number(1, integer=True),
+        'tile_size': number(64, integer=True),
+        'tile_workers': optional(number(1, integer=True)),
+        'tile_executor': choice('thread', 'process'),
+    },
+    'position_settings': {
+        'input_box_x': number(integer=True),
+        'input_box_y': number(integer=True),
+        'safe_mouse_x': number(integer=True),
+        'safe_mouse_y': number(integer=True),
+        'layout': choice('relative', 'fixed'),
+        'input_offset_x': number(integer=True),
+        'input_offset_y': number(integer=True),
+        'safe_mouse_ratio': list_of(number(0, 1), length=2),
+        'layout_check_tolerance': number(0),
+    },
+    'capture_settings': {
+        'backend': choice('pyautogui', 'gdi', 'printwindow', 'file', 'fake_window'),
+        'window_only': boolean,
+        'background': boolean,
+        'frame_source': string,
+    },
+    'window_settings': {
+        'auto_minimize': boolean,
+        'auto_activate': boolean,
+        'multi_window': boolean,
+        'send_cooldown_seconds': number(0),
+        'confirm_timeout_seconds': number(0),
+        'max_send_retries': number(0, integer=True),
+        'retry_backoff_seconds': number(0),
+        'retry_backoff_factor': number(1),
+        'retry_backoff_max_seconds': number(0),
+        'registry_ttl_seconds': number(0),
+        'use_window_events': boolean,
+        'trae_indicators': optional(list_of(string)),
+        'exclude_keywords': optional(list_of(string)),
+        'interfering_keywords': optional(list_of(string)),
+    },
+    'metrics_settings': {
+        'http_enabled': boolean,
+        'host': string,
+        'port': number(0, 65535, integer=True),
+        'json_dump_file': optional(string),
+        'json_dump_interval_seconds': number(1),
+    },
+    'logging_settings': {
+        'level': choice('DEBUG', 'INFO', 'WARNING', 'ERROR'),
+        'console': boolean,
+        'console_level': optional(choice('DEBUG', 'INFO', 'WARNING', 'ERROR')),
+        'file': optional(string),
+        'max_file_bytes': number(1024, integer=True),
+        'backup_count': number(0, integer=True),
+        'repeat_interval_seconds': number(0),
+    },
+}
+
+
+def _check_section(values, schema, prefix=""):
+    errors = []
+    for key, check in schema.items():
+        if key in values:
+            error = check(values[key])
+            if error:
+                errors.append(f"{prefix}{key} {error}")
+    return errors
+
+
+def validate_config(config):
+    """
+    检查配置内容
+    返回: 错误描述列表，为空表示通过
+    """
+    if not isinstance(config, dict):
+        return ["配置文件的顶层应为对象"]
+    errors = []
+    for section, schema in CONFIG_SCHEMA.items():
+        values = config.get(section, {})
+        if not isinstance(values, dict):
+            errors.append(f"{section} 应为对象")
+            continue
+        errors.extend(_check_section(values, schema, f"{section}."))
+
+    detection = config.get('detection_settings', {})
+    if isinstance(detection, dict) and not errors:
+        if detection.get('scale_min', 1.0) > detection.get('scale_max', 1.0):
+            errors.append("detection_settings.scale_min 不能大于 scale_max")
+        names = [item['name'] for item in detection.get('templates') or []]
+        if len(names) != len(set(names)):
+            errors.append("detection_settings.templates 中的状态名称不能重复")
+    return errors
+
+
+class ConfigWatcher:
+    """
+    配置文件变化检查
+
+    Args:
+        path: 配置文件路径
+        check_interval: 两次检查文件状态之间的最短间隔（秒）
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._signature = self._stat()
+        self._last_check = time.monotonic()
+
+        # 统计计数
+        self.checks = 0
+        self.reloads = 0
+        self.rejected = 0
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def poll(self, force=False):
+        """
+        检查配置文件是否变化
+        返回: 变化且通过校验的新配置，否则返回 None（无效的配置在文件再次变化前不会重复读取）
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return None
+        self._last_check = now
+        self.checks += 1
+
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            # 编辑器保存到一半时可能读到不完整的内容，等待下一次变化
+            self.rejected += 1
+            log.error("❌ 配置文件 %s 无法解析，继续使用当前配置: %s", self.path, e)
+            return None
+
+        errors = validate_config(config)
+        if errors:
+            self.rejected += 1
+            log.error("❌ 配置文件 %s 未通过检查，继续使用当前配置:", self.path)
+            for error in errors:
+                log.error("   - %s", error)
+            return None
+
+        self.reloads += 1
+        return config
+
+    def get_stats(self):
+        return {
+            'checks': self.checks,
+            'reloads': self.reloads,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多模板、多状态检测引擎
+功能：加载一组命名的状态模板（发送按钮、重试按钮、错误提示、不同主题/DPI下的按钮截图等），
+在同一次截图、同一份预处理结果上依次匹配，每个模板使用各自的 ROI，
+返回按优先级和匹配分数排序的状态命中列表，每个状态对应各自的处理动作
+每个窗口记住各模板上次命中的缩放比例，局部搜索时只尝试该比例，全屏搜索时才遍历整个缩放模板库
+"""
+
+import collections
+import logging
+
+from matchers import prepare_frame
+
+log = logging.getLogger(__name__)
+
+# 状态对应的处理动作
+ACTION_SEND_MESSAGE = 'send_message'  # 在输入框输入消息并点击命中位置发送
+ACTION_CLICK = 'click'  # 直接点击命中位置，例如"重试"按钮
+ACTION_NOTIFY = 'notify'  # 只记录，不操作界面，例如错误提示
+ACTIONS = (ACTION_SEND_MESSAGE, ACTION_CLICK, ACTION_NOTIFY)
+
+# 需要激活窗口并操作鼠标键盘的动作
+INPUT_ACTIONS = (ACTION_SEND_MESSAGE, ACTION_CLICK)
+
+
+class StateTemplate:
+    """
+    一个命名状态的模板配置
+
+    Args:
+        name: 状态名称
+        image: 模板图片路径
+        threshold: 匹配阈值
+        action: 命中后的处理动作
+        priority: 同一窗口同时命中多个状态时，优先级高的先处理
+        region: 限定的检测区域 (x, y, w, h)，为 None 时在整个窗口内搜索
+    """
+
+    def __init__(self, name, image, threshold=0.9, action=ACTION_SEND_MESSAGE, priority=0, region=None):
+        self.name = name
+        self.image = image
+        self.threshold = threshold
+        self.action = action
+        self.priority = priority
+        self.region = tuple(region) if region else None
+
+    @classmethod
+    def from_config(cls, item, default_threshold=0.9, default_region=None):
+        """
+        从配置项创建，缺省的阈值和检测区域使用 detection_settings 中的全局值
+        """
+        action = item.get('action', ACTION_SEND_MESSAGE)
+        if action not in ACTIONS:
+            log.warning("⚠️  状态 %s 的动作 %s 未知，改为只记录", item.get('name'), action)
+            action = ACTION_NOTIFY
+        return cls(
+            name=item['name'],
+            image=item['image'],
+            threshold=item.get('threshold', default_threshold),
+            action=action,
+            priority=item.get('priority', 0),
+            region=item.get('region', default_region),
+        )
+
+
+# 一个模板本次的搜索计划：region 为整屏坐标，tracker 为该窗口中该模板的 ROITracker，
+# best_scales 为该窗口记录的各模板最佳缩放比例
+PlannedSearch = collections.namedtuple('PlannedSearch', 'spec template region tracker best_scales')
+
+
+class StateHit(collections.namedtuple('StateHit', 'name action score position box priority threshold scale')):
+    """
+    一次状态命中
+    position 为命中区域中心的整屏坐标，box 为模板左上角及尺寸 (x, y, w, h)，scale 为命中的模板缩放比例
+    """
+
+    __slots__ = ()
+
+    @property
+    def margin(self):
+        """
+        匹配分数超出阈值的部分
+        """
+        return self.score - self.threshold
+
+
+def rank_hits(hits):
+    """
+    按优先级从高到低排序，优先级相同时超出阈值越多越靠前
+    """
+    return sorted(hits, key=lambda hit: (hit.priority, hit.margin), reverse=True)
+
+
+def index_templates(templates):
+    """
+    按名称索引状态模板，列表为空或名称重复时抛出 ValueError
+    """
+    if not templates:
+        raise ValueError("至少需要一个状态模板")
+    by_name = {spec.name: spec for spec in templates}
+    if len(by_name) != len(templates):
+        raise ValueError("状态模板名称不能重复")
+    return by_name
+
+
+class DetectionEngine:
+    """
+    多模板检测引擎
+
+    Args:
+        template_cache: TemplateCache
+        matcher: 模板匹配器，需支持 match(frame, template, rect)
+        templates: StateTemplate 列表
+        calibrator: ThresholdCalibrator，提供校准后的阈值，为 None 时使用配置的阈值
+        near_miss_margin: 低于阈值不超过该值的匹配记为近似命中，供阈值校准使用，为 0 时不记录
+    """
+
+    def __init__(self, template_cache, matcher, templates, calibrator=None, near_miss_margin=0.0):
+        self.template_cache = template_cache
+        self.matcher = matcher
+        self.calibrator = calibrator
+        self.near_miss_margin = near_miss_margin
+        self.set_templates(templates)
+        self.last_errors = []
+
+        # 统计计数
+        self.passes = 0
+        self.matches = 0
+        self.scale_scans = 0
+        self.hit_counts = collections.Counter()
+        self.scale_hits = collections.Counter()
+
+    def set_templates(self, templates):
+        """
+        替换状态模板列表（配置热加载时使用），名称重复或为空时抛出 ValueError 且不做修改
+        """
+        templates = list(templates)
+        self.templates, self._by_name = templates, index_templates(templates)
+
+    def get_spec(self, name):
+        return self._by_name.get(name)
+
+    def get_threshold(self, spec):
+        """
+        返回状态当前使用的匹配阈值
+        """
+        if self.calibrator is None:
+            return spec.threshold
+        return self.calibrator.threshold_for(spec.name, spec.threshold)
+
+    def get_template(self, name):
+        """
+        返回状态对应的 TemplateEntry，不存在时返回 None
+        """
+        spec = self._by_name.get(name)
+        return None if spec is None else self.template_cache.get(spec.image)
+
+    def load_templates(self):
+        """
+        从缓存获取所有模板，加载失败的模板本次跳过，原因记录在 last_errors
+        返回: [(StateTemplate, TemplateEntry), ...]
+        """
+        loaded = []
+        errors = []
+        for spec in self.templates:
+            entry = self.template_cache.get(spec.image)
+            if entry is None:
+                errors.append(f"{spec.name}: {self.template_cache.last_error}")
+            else:
+                loaded.append((spec, entry))
+        self.last_errors = errors
+        return loaded
+
+    def plan(self, window_state, screen_bounds, bounds=None, loaded=None):
+        """
+        计算一个窗口中各模板本次的搜索区域
+        Args:
+            window_state: WindowState，提供各模板的 ROITracker 和最佳缩放比例
+            screen_bounds: 虚拟桌面范围 (x, y, w, h)
+            bounds: 窗口区域 (x, y, w, h)，为 None 时为整个屏幕
+            loaded: load_templates 的结果，多个窗口共用时可传入避免重复获取
+        返回: [PlannedSearch, ...]
+        """
+        if loaded is None:
+            loaded = self.load_templates()
+        planned = []
+        for spec, entry in loaded:
+            tracker = window_state.get_roi_tracker(spec.name)
+            region = tracker.next_region(screen_bounds, entry.width, entry.height, bounds)
+            if region[2] >= entry.width and region[3] >= entry.height:
+                planned.append(PlannedSearch(spec, entry, region, tracker, window_state.best_scales))
+        return planned
+
+    def _scale_candidates(self, entry, best_scale, full_scan):
+        """
+        本次需要尝试的缩放模板，按优先顺序排列
+        已记住最佳比例时先尝试该比例，局部搜索只尝试该比例；否则从原尺寸附近开始遍历
+        """
+        if best_scale is None:
+            best_scale = 1.0
+        elif not full_scan:
+            return [entry.get_scaled(best_scale)]
+        self.scale_scans += 1
+        return sorted(entry.scale_bank, key=lambda variant: abs(variant.scale - best_scale))
+
+    def evaluate(self, frame, frame_box, planned, near_misses=None):
+        """
+        在同一幅画面上依次匹配所有计划中的模板，并更新各模板的 ROI
+        Args:
+            frame: 覆盖 frame_box 的 BGR 画面或 PreparedFrame
+            frame_box: 画面在屏幕上的位置 (x, y, w, h)
+            planned: plan 的结果
+            near_misses: 列表，传入时追加本次的近似命中（分数低于阈值不超过 near_miss_margin 的 StateHit）
+        返回: 排序后的 [StateHit, ...]
+        """
+        prepared = prepare_frame(frame)
+        ox, oy = frame_box[0], frame_box[1]
+        hits = []
+        for spec, entry, (rx, ry, rw, rh), tracker, best_scales in planned:
+            rect = (rx - ox, ry - oy, rw, rh)
+            threshold = self.get_threshold(spec)
+            best_val, best_loc, best_variant = -1.0, None, None
+            for variant in self._scale_candidates(entry, best_scales.get(spec.name), not tracker.current_is_roi):
+                if variant.width > rw or variant.height > rh:
+                    continue
+                max_val, max_loc = self.matcher.match(prepared, variant, rect)
+                self.matches += 1
+                if max_val > best_val:
+                    best_val, best_loc, best_variant = max_val, max_loc, variant
+                if max_val >= threshold:
+                    break
+
+            if best_variant is None:
+                tracker.record_miss()
+                continue
+            # 换算回整屏坐标
+            width, height = best_variant.width, best_variant.height
+            match_x = rx + best_loc[0]
+            match_y = ry + best_loc[1]
+            hit = StateHit(
+                name=spec.name,
+                action=spec.action,
+                score=best_val,
+                position=(match_x + width // 2, match_y + height // 2),
+                box=(match_x, match_y, width, height),
+                priority=spec.priority,
+                threshold=threshold,
+                scale=best_variant.scale,
+            )
+            if best_val < threshold:
+                tracker.record_miss()
+                if near_misses is not None and best_val >= threshold - self.near_miss_margin:
+                    near_misses.append(hit)
+                continue
+            tracker.record_hit(match_x, match_y, width, height)
+            best_scales[spec.name] = best_variant.scale
+            self.hit_counts[spec.name] += 1
+            self.scale_hits[best_variant.scale] += 1
+            hits.append(hit)
+        self.passes += 1
+        return rank_hits(hits)
+
+    def get_stats(self):
+        """
+        返回检测统计信息
+        """
+        return {
+            'templates': [spec.name for spec in self.templates],
+            'passes': self.passes,
+            'matches': self.matches,
+            'scale_scans': self.scale_scans,
+            'hits': dict(self.hit_counts),
+            'scale_hits': dict(self.scale_hits),
+        }
+
+
+def build_state_templates(items, default_image, default_threshold=0.9, default_region=None):
+    """
+    根据 detection_settings.templates 创建状态模板列表
+    未配置时使用 target_button_image 作为唯一的 send_button 状态，与原有行为一致
+    """
+    if not items:
+        return [StateTemplate('send_button', default_image, default_threshold, region=default_region)]
+    return [StateTemplate.from_config(item, default_threshold, default_region) for item in items]
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+状态检测流程
+功能：把一次检测的完整路径封装起来，监控器和离线回放共用同一份实现：
+规划各窗口各模板的搜索区域 -> 只截图一次外接矩形 -> 共享预处理 -> 画面变化判断 -> 多模板匹配
+后台截图时改为逐个窗口截取窗口自身的内容（detect_windows），窗口被遮挡时也能检测
+本模块不依赖 win32 和 pyautogui，窗口范围由调用方提供
+"""
+
+import logging
+import threading
+
+from detection_engine import INPUT_ACTIONS
+from frame_change import FrameChangeDetector
+from matchers import prepare_frame, ArrayPool
+from metrics import NULL_METRICS
+from monitor_logging import THROTTLE
+from roi_tracker import ROITracker
+from window_state import WindowState
+
+log = logging.getLogger(__name__)
+
+
+class DetectionRunner:
+    """
+    状态检测流程
+
+    Args:
+        engine: DetectionEngine
+        capture: 截图后端
+        roi_padding: ROI 在上次命中位置四周扩展的像素数
+        roi_max_misses: ROI 连续未命中多少次后全屏搜索一次
+        change_detection: 画面未变化时是否跳过匹配
+        change_tolerance: 画面变化判断的容差
+        max_staleness: 画面未变化时强制重新匹配的最长间隔（秒）
+        metrics: 记录匹配耗时、命中和跳过次数的 MetricsRegistry
+    """
+
+    def __init__(self, engine, capture, roi_padding=100, roi_max_misses=5,
+                 change_detection=True, change_tolerance=2.0, max_staleness=60.0, metrics=NULL_METRICS):
+        self.engine = engine
+        self.capture = capture
+        self.roi_padding = roi_padding
+        self.roi_max_misses = roi_max_misses
+        self.change_detection = change_detection
+        self.change_tolerance = change_tolerance
+        self.max_staleness = max_staleness
+        self.metrics = metrics
+        # 最近一次检测中是否有窗口的画面发生变化
+        self.last_frame_changed = False
+        # 各检测线程预处理画面（灰度图、金字塔）使用的数组，画面尺寸不变时不再重新分配
+        self._pools = threading.local()
+
+    def create_window_state(self, hwnd=None, title=""):
+        """
+        创建一个窗口的检测状态
+        """
+        def roi_tracker_factory(name):
+            # 每个状态模板使用各自配置的检测区域
+            spec = self.engine.get_spec(name)
+            return ROITracker(
+                padding=self.roi_padding,
+                max_misses=self.roi_max_misses,
+                search_region=spec.region if spec else None
+            )
+
+        return WindowState(hwnd, title, roi_tracker_factory, self.create_change_detector())
+
+    def create_change_detector(self):
+        """
+        按当前设置创建画面变化检测器，未启用时返回 None
+        """
+        if not self.change_detection:
+            return None
+        return FrameChangeDetector(tolerance=self.change_tolerance, max_staleness=self.max_staleness)
+
+    def plan(self, targets):
+        """
+        计算每个窗口中各状态模板本次的搜索区域
+        Args:
+            targets: [(WindowState, 窗口区域 (x, y, w, h) 或 None), ...]，None 表示整个屏幕
+        返回: [(WindowState, [PlannedSearch, ...]), ...]
+        """
+        loaded = self.engine.load_templates()
+        for error in self.engine.last_errors:
+            log.error("❌ 错误: %s", error, extra=THROTTLE)
+        if not loaded:
+            return []
+
+        screen_bounds = self.capture.get_screen_bounds()
+        plans = []
+        for state, bounds in targets:
+            with state.lock:
+                state.bounds = bounds
+                planned = self.engine.plan(state, screen_bounds, bounds, loaded)
+            if planned:
+                plans.append((state, planned))
+        return plans
+
+    @staticmethod
+    def union_region(plans):
+        """
+        返回所有窗口所有搜索区域的外接矩形 (x, y, w, h)
+        """
+        regions = [search.region for _, planned in plans for search in planned]
+        x0 = min(r[0] for r in regions)
+        y0 = min(r[1] for r in regions)
+        x1 = max(r[0] + r[2] for r in regions)
+        y1 = max(r[1] + r[3] for r in regions)
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def detect(self, plans, frame_buffer=None):
+        """
+        截取所有搜索区域的外接矩形一次，并检测各窗口的状态
+        返回: [(WindowState, [StateHit, ...]), ...]，只包含有命中的窗口
+        """
+        if not plans:
+            return []
+        capture_box = self.union_region(plans)
+        frame = self.capture.grab(capture_box, frame_buffer)
+        if frame is None:
+            log.error("❌ 错误: 截图失败", extra=THROTTLE)
+            return []
+        return self.match(frame, capture_box, plans)
+
+    def capture_jobs(self, plans, per_window, frame_buffers):
+        """
+        截取检测需要的画面，截图和匹配分开进行时使用（流水线、异步运行时）
+        per_window 为 False 时截取所有搜索区域的外接矩形一次；为 True 时（后台截图）逐个截取各窗口自身的内容，
+        没有窗口区域的状态合并按屏幕区域截图
+        Args:
+            frame_buffers: 函数，参数为需要的数量，返回同样数量的 FrameBuffer，画面匹配完成前不能被其他截图使用
+        返回: [(画面, 画面在屏幕上的位置 (x, y, w, h), plans), ...]，截图失败的部分不包含在内
+        """
+        if per_window:
+            parts = [(state.bounds, [(state, planned)]) for state, planned in plans if state.bounds is not None]
+            screen_plans = [(state, planned) for state, planned in plans if state.bounds is None]
+            if screen_plans:
+                parts.append((None, screen_plans))
+        else:
+            parts = [(None, plans)] if plans else []
+
+        jobs = []
+        for (box, part_plans), frame_buffer in zip(parts, frame_buffers(len(parts))):
+            if box is None:
+                box = self.union_region(part_plans)
+                frame = self.capture.grab(box, frame_buffer)
+            else:
+                frame = self.capture.grab_window(part_plans[0][0].hwnd, box, frame_buffer)
+            if frame is None:
+                log.error("❌ 错误: 截图失败", extra=THROTTLE)
+                continue
+            jobs.append((frame, box, part_plans))
+        return jobs
+
+    def detect_windows(self, plans, frame_buffer=None):
+        """
+        后台截图：逐个窗口截取窗口自身的内容（不受遮挡影响），再检测该窗口的状态
+        没有窗口区域的状态（整个屏幕）仍按屏幕区域截图
+        返回: [(WindowState, [StateHit, ...]), ...]，只包含有命中的窗口
+        """
+        results = []
+        frame_changed = False
+        for state, planned in plans:
+            if state.bounds is None:
+                results.extend(self.detect([(state, planned)], frame_buffer))
+            else:
+                frame = self.capture.grab_window(state.hwnd, state.bounds, frame_buffer)
+                if frame is None:
+                    log.error("❌ 错误: 窗口截图失败 (%s)", state.title, extra=THROTTLE)
+                    continue
+                results.extend(self.match(frame, state.bounds, [(state, planned)]))
+            frame_changed = frame_changed or self.last_frame_changed
+        self.last_frame_changed = frame_changed
+        return results
+
+    def match(self, frame, frame_box, plans):
+        """
+        在共享画面中分别检测各窗口的所有状态，画面的灰度图和金字塔只计算一次
+        Args:
+            frame: 覆盖 frame_box 的画面
+            frame_box: 画面在屏幕上的位置 (x, y, w, h)
+        返回: [(WindowState, [StateHit, ...]), ...]，只包含有命中的窗口
+        """
+        prepared = prepare_frame(frame, self._prepare_pool())
+        results = []
+        frame_changed = False
+        for state, planned in plans:
+            # 同一窗口的ROI和画面基准不能被多个检测线程同时修改
+            with state.lock:
+                hits = self._detect_window(state, prepared, frame_box, planned)
+            frame_changed = frame_changed or state.last_frame_changed
+            if hits:
+                results.append((state, hits))
+        self.last_frame_changed = frame_changed
+        return results
+
+    def _prepare_pool(self):
+        pool = getattr(self._pools, 'pool', None)
+        if pool is None:
+            pool = self._pools.pool = ArrayPool()
+        return pool
+
+    def _detect_window(self, state, prepared, frame_box, planned):
+        """
+        在一个窗口内检测所有状态，并更新该窗口各模板的ROI和画面变化状态
+        返回: 排序后的 [StateHit, ...]
+        """
+        # 窗口内所有搜索区域的画面没有变化时跳过匹配，沿用上一次的结果
+        state.last_frame_changed = False
+        if state.change_detector:
+            window_box = self.union_region([(state, planned)])
+            ox, oy = frame_box[0], frame_box[1]
+            search_area = prepared.crop((window_box[0] - ox, window_box[1] - oy, window_box[2], window_box[3]))
+            evaluate = state.change_detector.should_evaluate(search_area, window_box)
+            state.last_frame_changed = state.change_detector.last_changed
+            if not evaluate:
+                self.metrics.inc('frames_skipped')
+                return state.last_hits
+
+        near_misses = [] if self.engine.near_miss_margin > 0 else None
+        with self.metrics.step('match'):
+            hits = self.engine.evaluate(prepared, frame_box, planned, near_misses)
+        self.metrics.inc('frames_matched')
+        if near_misses:
+            state.record_near_misses(near_misses)
+        if hits:
+            state.hits += 1
+            state.record_scores(hits)
+        for hit in hits:
+            self.metrics.inc('hits', state=hit.name)
+        # 只记录的状态在重新匹配时输出一次
+        for hit in hits:
+            if hit.action not in INPUT_ACTIONS:
+                log.warning("⚠️  检测到状态 %s: %s, 匹配度 %.3f (%s)", hit.name, hit.position, hit.score, state.title)
+        state.last_hits = hits
+        return hits
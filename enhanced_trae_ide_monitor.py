@@ -8,10 +8,11 @@
 3. 具备窗口管理功能，确保监控的可靠性
 """
 
+import asyncio
+import copy
 import time
 import pyautogui
 import cv2
-import numpy as np
 from PIL import Image
 import os
 import win32gui
@@ -19,25 +20,179 @@ import win32con
 import win32api
 import pyperclip
 import json
+import logging
+from template_cache import TemplateCache, scale_range
+from matchers import create_matcher
+from detection_engine import (DetectionEngine, build_state_templates, index_templates, INPUT_ACTIONS,
+                              ACTION_SEND_MESSAGE, ACTION_CLICK)
+from capture_backends import create_capture_backend, rect_to_bbox, FrameBuffer, DEFAULT_CAPTURE_BACKEND
+from adaptive_scheduler import AdaptivePollingScheduler
+from detection_runner import DetectionRunner
+from threshold_calibrator import ThresholdCalibrator
+from monitor_pipeline import MonitorPipeline
+from monitor_async import AsyncMonitorRuntime
+from monitor_snapshot import MonitorSnapshot
+from action_state import ActionGuard
+from window_registry import WindowRegistry, Win32WindowPlatform
+from window_classifier import WindowTitleClassifier
+from timing import wait_until
+from metrics import MetricsRegistry, MetricsServer, MetricsDumper
+from config_watcher import ConfigWatcher, validate_config
+from input_layout import InputLayout
+from monitor_logging import THROTTLE, load_logging_settings, setup_logging, shutdown_logging
+
+log = logging.getLogger(__name__)
 
 class EnhancedTraeIDEMonitor:
-    def __init__(self, config_file="config.json"):
+    # 修改后需要重启才能生效的配置属性，热加载时保持原值
+    RESTART_ATTRIBUTES = frozenset((
+        'pipeline_mode', 'detection_workers', 'queue_size', 'multi_window', 'use_window_events',
+        'calibration_file', 'config_reload_interval', 'metrics_http_enabled', 'metrics_host',
+        'metrics_port', 'metrics_dump_file', 'metrics_dump_interval', 'state_file',
+    ))
+    
+    def __init__(self, config_file="config.json", window_platform=None):
         # 加载配置文件
         self.load_config(config_file)
         
+        # 运行指标：各阶段耗时、次数统计，可通过本地HTTP接口或JSON文件查看
+        self.metrics = MetricsRegistry()
+        
+        # 窗口标题分类器，规则编译为单个正则并按标题缓存结果
+        self.window_classifier = WindowTitleClassifier(
+            trae_indicators=self.trae_indicators,
+            exclude_keywords=self.exclude_keywords,
+            interfering_keywords=self.interfering_keywords
+        )
+        
+        # 窗口注册表：缓存窗口分类，按事件或TTL增量更新，避免每次都枚举所有窗口
+        self.window_registry = WindowRegistry(
+            window_platform or Win32WindowPlatform(),
+            self._classify_window_title,
+            ttl=self.registry_ttl,
+            use_events=self.use_window_events,
+            metrics=self.metrics
+        )
+        
+        # 模板缓存，避免每次循环都重新读取和解码图片；同时生成各缩放比例的模板
+        self.template_cache = TemplateCache(scales=scale_range(self.scale_min, self.scale_max, self.scale_step))
+        
+        # 模板匹配器（exhaustive 或 pyramid）
+        self.matcher = create_matcher(self.matcher_name, **self.matcher_options)
+        
+        # 匹配阈值校准：按确认结果记录匹配分数（包括发送前的近似命中），自动推导并保存阈值
+        self.threshold_calibrator = ThresholdCalibrator(
+            path=self.calibration_file,
+            hysteresis=self.threshold_hysteresis,
+            bounds=self.threshold_bounds,
+            apply=self.auto_threshold
+        )
+        
+        # 多状态检测引擎：所有状态模板在同一次截图上一起匹配
+        self.detection_engine = DetectionEngine(
+            self.template_cache,
+            self.matcher,
+            build_state_templates(self.state_templates, self.target_button_path,
+                                  self.match_threshold, self.search_region),
+            calibrator=self.threshold_calibrator,
+            near_miss_margin=self.near_miss_margin
+        )
+        
+        # 各状态命中后的处理动作，参数为命中结果和所在窗口句柄，返回 (是否执行成功, 是否已验证生效)
+        self.action_handlers = {
+            ACTION_SEND_MESSAGE: lambda hit, hwnd: self.send_message(hit.position, hit.name, hit.scale, hwnd),
+            ACTION_CLICK: self.click_state,
+        }
+        
+        # 输入框和鼠标安全位置：按命中的按钮位置和窗口区域推算
+        self.input_layout = self._create_input_layout()
+        
+        # 截图后端，只截取需要匹配的区域
+        self.capture = create_capture_backend(self.capture_backend, **self.capture_options)
+        self.capture.metrics = self.metrics
+        self._check_capture_backend()
+        
+        # 最近一次找到的Trae窗口句柄
+        self.trae_hwnd = None
+        
+        # 检测流程：搜索区域规划、截图、画面变化判断和多模板匹配
+        self.detector = DetectionRunner(
+            self.detection_engine,
+            self.capture,
+            roi_padding=self.roi_padding,
+            roi_max_misses=self.roi_max_misses,
+            change_detection=self.change_detection,
+            change_tolerance=self.change_tolerance,
+            max_staleness=self.max_staleness,
+            metrics=self.metrics
+        )
+        
+        # 各窗口的动作状态转换规则：发送后等待按钮消失确认，未生效时指数退避重试
+        self.action_guard = ActionGuard(
+            cooldown=self.send_cooldown,
+            confirm_timeout=self.confirm_timeout,
+            max_retries=self.max_send_retries,
+            backoff_base=self.retry_backoff,
+            backoff_factor=self.retry_backoff_factor,
+            backoff_max=self.retry_backoff_max,
+            metrics=self.metrics,
+            calibrator=self.threshold_calibrator
+        )
+        
+        # 单窗口模式下的检测状态（各模板的ROI、画面变化基准、上次命中的状态）
+        self.default_state = self._create_window_state(None, "")
+        
+        # 多实例模式下每个Trae窗口的独立状态，键为窗口句柄
+        self.window_states = {}
+        self.last_frame_changed = False
+        
+        # 监控状态快照：定期保存各窗口的ROI、缩放比例和发送时间，重启后第一轮即可局部搜索
+        self.state_snapshot = None
+        if self.state_file:
+            self.state_snapshot = MonitorSnapshot(self.state_file, self.state_save_interval, self.state_max_age)
+            self.state_snapshot.load(self.capture.get_screen_bounds())
+        
+        # 自适应轮询调度器，interval_seconds 作为最长间隔
+        self.scheduler = None
+        if self.adaptive_polling:
+            self.scheduler = AdaptivePollingScheduler(
+                min_interval=self.min_interval,
+                max_interval=self.monitor_interval,
+                backoff_factor=self.backoff_factor,
+                pre_stop_lead=self.pre_stop_lead
+            )
+        # 已记录到指标中的反应时间数量
+        self._reactions_recorded = 0
+        
+        # 配置文件变化检查，变化后在两轮监控之间应用
+        self.config_watcher = None
+        if self.config_reload_interval > 0 and os.path.exists(config_file):
+            self.config_watcher = ConfigWatcher(config_file, self.config_reload_interval)
+        # 已修改但需要重启才能生效的配置属性
+        self._pending_restart = set()
+        
+        # 发送过程中检查界面变化使用的小缓冲区
+        self._probe_buffer = FrameBuffer()
+        
         # Trae IDE窗口标题关键词
         self.trae_window_keywords = ["Trae", "trae", "IDE", "ide"]
         
         # 设置pyautogui的安全设置
+        # 各步骤之间改为按条件等待，这里只保留很短的固定间隔
         pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.5
+        pyautogui.PAUSE = self.action_pause
         
-        print("增强版Trae IDE监控器已启动...")
-        print(f"监控间隔: {self.monitor_interval}秒")
-        print(f"目标文本: {self.input_text}")
-        print(f"匹配阈值: {self.match_threshold}")
-        print("具备窗口自动激活功能")
-        print("按Ctrl+C停止监控")
+        log.info("增强版Trae IDE监控器已启动...")
+        log.info("监控间隔: %s秒", self.monitor_interval)
+        log.info("目标文本: %s", self.input_text)
+        log.info("匹配阈值: %s", self.match_threshold)
+        log.info("检测状态: %s", ', '.join(spec.name for spec in self.detection_engine.templates))
+        log.info("模板缩放比例: %s", self.template_cache.scales)
+        if self.background_capture:
+            log.info("后台截图模式：只在需要发送时激活窗口")
+        else:
+            log.info("具备窗口自动激活功能")
+        log.info("按Ctrl+C停止监控")
     
     def load_config(self, config_file):
         """
@@ -48,152 +203,468 @@ class EnhancedTraeIDEMonitor:
                 with open(config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
                 
-                # 监控设置
-                self.monitor_interval = config.get('monitor_settings', {}).get('interval_seconds', 15)
-                
-                # 消息设置
-                self.input_text = config.get('message_settings', {}).get('trigger_message', '继续你的使命')
-                
-                # 检测设置
-                detection_settings = config.get('detection_settings', {})
-                self.match_threshold = detection_settings.get('match_threshold', 0.95)
-                self.target_button_path = detection_settings.get('target_button_image', 'dd.PNG')
-                
-                # 位置设置
-                position_settings = config.get('position_settings', {})
-                self.input_box_x = position_settings.get('input_box_x', 1670)
-                self.input_box_y = position_settings.get('input_box_y', 844)
-                self.safe_mouse_x = position_settings.get('safe_mouse_x', 1720)
-                self.safe_mouse_y = position_settings.get('safe_mouse_y', 100)
-                
-                # 窗口设置
-                window_settings = config.get('window_settings', {})
-                self.auto_minimize = window_settings.get('auto_minimize', True)
-                self.auto_activate = window_settings.get('auto_activate', True)
-                
-                print(f"✅ 配置文件 {config_file} 加载成功")
+                for error in validate_config(config):
+                    log.warning("⚠️  配置项 %s", error)
+                self.apply_config(config)
+                log.info("✅ 配置文件 %s 加载成功", config_file)
             else:
-                print(f"⚠️  配置文件 {config_file} 不存在，使用默认配置")
+                log.warning("⚠️  配置文件 %s 不存在，使用默认配置", config_file)
                 self.use_default_config()
         except Exception as e:
-            print(f"❌ 加载配置文件失败: {e}")
-            print("使用默认配置")
+            log.error("❌ 加载配置文件失败: %s", e)
+            log.info("使用默认配置")
             self.use_default_config()
     
+    def apply_config(self, config):
+        """
+        从配置内容设置各配置属性，缺少的配置项使用默认值
+        """
+        # 监控设置
+        monitor_settings = config.get('monitor_settings', {})
+        self.monitor_interval = monitor_settings.get('interval_seconds', 15)
+        self.adaptive_polling = monitor_settings.get('adaptive_polling', True)
+        self.min_interval = monitor_settings.get('min_interval_seconds', 2)
+        self.backoff_factor = monitor_settings.get('backoff_factor', 1.5)
+        self.pre_stop_lead = monitor_settings.get('pre_stop_lead_seconds', 5)
+        self.pipeline_mode = monitor_settings.get('pipeline', False)
+        self.detection_workers = monitor_settings.get('detection_workers', 2)
+        self.queue_size = monitor_settings.get('queue_size', 2)
+        self.config_reload_interval = monitor_settings.get('config_reload_seconds', 2)
+        self.state_file = monitor_settings.get('state_file', 'monitor_state.json')
+        self.state_save_interval = monitor_settings.get('state_save_seconds', 30)
+        self.state_max_age = monitor_settings.get('state_max_age_seconds', 3600)
+        
+        # 消息设置
+        message_settings = config.get('message_settings', {})
+        self.input_text = message_settings.get('trigger_message', '继续你的使命')
+        self.action_pause = message_settings.get('action_pause_seconds', 0.05)
+        self.wait_timeout = message_settings.get('wait_timeout_seconds', 2.0)
+        
+        # 检测设置
+        detection_settings = config.get('detection_settings', {})
+        self.match_threshold = detection_settings.get('match_threshold', 0.95)
+        self.target_button_path = detection_settings.get('target_button_image', 'dd.PNG')
+        self.roi_padding = detection_settings.get('roi_padding', 100)
+        self.roi_max_misses = detection_settings.get('roi_max_misses', 5)
+        self.search_region = detection_settings.get('search_region')
+        self.state_templates = detection_settings.get('templates')
+        self.scale_min = detection_settings.get('scale_min', 1.0)
+        self.scale_max = detection_settings.get('scale_max', 1.0)
+        self.scale_step = detection_settings.get('scale_step', 0.25)
+        self.auto_threshold = detection_settings.get('auto_threshold', True)
+        self.near_miss_margin = detection_settings.get('near_miss_margin', 0.1)
+        self.calibration_file = detection_settings.get('calibration_file', 'threshold_calibration.json')
+        self.threshold_hysteresis = detection_settings.get('threshold_hysteresis', 0.02)
+        self.threshold_bounds = detection_settings.get('threshold_bounds', [0.75, 0.98])
+        self.change_detection = detection_settings.get('change_detection', True)
+        self.change_tolerance = detection_settings.get('change_tolerance', 2.0)
+        self.max_staleness = detection_settings.get('max_staleness_seconds', 60)
+        self.matcher_name = detection_settings.get('matcher', 'exhaustive')
+        self.matcher_options = {}
+        if self.matcher_name == 'pyramid':
+            self.matcher_options = {
+                'levels': detection_settings.get('pyramid_levels', 1),
+                'grayscale': detection_settings.get('pyramid_grayscale', True),
+                'candidates': detection_settings.get('pyramid_candidates', 3),
+            }
+        elif self.matcher_name == 'tiled':
+            self.matcher_options = {
+                'tile_size': detection_settings.get('tile_size', 1024),
+                'workers': detection_settings.get('tile_workers'),
+                'executor': detection_settings.get('tile_executor', 'thread'),
+            }
+        
+        # 位置设置
+        position_settings = config.get('position_settings', {})
+        self.input_box_x = position_settings.get('input_box_x', 1670)
+        self.input_box_y = position_settings.get('input_box_y', 844)
+        self.safe_mouse_x = position_settings.get('safe_mouse_x', 1720)
+        self.safe_mouse_y = position_settings.get('safe_mouse_y', 100)
+        # 配置了固定的输入框位置时默认沿用该位置，避免已校准的安装升级后点击到别处
+        has_input_box = 'input_box_x' in position_settings or 'input_box_y' in position_settings
+        self.layout_mode = position_settings.get('layout', 'fixed' if has_input_box else 'relative')
+        # 未配置偏移时在第一次命中时由输入框位置减去按钮中心得到
+        self.input_offset = None
+        if 'input_offset_x' in position_settings and 'input_offset_y' in position_settings:
+            self.input_offset = (position_settings['input_offset_x'], position_settings['input_offset_y'])
+        self.safe_mouse_ratio = position_settings.get('safe_mouse_ratio', [0.9, 0.1])
+        self.layout_check_tolerance = position_settings.get('layout_check_tolerance', 40)
+        
+        # 截图设置
+        capture_settings = config.get('capture_settings', {})
+        self.capture_backend = capture_settings.get('backend', DEFAULT_CAPTURE_BACKEND)
+        self.capture_options = {}
+        if self.capture_backend in ('file', 'fake_window'):
+            self.capture_options = {'source': capture_settings.get('frame_source', 'detection_result.png')}
+        self.capture_window_only = capture_settings.get('window_only', True)
+        self.background_capture = capture_settings.get('background', False)
+        
+        # 窗口设置
+        window_settings = config.get('window_settings', {})
+        self.auto_minimize = window_settings.get('auto_minimize', True)
+        self.auto_activate = window_settings.get('auto_activate', True)
+        self.multi_window = window_settings.get('multi_window', False)
+        self.send_cooldown = window_settings.get('send_cooldown_seconds', 10)
+        self.confirm_timeout = window_settings.get('confirm_timeout_seconds', 3)
+        self.max_send_retries = window_settings.get('max_send_retries', 2)
+        self.retry_backoff = window_settings.get('retry_backoff_seconds', 5)
+        self.retry_backoff_factor = window_settings.get('retry_backoff_factor', 2)
+        self.retry_backoff_max = window_settings.get('retry_backoff_max_seconds', 120)
+        self.registry_ttl = window_settings.get('registry_ttl_seconds', 5)
+        self.use_window_events = window_settings.get('use_window_events', True)
+        self.trae_indicators = window_settings.get('trae_indicators')
+        self.exclude_keywords = window_settings.get('exclude_keywords')
+        self.interfering_keywords = window_settings.get('interfering_keywords')
+        
+        # 指标设置
+        metrics_settings = config.get('metrics_settings', {})
+        self.metrics_http_enabled = metrics_settings.get('http_enabled', False)
+        self.metrics_host = metrics_settings.get('host', '127.0.0.1')
+        self.metrics_port = metrics_settings.get('port', 9464)
+        self.metrics_dump_file = metrics_settings.get('json_dump_file')
+        self.metrics_dump_interval = metrics_settings.get('json_dump_interval_seconds', 60)
+    
     def use_default_config(self):
         """
         使用默认配置
         """
         self.monitor_interval = 15
+        self.adaptive_polling = True
+        self.min_interval = 2
+        self.backoff_factor = 1.5
+        self.pre_stop_lead = 5
+        self.pipeline_mode = False
+        self.detection_workers = 2
+        self.queue_size = 2
+        self.config_reload_interval = 2
+        self.state_file = "monitor_state.json"
+        self.state_save_interval = 30
+        self.state_max_age = 3600
         self.input_text = "继续你的使命"
+        self.action_pause = 0.05
+        self.wait_timeout = 2.0
         self.match_threshold = 0.95
         self.target_button_path = "dd.PNG"
+        self.roi_padding = 100
+        self.roi_max_misses = 5
+        self.search_region = None
+        self.state_templates = None
+        self.scale_min = 1.0
+        self.scale_max = 1.0
+        self.scale_step = 0.25
+        self.auto_threshold = True
+        self.near_miss_margin = 0.1
+        self.calibration_file = "threshold_calibration.json"
+        self.threshold_hysteresis = 0.02
+        self.threshold_bounds = [0.75, 0.98]
+        self.change_detection = True
+        self.change_tolerance = 2.0
+        self.max_staleness = 60
+        self.matcher_name = "exhaustive"
+        self.matcher_options = {}
         self.input_box_x = 1670
         self.input_box_y = 844
         self.safe_mouse_x = 1720
         self.safe_mouse_y = 100
+        self.layout_mode = "relative"
+        self.input_offset = None
+        self.safe_mouse_ratio = [0.9, 0.1]
+        self.layout_check_tolerance = 40
+        self.capture_backend = DEFAULT_CAPTURE_BACKEND
+        self.capture_options = {}
+        self.capture_window_only = True
+        self.background_capture = False
         self.auto_minimize = True
         self.auto_activate = True
+        self.multi_window = False
+        self.send_cooldown = 10
+        self.confirm_timeout = 3
+        self.max_send_retries = 2
+        self.retry_backoff = 5
+        self.retry_backoff_factor = 2
+        self.retry_backoff_max = 120
+        self.registry_ttl = 5
+        self.use_window_events = True
+        self.trae_indicators = None
+        self.exclude_keywords = None
+        self.interfering_keywords = None
+        self.metrics_http_enabled = False
+        self.metrics_host = "127.0.0.1"
+        self.metrics_port = 9464
+        self.metrics_dump_file = None
+        self.metrics_dump_interval = 60
+    
+    def reload_config(self, config):
+        """
+        应用新的配置内容：先在副本上解析配置并创建需要替换的组件，全部成功后再一起替换，
+        只重建依赖已变化配置项的组件和缓存，其余模板的ROI、窗口状态和统计保持不变
+        返回: 已应用的配置属性名集合
+        """
+        staged = copy.copy(self)
+        staged.apply_config(config)
+        current = vars(self)
+        changed = {name for name, value in vars(staged).items() if current.get(name) != value}
+        restart = changed & self.RESTART_ATTRIBUTES
+        changed -= self.RESTART_ATTRIBUTES
+        if restart and restart != self._pending_restart:
+            log.warning("⚠️  以下配置项需要重启后生效: %s", ', '.join(sorted(restart)))
+        self._pending_restart = restart
+        if not changed:
+            return changed
+        
+        # 第一步：创建新组件，任何一步失败都不修改当前状态
+        templates = matcher = capture = scales = classifier = None
+        try:
+            if changed & {'state_templates', 'target_button_path', 'match_threshold', 'search_region'}:
+                templates = build_state_templates(staged.state_templates, staged.target_button_path,
+                                                  staged.match_threshold, staged.search_region)
+                index_templates(templates)
+            if changed & {'matcher_name', 'matcher_options'}:
+                matcher = create_matcher(staged.matcher_name, **staged.matcher_options)
+            if changed & {'capture_backend', 'capture_options'}:
+                capture = create_capture_backend(staged.capture_backend, **staged.capture_options)
+            if changed & {'scale_min', 'scale_max', 'scale_step'}:
+                scales = scale_range(staged.scale_min, staged.scale_max, staged.scale_step)
+            if changed & {'trae_indicators', 'exclude_keywords', 'interfering_keywords'}:
+                classifier = WindowTitleClassifier(
+                    trae_indicators=staged.trae_indicators,
+                    exclude_keywords=staged.exclude_keywords,
+                    interfering_keywords=staged.interfering_keywords
+                )
+        except Exception as e:
+            log.error("❌ 新配置无法应用，继续使用当前配置: %s", e)
+            return set()
+        
+        # 第二步：替换配置属性和组件
+        for name in changed:
+            setattr(self, name, getattr(staged, name))
+        pyautogui.PAUSE = self.action_pause
+        
+        if matcher is not None:
+            old_matcher, self.matcher = self.matcher, matcher
+            self.detection_engine.matcher = matcher
+            old_matcher.close()
+        if capture is not None:
+            capture.metrics = self.metrics
+            old_capture, self.capture = self.capture, capture
+            self.detector.capture = capture
+            old_capture.close()
+        if changed & {'capture_backend', 'background_capture'}:
+            self._check_capture_backend()
+        if scales is not None:
+            self.template_cache.set_scales(scales)
+        if classifier is not None:
+            self.window_classifier = classifier
+            self.window_registry.invalidate()
+        self.window_registry.ttl = self.registry_ttl
+        if changed & {'layout_mode', 'input_offset', 'safe_mouse_ratio', 'layout_check_tolerance',
+                      'input_box_x', 'input_box_y', 'safe_mouse_x', 'safe_mouse_y'}:
+            self.input_layout = self._create_input_layout()
+        
+        # 只丢弃模板图片或检测区域变化的状态的ROI
+        forget = set()
+        if templates is not None:
+            old_specs = {spec.name: (spec.image, spec.region) for spec in self.detection_engine.templates}
+            self.detection_engine.set_templates(templates)
+            new_specs = {spec.name: (spec.image, spec.region) for spec in templates}
+            forget = {name for name in old_specs if old_specs[name] != new_specs.get(name)}
+            for image in {image for image, _ in old_specs.values()} - {image for image, _ in new_specs.values()}:
+                self.template_cache.invalidate(image)
+        
+        detector = self.detector
+        roi_changed = bool(changed & {'roi_padding', 'roi_max_misses'})
+        change_detection_changed = bool(changed & {'change_detection', 'change_tolerance', 'max_staleness'})
+        detector.roi_padding = self.roi_padding
+        detector.roi_max_misses = self.roi_max_misses
+        detector.change_detection = self.change_detection
+        detector.change_tolerance = self.change_tolerance
+        detector.max_staleness = self.max_staleness
+        for state in [self.default_state] + list(self.window_states.values()):
+            with state.lock:
+                if change_detection_changed:
+                    state.change_detector = detector.create_change_detector()
+                if roi_changed:
+                    state.forget_templates()
+                elif forget:
+                    state.forget_templates(forget)
+                if scales is not None:
+                    state.best_scales.clear()
+        
+        self.action_guard.configure(self.send_cooldown, self.confirm_timeout, self.max_send_retries,
+                                    self.retry_backoff, self.retry_backoff_factor, self.retry_backoff_max)
+        if self.state_snapshot is not None:
+            self.state_snapshot.save_interval = self.state_save_interval
+            self.state_snapshot.max_age = self.state_max_age
+        
+        calibrator = self.threshold_calibrator
+        calibrator.apply = self.auto_threshold
+        calibrator.hysteresis = self.threshold_hysteresis
+        calibrator.bounds = tuple(self.threshold_bounds)
+        self.detection_engine.near_miss_margin = self.near_miss_margin
+        
+        if not self.adaptive_polling:
+            self.scheduler = None
+        elif self.scheduler is None:
+            self.scheduler = AdaptivePollingScheduler(
+                min_interval=self.min_interval,
+                max_interval=self.monitor_interval,
+                backoff_factor=self.backoff_factor,
+                pre_stop_lead=self.pre_stop_lead
+            )
+            self._reactions_recorded = 0
+        else:
+            self.scheduler.configure(self.min_interval, self.monitor_interval, self.backoff_factor, self.pre_stop_lead)
+        
+        self.metrics.inc('config_reloads')
+        log.info("🔁 已重新加载配置: %s", ', '.join(sorted(changed)))
+        return changed
+    
+    def find_trae_windows(self):
+        """
+        查找所有Trae IDE窗口
+        返回: [(窗口句柄, 标题), ...]
+        """
+        return self.window_registry.get_windows('trae')
     
     def find_trae_window(self):
         """
         查找Trae IDE窗口
         返回: 窗口句柄或None
         """
-        def enum_windows_callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                window_title = win32gui.GetWindowText(hwnd)
-                if window_title:
-                    # 更精确的Trae窗口识别逻辑
-                    if self._is_trae_window(window_title):
-                        windows.append((hwnd, window_title))
-            return True
-        
-        windows = []
-        win32gui.EnumWindows(enum_windows_callback, windows)
+        windows = self.find_trae_windows()
         
         if windows:
-            print(f"找到 {len(windows)} 个可能的Trae窗口:")
+            log.debug("找到 %s 个可能的Trae窗口:", len(windows))
             for hwnd, title in windows:
-                print(f"  - {title}")
+                log.debug("  - %s", title)
             # 返回第一个找到的窗口
-            return windows[0][0]
+            self.trae_hwnd = windows[0][0]
+            return self.trae_hwnd
         
+        self.trae_hwnd = None
         return None
     
+    def get_trae_window_bbox(self, hwnd=None):
+        """
+        获取Trae窗口区域，hwnd 为 None 时使用最近一次找到的窗口
+        返回: (x, y, w, h) 或 None（窗口不存在或已最小化）
+        """
+        hwnd = hwnd or self.trae_hwnd
+        if not hwnd:
+            return None
+        try:
+            if not win32gui.IsWindow(hwnd) or win32gui.IsIconic(hwnd):
+                return None
+            return rect_to_bbox(win32gui.GetWindowRect(hwnd))
+        except Exception:
+            return None
+    
+    def _check_capture_backend(self):
+        """
+        检查截图后端与当前设置是否匹配：
+        Windows 下 pyautogui 每帧都会分配新的图像，应改用 gdi；
+        后台截图需要截图后端能截取不在前台的窗口，否则窗口被遮挡时检测不到按钮
+        """
+        if self.capture_backend == 'pyautogui' and DEFAULT_CAPTURE_BACKEND != 'pyautogui':
+            log.warning("⚠️  截图后端 pyautogui 每帧都会分配新的图像，建议在 capture_settings 中改用 %s",
+                        DEFAULT_CAPTURE_BACKEND)
+        if self.background_capture and not self.capture.supports_background:
+            log.warning("⚠️  截图后端 %s 不支持后台截图，窗口需保持可见（后台截图请使用 printwindow）",
+                        self.capture_backend)
+    
+    def _show_without_activation(self, hwnd):
+        """
+        后台截图时恢复最小化的窗口但不激活，最小化的窗口无法截取内容
+        返回: 窗口是否未最小化
+        """
+        try:
+            if not win32gui.IsIconic(hwnd):
+                return True
+            log.info("📤 在后台恢复最小化的Trae窗口（不激活）", extra=THROTTLE)
+            win32gui.ShowWindow(hwnd, win32con.SW_SHOWNOACTIVATE)
+            return wait_until(lambda: not win32gui.IsIconic(hwnd), timeout=self.wait_timeout)
+        except Exception as e:
+            log.warning("⚠️  恢复窗口失败: %s", e, extra=THROTTLE)
+            return False
+    
+    def _restore_foreground(self, hwnd):
+        """
+        发送完成后把焦点交还给之前的前台窗口（失败时不重试，不影响本次发送结果）
+        """
+        try:
+            if hwnd and win32gui.IsWindow(hwnd) and win32gui.GetForegroundWindow() != hwnd:
+                win32gui.SetForegroundWindow(hwnd)
+        except Exception as e:
+            log.debug("恢复前台窗口失败: %s", e)
+    
+    def _create_window_state(self, hwnd, title):
+        """
+        创建一个窗口的检测状态
+        """
+        return self.detector.create_window_state(hwnd, title)
+    
+    def refresh_window_states(self):
+        """
+        同步所有Trae窗口的状态：为新窗口创建状态，移除已关闭的窗口
+        返回: 当前窗口状态列表
+        """
+        windows = self.find_trae_windows()
+        current = {}
+        for hwnd, title in windows:
+            state = self.window_states.get(hwnd)
+            if state is None:
+                log.info("🆕 开始监控Trae窗口: %s", title)
+                state = self._create_window_state(hwnd, title)
+            state.title = title
+            current[hwnd] = state
+        
+        for hwnd, state in self.window_states.items():
+            if hwnd not in current:
+                log.info("👋 Trae窗口已关闭: %s", state.title)
+        self.window_states = current
+        self.metrics.set_gauge('windows_monitored', len(current))
+        return list(current.values())
+    
+    def _classify_window_title(self, window_title):
+        """
+        窗口标题分类，供窗口注册表使用
+        返回: 'trae'、'interfering' 或 None
+        """
+        return self.window_classifier.classify(window_title)
+    
     def _is_trae_window(self, window_title):
         """
         判断窗口标题是否为Trae IDE窗口
-        使用更精确的匹配规则，避免误识别
-        """
-        window_title_lower = window_title.lower()
-        
-        # 排除明显不是Trae的窗口
-        exclude_keywords = [
-            '命令提示符', 'cmd', 'powershell', 'terminal',
-            'chrome', 'firefox', 'edge', 'browser',
-            'explorer', 'notepad', 'word', 'excel',
-            'outlook', 'teams', 'zoom', 'skype'
-        ]
-        
-        for exclude in exclude_keywords:
-            if exclude in window_title_lower:
-                return False
-        
-        # 精确匹配Trae IDE窗口
-        # 1. 包含"Trae"且不包含其他应用名称
-        if 'trae' in window_title_lower:
-            # 确保是真正的Trae IDE窗口，而不是包含"trae"的其他窗口
-            trae_indicators = [
-                '- trae',  # 典型的Trae IDE窗口格式
-                'trae -',  # 另一种格式
-                'trae ide',  # 明确的IDE标识
-                '.py - trae',  # Python文件在Trae中打开
-                '.js - trae',  # JavaScript文件
-                '.md - trae',  # Markdown文件
-                '.json - trae',  # JSON文件
-                '.txt - trae',  # 文本文件
-            ]
-            
-            for indicator in trae_indicators:
-                if indicator in window_title_lower:
-                    return True
-        
-        return False
+        使用更精确的匹配规则（排除其他应用，要求典型的Trae标题格式），避免误识别
+        """
+        return self.window_classifier.is_trae_window(window_title)
     
     def detect_interfering_windows(self):
         """
         检测可能干扰Trae IDE激活的窗口
         返回: 干扰窗口列表，包含窗口句柄、标题和当前状态
         """
-        interfering_keywords = ["Chrome", "chrome", "Firefox", "firefox", "Edge", "edge", 
-                               "浏览器", "Browser", "browser"]
-        
-        def enum_windows_callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                window_title = win32gui.GetWindowText(hwnd)
-                if window_title:
-                    for keyword in interfering_keywords:
-                        if keyword in window_title:
-                            # 记录窗口的当前状态
-                            is_minimized = win32gui.IsIconic(hwnd)
-                            placement = win32gui.GetWindowPlacement(hwnd)
-                            # 检查是否最大化：placement[1] == win32con.SW_SHOWMAXIMIZED
-                            is_maximized = placement[1] == win32con.SW_SHOWMAXIMIZED
-                            
-                            windows.append({
-                                'hwnd': hwnd,
-                                'title': window_title,
-                                'is_minimized': is_minimized,
-                                'is_maximized': is_maximized,
-                                'placement': placement,
-                                'was_foreground': win32gui.GetForegroundWindow() == hwnd
-                            })
-                            break
-            return True
-        
+        foreground = win32gui.GetForegroundWindow()
         windows = []
-        win32gui.EnumWindows(enum_windows_callback, windows)
+        for hwnd, window_title in self.window_registry.get_windows('interfering'):
+            try:
+                # 记录窗口的当前状态
+                is_minimized = win32gui.IsIconic(hwnd)
+                placement = win32gui.GetWindowPlacement(hwnd)
+                # 检查是否最大化：placement[1] == win32con.SW_SHOWMAXIMIZED
+                is_maximized = placement[1] == win32con.SW_SHOWMAXIMIZED
+            except Exception:
+                # 注册表中的窗口可能刚刚关闭
+                continue
+            
+            windows.append({
+                'hwnd': hwnd,
+                'title': window_title,
+                'is_minimized': is_minimized,
+                'is_maximized': is_maximized,
+                'placement': placement,
+                'was_foreground': foreground == hwnd
+            })
         return windows
     
     def handle_interfering_windows(self, restore_mode=False, saved_states=None):
@@ -222,23 +693,23 @@ class EnhancedTraeIDEMonitor:
         if not interfering_windows:
             return []
         
-        print(f"🔍 检测到 {len(interfering_windows)} 个可能的干扰窗口:")
+        log.info("🔍 检测到 %s 个可能的干扰窗口", len(interfering_windows), extra=THROTTLE)
         for window in interfering_windows:
-            print(f"   - {window['title']} (最小化: {window['is_minimized']}, 最大化: {window['is_maximized']})")
+            log.debug("   - %s (最小化: %s, 最大化: %s)", window['title'], window['is_minimized'], window['is_maximized'])
         
         # 只处理当前在前台且未最小化的干扰窗口
         handled_windows = []
         for window in interfering_windows:
             if not window['is_minimized'] and window['was_foreground']:
                 try:
-                    print(f"🔽 温和处理干扰窗口: {window['title']}")
+                    log.debug("🔽 温和处理干扰窗口: %s", window['title'])
                     # 使用更温和的方式：将窗口置于后台而不是最小化
                     win32gui.SetWindowPos(window['hwnd'], win32con.HWND_BOTTOM, 0, 0, 0, 0, 
                                          win32con.SWP_NOMOVE | win32con.SWP_NOSIZE | win32con.SWP_NOACTIVATE)
                     time.sleep(0.2)
                     handled_windows.append(window)
                 except Exception as e:
-                    print(f"   ⚠️  处理失败: {e}")
+                    log.warning("   ⚠️  处理失败: %s", e)
             else:
                 # 记录但不处理已最小化或非前台的窗口
                 handled_windows.append(window)
@@ -258,7 +729,7 @@ class EnhancedTraeIDEMonitor:
         if not saved_states:
             return True
         
-        print(f"🔄 正在恢复 {len(saved_states)} 个窗口的原始状态...")
+        log.debug("🔄 正在恢复 %s 个窗口的原始状态...", len(saved_states))
         success_count = 0
         
         for window in saved_states:
@@ -268,7 +739,7 @@ class EnhancedTraeIDEMonitor:
                 if not win32gui.IsWindow(hwnd):
                     continue
                 
-                print(f"   🔄 恢复窗口: {window['title']}")
+                log.debug("   🔄 恢复窗口: %s", window['title'])
                 
                 # 恢复窗口位置和状态
                 if window['was_foreground'] and not window['is_minimized']:
@@ -290,287 +761,716 @@ class EnhancedTraeIDEMonitor:
                 time.sleep(0.1)
                 
             except Exception as e:
-                print(f"   ⚠️  恢复窗口 {window['title']} 失败: {e}")
+                log.warning("   ⚠️  恢复窗口 %s 失败: %s", window['title'], e)
         
-        print(f"✅ 成功恢复 {success_count}/{len(saved_states)} 个窗口状态")
+        log.debug("✅ 成功恢复 %s/%s 个窗口状态", success_count, len(saved_states))
         return success_count == len(saved_states)
     
-    def activate_trae_window(self):
+    def activate_trae_window(self, hwnd=None, maximize=True):
         """
         激活Trae IDE窗口（增强版，解决窗口焦点竞争问题）
+        每一步都等待窗口状态真正变化，而不是固定等待
+        
+        Args:
+            hwnd: 要激活的窗口句柄，为 None 时自动查找
+            maximize: 激活后是否最大化（多实例并排时应保持原有布局）
+        
         返回: 是否成功激活
         """
-        hwnd = self.find_trae_window()
+        hwnd = hwnd or self.find_trae_window()
         
         if not hwnd:
-            print("❌ 未找到Trae IDE窗口")
+            log.error("❌ 未找到Trae IDE窗口", extra=THROTTLE)
             return False
         
+        def is_foreground():
+            return win32gui.GetForegroundWindow() == hwnd
+        
         try:
+            # 已经在前台且无需最大化时直接返回
+            if is_foreground() and not maximize and not win32gui.IsIconic(hwnd):
+                return True
+            
             # 获取当前前台窗口
             current_foreground = win32gui.GetForegroundWindow()
             current_title = win32gui.GetWindowText(current_foreground) if current_foreground else "未知"
-            print(f"🔍 当前前台窗口: {current_title}")
+            log.debug("🔍 当前前台窗口: %s", current_title)
             
             # 强制激活策略 - 多重尝试
             max_attempts = 3
-            for attempt in range(max_attempts):
-                print(f"🔄 尝试激活Trae IDE窗口 (第{attempt + 1}次)...")
-                
-                # 步骤1: 如果窗口最小化，先恢复
-                if win32gui.IsIconic(hwnd):
-                    print("   📤 恢复最小化窗口...")
-                    win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-                    time.sleep(0.5)
-                
-                # 步骤2: 强制显示窗口
-                win32gui.ShowWindow(hwnd, win32con.SW_SHOW)
-                time.sleep(0.3)
-                
-                # 步骤3: 尝试多种激活方法
-                try:
-                    # 方法1: 标准激活
-                    win32gui.SetForegroundWindow(hwnd)
-                    time.sleep(0.3)
+            with self.metrics.step('activate'):
+                for attempt in range(max_attempts):
+                    log.debug("🔄 尝试激活Trae IDE窗口 (第%s次)...", attempt + 1)
+                    self.metrics.inc('activation_attempts')
                     
-                    # 方法2: 如果失败，使用更强力的方法
-                    if win32gui.GetForegroundWindow() != hwnd:
-                        print("   🔧 使用强制激活方法...")
-                        # 模拟Alt+Tab切换（有时能绕过焦点限制）
-                        win32gui.SetWindowPos(hwnd, win32con.HWND_TOPMOST, 0, 0, 0, 0, 
-                                             win32con.SWP_NOMOVE | win32con.SWP_NOSIZE)
-                        time.sleep(0.2)
-                        win32gui.SetWindowPos(hwnd, win32con.HWND_NOTOPMOST, 0, 0, 0, 0, 
-                                             win32con.SWP_NOMOVE | win32con.SWP_NOSIZE)
-                        win32gui.SetForegroundWindow(hwnd)
-                        time.sleep(0.3)
+                    # 步骤1: 如果窗口最小化，先恢复
+                    if win32gui.IsIconic(hwnd):
+                        log.debug("   📤 恢复最小化窗口...")
+                        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+                        wait_until(lambda: not win32gui.IsIconic(hwnd), timeout=self.wait_timeout)
                     
-                    # 方法3: 最后尝试点击窗口来激活
-                    if win32gui.GetForegroundWindow() != hwnd:
-                        print("   🖱️  尝试点击窗口激活...")
-                        rect = win32gui.GetWindowRect(hwnd)
-                        center_x = (rect[0] + rect[2]) // 2
-                        center_y = (rect[1] + rect[3]) // 2
-                        # 保存当前鼠标位置
-                        original_pos = pyautogui.position()
-                        # 点击窗口中心
-                        pyautogui.click(center_x, center_y)
-                        time.sleep(0.3)
-                        # 恢复鼠标位置
-                        pyautogui.moveTo(original_pos.x, original_pos.y)
+                    # 步骤2: 强制显示窗口
+                    win32gui.ShowWindow(hwnd, win32con.SW_SHOW)
+                    
+                    # 步骤3: 尝试多种激活方法
+                    try:
+                        # 方法1: 标准激活
+                        win32gui.SetForegroundWindow(hwnd)
                         
-                except Exception as inner_e:
-                    print(f"   ⚠️  激活方法异常: {inner_e}")
-                
-                # 步骤4: 最大化窗口
-                win32gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
-                time.sleep(0.5)
-                
-                # 验证激活是否成功
-                current_foreground = win32gui.GetForegroundWindow()
-                if current_foreground == hwnd:
-                    print(f"✅ Trae IDE窗口已成功激活并最大化 (第{attempt + 1}次尝试成功)")
-                    return True
-                else:
-                    current_title = win32gui.GetWindowText(current_foreground) if current_foreground else "未知"
-                    print(f"   ⚠️  激活失败，当前前台窗口仍为: {current_title}")
-                    if attempt < max_attempts - 1:
-                        print(f"   🔄 等待1秒后重试...")
-                        time.sleep(1)
+                        # 方法2: 如果失败，使用更强力的方法
+                        if not wait_until(is_foreground, timeout=0.3):
+                            log.info("   🔧 使用强制激活方法...")
+                            # 模拟Alt+Tab切换（有时能绕过焦点限制）
+                            win32gui.SetWindowPos(hwnd, win32con.HWND_TOPMOST, 0, 0, 0, 0, 
+                                                 win32con.SWP_NOMOVE | win32con.SWP_NOSIZE)
+                            win32gui.SetWindowPos(hwnd, win32con.HWND_NOTOPMOST, 0, 0, 0, 0, 
+                                                 win32con.SWP_NOMOVE | win32con.SWP_NOSIZE)
+                            win32gui.SetForegroundWindow(hwnd)
+                        
+                        # 方法3: 最后尝试点击窗口来激活
+                        if not wait_until(is_foreground, timeout=0.3):
+                            log.info("   🖱️  尝试点击窗口激活...")
+                            rect = win32gui.GetWindowRect(hwnd)
+                            center_x = (rect[0] + rect[2]) // 2
+                            center_y = (rect[1] + rect[3]) // 2
+                            # 保存当前鼠标位置
+                            original_pos = pyautogui.position()
+                            # 点击窗口中心
+                            pyautogui.click(center_x, center_y)
+                            wait_until(is_foreground, timeout=0.3)
+                            # 恢复鼠标位置
+                            pyautogui.moveTo(original_pos.x, original_pos.y)
+                            
+                    except Exception as inner_e:
+                        log.warning("   ⚠️  激活方法异常: %s", inner_e)
+                    
+                    # 步骤4: 最大化窗口
+                    if maximize:
+                        win32gui.ShowWindow(hwnd, win32con.SW_MAXIMIZE)
+                        wait_until(lambda: win32gui.GetWindowPlacement(hwnd)[1] == win32con.SW_SHOWMAXIMIZED,
+                                   timeout=self.wait_timeout)
+                    
+                    # 验证激活是否成功
+                    if is_foreground():
+                        action = "激活并最大化" if maximize else "激活"
+                        log.debug("✅ Trae IDE窗口已成功%s (第%s次尝试成功)", action, attempt + 1)
+                        return True
+                    else:
+                        current_foreground = win32gui.GetForegroundWindow()
+                        current_title = win32gui.GetWindowText(current_foreground) if current_foreground else "未知"
+                        log.warning("   ⚠️  激活失败，当前前台窗口仍为: %s", current_title)
+                        if attempt < max_attempts - 1:
+                            # 重试前等待前台窗口自行切换，最多1秒
+                            log.info("   🔄 等待后重试...")
+                            wait_until(is_foreground, timeout=1)
             
-            print(f"❌ 经过{max_attempts}次尝试，仍无法激活Trae IDE窗口")
-            print("💡 建议手动点击Trae IDE窗口或关闭干扰的应用程序")
+            log.error("❌ 经过%s次尝试，仍无法激活Trae IDE窗口", max_attempts)
+            log.info("💡 建议手动点击Trae IDE窗口或关闭干扰的应用程序")
+            self.metrics.inc('activation_failures')
             return False
             
         except Exception as e:
-            print(f"❌ 激活窗口时发生错误: {e}")
+            log.error("❌ 激活窗口时发生错误: %s", e)
+            self.metrics.inc('activation_failures')
             return False
     
-    def minimize_trae_window(self):
+    def minimize_trae_window(self, hwnd=None):
         """
         将Trae IDE窗口最小化
         返回: 是否成功最小化
         """
-        hwnd = self.find_trae_window()
+        hwnd = hwnd or self.find_trae_window()
         
         if not hwnd:
-            print("❌ 未找到Trae IDE窗口，无法最小化")
+            log.error("❌ 未找到Trae IDE窗口，无法最小化", extra=THROTTLE)
             return False
         
         try:
-            print("🔽 正在最小化Trae IDE窗口...")
+            log.debug("🔽 正在最小化Trae IDE窗口...")
             win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
-            time.sleep(1)
-            print("✅ Trae IDE窗口已最小化")
+            with self.metrics.step('minimize'):
+                wait_until(lambda: win32gui.IsIconic(hwnd), timeout=self.wait_timeout)
+            log.debug("✅ Trae IDE窗口已最小化")
             return True
             
         except Exception as e:
-            print(f"❌ 最小化窗口时发生错误: {e}")
+            log.error("❌ 最小化窗口时发生错误: %s", e)
             return False
     
-    def find_button_on_screen(self):
+    def find_trigger_on_screen(self):
         """
-        在屏幕上查找目标按钮
-        返回: (x, y) 坐标或 None
+        单窗口模式：在屏幕（或Trae窗口范围内）检测所有状态，并推进动作状态
+        返回: (是否发现需要操作的状态, 本轮需要执行动作的命中或 None)
+        """
+        self.default_state.hwnd = self.trae_hwnd
+        found, triggers = self.observe_actions(*self.find_states_in_windows([self.default_state]))
+        return found, triggers[0][1] if triggers else None
+    
+    def find_states_in_windows(self, states):
+        """
+        整个tick只截图一次，覆盖所有窗口所有模板的搜索区域，再分别在各窗口内检测所有状态
+        后台截图时改为逐个截取各窗口自身的内容
+        返回: (plans, [(WindowState, [StateHit, ...]), ...])，结果只包含有命中的窗口；检测出错时均为空
         """
         try:
-            # 截取全屏
-            screenshot = pyautogui.screenshot()
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-            
-            # 读取目标按钮图片
-            if not os.path.exists(self.target_button_path):
-                print(f"❌ 错误: 找不到目标按钮图片 {self.target_button_path}")
-                return None
-            
-            target_img = cv2.imread(self.target_button_path)
-            if target_img is None:
-                print(f"❌ 错误: 无法读取目标按钮图片 {self.target_button_path}")
-                return None
-            
-            # 模板匹配
-            result = cv2.matchTemplate(screenshot_cv, target_img, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-            
-            if max_val >= self.match_threshold:
-                # 计算按钮中心坐标
-                h, w = target_img.shape[:2]
-                center_x = max_loc[0] + w // 2
-                center_y = max_loc[1] + h // 2
-                return (center_x, center_y)
-            
-            return None
-            
+            plans = self.plan_search_regions(states)
+            if self.background_capture:
+                results = self.detector.detect_windows(plans)
+            else:
+                results = self.detector.detect(plans)
+            self.last_frame_changed = self.detector.last_frame_changed
+            return plans, results
         except Exception as e:
-            print(f"❌ 查找按钮时发生错误: {e}")
-            return None
+            log.error("❌ 检测状态时发生错误: %s", e)
+            return [], []
+    
+    def observe_actions(self, plans, results):
+        """
+        用本轮检测结果推进各窗口的动作状态：发送后按钮消失即确认成功，
+        等待确认或冷却中的窗口即使再次检测到按钮也不会重复发送
+        Args:
+            plans: 本轮实际检测的 [(WindowState, [PlannedSearch, ...]), ...]
+            results: 检测结果 [(WindowState, [StateHit, ...]), ...]
+        返回: (是否发现需要操作的状态, [(WindowState, StateHit), ...] 本轮需要执行动作的窗口)
+        """
+        hits_by_state = {id(state): hits for state, hits in results}
+        found = False
+        triggers = []
+        for state, _ in plans:
+            hit = self.actionable_hit(hits_by_state.get(id(state), []))
+            found = found or hit is not None
+            if self.action_guard.observe(state, hit):
+                triggers.append((state, hit))
+        return found, triggers
+    
+    def get_active_states(self):
+        """
+        获取需要检测的窗口状态列表
+        多实例模式下为所有Trae窗口，单窗口模式下为绑定到第一个Trae窗口的默认状态
+        """
+        if self.multi_window:
+            return self.refresh_window_states()
+        self.default_state.hwnd = self.find_trae_window()
+        return [self.default_state]
+    
+    def plan_search_regions(self, states):
+        """
+        计算每个窗口中各状态模板本次的搜索区域（冷却中或最小化的窗口跳过）
+        返回: [(WindowState, [PlannedSearch, ...]), ...]
+        """
+        if self.state_snapshot is not None and self.state_snapshot.waiting:
+            # 恢复的剩余冷却期在本轮即生效；没有对应窗口的记录随后丢弃，不会套用到之后出现的窗口
+            for state in states:
+                self._restore_snapshot(state)
+            self.state_snapshot.expire(states)
+        now = time.monotonic()
+        targets = []
+        for state in states:
+            self.action_guard.refresh(state, now)
+            if state.in_cooldown(now):
+                continue
+            bounds = None
+            if state.hwnd and (self.multi_window or self.capture_window_only or self.background_capture):
+                if self.background_capture and not self._show_without_activation(state.hwnd):
+                    continue
+                bounds = self.get_trae_window_bbox(state.hwnd)
+                if bounds is None:
+                    continue
+            elif self.background_capture:
+                # 后台截图只能截取找到的窗口
+                continue
+            targets.append((state, bounds))
+        return self.detector.plan(targets)
+    
+    def _restore_snapshot(self, state):
+        """
+        窗口首次出现且未最小化时，从状态快照恢复该窗口的ROI、缩放比例和冷却期
+        """
+        if not state.hwnd:
+            return
+        window_rect = self.get_trae_window_bbox(state.hwnd)
+        if window_rect is None:
+            return
+        self.state_snapshot.restore(
+            state, window_rect,
+            names=[spec.name for spec in self.detection_engine.templates],
+            scales=self.template_cache.scales,
+            cooldown=self.send_cooldown
+        )
+    
+    def save_state_snapshot(self, force=False):
+        """
+        保存监控状态快照，force 为 False 时只在超过保存间隔后保存
+        """
+        snapshot = self.state_snapshot
+        if snapshot is None or not (force or snapshot.due()):
+            return
+        states = list(self.window_states.values()) if self.multi_window else [self.default_state]
+        # 窗口区域优先使用检测时的区域，保存时窗口可能已被最小化
+        windows = [snapshot.describe(state, state.bounds or self.get_trae_window_bbox(state.hwnd))
+                   for state in states if state.hwnd]
+        if windows:
+            snapshot.save(windows, self.capture.get_screen_bounds())
+    
+    def match_planned_regions(self, frame, frame_box, plans):
+        """
+        在共享画面中分别检测各窗口的所有状态
+        返回: [(WindowState, [StateHit, ...]), ...]，只包含有命中的窗口
+        """
+        results = self.detector.match(frame, frame_box, plans)
+        self.last_frame_changed = self.detector.last_frame_changed
+        return results
     
-    def find_input_area(self, button_pos):
+    @staticmethod
+    def actionable_hit(hits):
         """
-        根据按钮位置推算输入框位置或使用配置的固定位置
+        返回排序最靠前的需要操作界面的命中，没有时返回 None
         """
-        # 使用配置文件中的固定输入框位置
-        print(f"按钮位置: {button_pos}, 使用固定输入框位置: ({self.input_box_x}, {self.input_box_y})")
-        return (self.input_box_x, self.input_box_y)
+        for hit in hits:
+            if hit.action in INPUT_ACTIONS:
+                return hit
+        return None
     
-    def send_message(self, button_pos):
+    def _create_input_layout(self):
+        """
+        按配置创建输入框布局模型，layout 为 fixed 时使用配置的固定位置，
+        relative 模式未配置偏移时由配置的输入框位置和第一次命中的按钮位置推算偏移
+        """
+        fixed = self.layout_mode == 'fixed'
+        return InputLayout(
+            input_offset=self.input_offset,
+            anchor_input=(self.input_box_x, self.input_box_y),
+            safe_ratio=self.safe_mouse_ratio,
+            fixed_input=(self.input_box_x, self.input_box_y) if fixed else None,
+            fixed_safe=(self.safe_mouse_x, self.safe_mouse_y) if fixed else None,
+            tolerance=self.layout_check_tolerance
+        )
+    
+    def find_input_area(self, button_pos, scale=1.0, hwnd=None):
+        """
+        根据按钮位置和所在窗口区域推算输入框和鼠标安全位置
+        Args:
+            button_pos: 命中的按钮中心
+            scale: 命中时的模板缩放比例
+            hwnd: 按钮所在窗口，为 None 时使用最近一次找到的Trae窗口，窗口不可用时以整个屏幕为范围
+        返回: Layout
+        """
+        window_rect = self.get_trae_window_bbox(hwnd)
+        if window_rect is None:
+            window_rect = self.capture.get_screen_bounds()
+        layout = self.input_layout.locate(button_pos, window_rect, scale)
+        log.debug("按钮位置: %s, 窗口区域: %s, 输入框位置: %s", button_pos, window_rect, layout.input_pos)
+        return layout
+    
+    def _snapshot_region(self, bbox):
+        """
+        截取一小块区域的副本，用于判断界面是否发生变化
+        """
+        frame = self.capture.grab(bbox, self._probe_buffer)
+        return None if frame is None else frame.copy()
+    
+    def _region_changed(self, bbox, before):
+        """
+        判断区域画面与之前的副本相比是否发生变化
+        """
+        if before is None:
+            return True
+        frame = self.capture.grab(bbox, self._probe_buffer)
+        return frame is not None and (frame.shape != before.shape or cv2.norm(frame, before, cv2.NORM_INF) > 0)
+    
+    def _button_visible_at(self, button_pos, state_name=None, scale=1.0):
+        """
+        只在按钮附近的小区域内检查该状态（命中时的缩放比例）的模板是否仍然存在
+        """
+        spec = self.detection_engine.get_spec(state_name) or self.detection_engine.templates[0]
+        template = self.template_cache.get(spec.image)
+        if template is None:
+            return False
+        template = template.get_scaled(scale)
+        h, w = template.bgr.shape[:2]
+        margin = 8
+        bbox = (button_pos[0] - w // 2 - margin, button_pos[1] - h // 2 - margin, w + 2 * margin, h + 2 * margin)
+        frame = self.capture.grab(bbox, self._probe_buffer)
+        if frame is None or frame.shape[0] < h or frame.shape[1] < w:
+            return False
+        max_val, _ = self.matcher.match(frame, template)
+        return max_val >= self.detection_engine.get_threshold(spec)
+    
+    def click_state(self, hit, hwnd=None):
+        """
+        直接点击命中的状态（例如"重试"按钮），等待其消失
+        返回: (是否点击成功, 是否已验证生效)，点击本身无法验证，始终为未验证
+        """
+        try:
+            log.info("点击状态 %s: %s", hit.name, hit.position)
+            safe_pos = self.find_input_area(hit.position, hit.scale, hwnd).safe_pos
+            with self.metrics.step('click_state'):
+                pyautogui.click(hit.position[0], hit.position[1])
+                pyautogui.moveTo(safe_pos[0], safe_pos[1])
+                if not wait_until(lambda: not self._button_visible_at(hit.position, hit.name, hit.scale), timeout=self.wait_timeout):
+                    log.warning("⚠️  点击后状态 %s 仍然存在", hit.name)
+            return True, False
+        except Exception as e:
+            log.error("❌ 点击状态 %s 时发生错误: %s", hit.name, e)
+            return False, False
+    
+    def perform_action(self, hit, hwnd=None):
+        """
+        执行命中状态对应的处理动作
+        Args:
+            hwnd: 命中所在的窗口句柄，用于推算输入框位置
+        返回: (是否执行成功, 是否已验证生效)
+        """
+        handler = self.action_handlers.get(hit.action)
+        if handler is None:
+            return False, False
+        with self.metrics.step(hit.action):
+            ok, verified = handler(hit, hwnd)
+        self.metrics.inc('actions', state=hit.name, action=hit.action, result='ok' if ok else 'failed')
+        # 命中是否真实由 ActionGuard 根据之后的检测确认，并记录到阈值校准器
+        return ok, verified
+    
+    def send_message(self, button_pos, state_name=None, scale=1.0, hwnd=None):
         """
         发送消息到输入框
+        每一步完成后按界面实际变化等待，而不是固定等待
+        
+        Args:
+            button_pos: 发送按钮的位置
+            state_name: 命中的状态名称，用于确认按钮是否已消失
+            scale: 命中时的模板缩放比例
+            hwnd: 按钮所在的窗口句柄
+        返回: (是否执行成功, 粘贴后输入框是否发生了变化)
         """
         try:
-            print("检测到Trae IDE需要激活，开始输入文本...")
+            log.info("检测到Trae IDE需要激活，开始输入文本...")
             
-            # 获取输入框位置
-            input_pos = self.find_input_area(button_pos)
+            # 根据按钮位置和窗口区域获取输入框位置，点击前确认输入框画面与上次成功发送时一致
+            layout = self.find_input_area(button_pos, scale, hwnd)
+            input_pos = layout.input_pos
+            input_bbox = layout.input_bbox
+            probe = self._snapshot_region(layout.probe_bbox)
+            if not self.input_layout.verify(layout, probe):
+                log.warning("⚠️  输入框位置 %s 的画面与上次发送时不同，界面布局可能已变化，本次不发送", input_pos)
+                return False, False
             
-            # 点击输入框确保获得焦点
-            pyautogui.click(input_pos[0], input_pos[1])
-            time.sleep(0.5)
-            
-            # 再次点击确保焦点
-            pyautogui.click(input_pos[0], input_pos[1])
-            time.sleep(0.5)
+            # 点击输入框确保获得焦点（两次点击之间留出极短间隔）
+            with self.metrics.step('focus_input'):
+                pyautogui.click(input_pos[0], input_pos[1])
+                pyautogui.click(input_pos[0], input_pos[1])
             
             # 清空输入框内容
-            pyautogui.hotkey('ctrl', 'a')
-            time.sleep(0.2)
-            pyautogui.press('delete')
-            time.sleep(0.5)
+            with self.metrics.step('clear_input'):
+                before = self._snapshot_region(input_bbox)
+                pyautogui.hotkey('ctrl', 'a')
+                pyautogui.press('delete')
+                # 输入框原本就是空的时不会变化，只等待很短时间
+                wait_until(lambda: self._region_changed(input_bbox, before), timeout=0.3)
             
             # 使用剪贴板输入文本（更可靠）
-            print(f"正在输入文本: {self.input_text}")
-            pyperclip.copy(self.input_text)
-            pyautogui.hotkey('ctrl', 'v')
-            time.sleep(1)
-            
-            print("文本输入完成")
+            log.info("正在输入文本: %s", self.input_text)
+            with self.metrics.step('paste'):
+                before = self._snapshot_region(input_bbox)
+                pyperclip.copy(self.input_text)
+                pyautogui.hotkey('ctrl', 'v')
+                pasted = wait_until(lambda: self._region_changed(input_bbox, before), timeout=self.wait_timeout)
+                if not pasted:
+                    log.warning("⚠️  粘贴后输入框没有变化，仍尝试发送")
             
-            # 点击发送按钮
-            pyautogui.click(button_pos[0], button_pos[1])
-            time.sleep(1)
+            log.info("文本输入完成")
             
-            # 将鼠标移动到安全位置，避免hover效果遮挡按钮
-            # 使用配置文件中的安全位置
-            pyautogui.moveTo(self.safe_mouse_x, self.safe_mouse_y)
-            time.sleep(0.5)
+            # 点击发送按钮，等待按钮消失
+            with self.metrics.step('click_send'):
+                pyautogui.click(button_pos[0], button_pos[1])
+                # 将鼠标移动到窗口内的安全位置，避免hover效果遮挡按钮
+                pyautogui.moveTo(layout.safe_pos[0], layout.safe_pos[1])
+                if wait_until(lambda: not self._button_visible_at(button_pos, state_name, scale), timeout=self.wait_timeout):
+                    self.input_layout.confirm(layout, probe)
+                else:
+                    log.warning("⚠️  点击发送后按钮仍然存在")
             
-            print(f"已发送消息: {self.input_text}")
-            print("🔄 鼠标已移动到安全位置，避免遮挡检测区域")
-            return True
+            log.info("已发送消息: %s", self.input_text)
+            log.info("🔄 鼠标已移动到安全位置，避免遮挡检测区域")
+            return True, pasted
             
         except Exception as e:
-            print(f"❌ 发送消息时发生错误: {e}")
+            log.error("❌ 发送消息时发生错误: %s", e)
+            return False, False
+    
+    def next_interval(self, button_found=False, sent=False):
+        """
+        计算到下一次监控的间隔（秒），启用自适应轮询时由调度器决定
+        """
+        if self.scheduler:
+            interval = self.scheduler.record_tick(
+                button_found=button_found,
+                frame_changed=self.last_frame_changed,
+                sent=sent
+            )
+            # 定期输出反应时间和CPU占用，便于调整参数
+            if self.scheduler.ticks % 100 == 0:
+                log.info("📊 轮询调度统计: %s", self.scheduler.get_stats())
+        else:
+            interval = self.monitor_interval
+        self.record_poll_metrics(interval)
+        log.debug("等待 %.1f 秒后继续监控...", interval)
+        return interval
+    
+    def record_poll_metrics(self, interval):
+        """
+        记录本次轮询间隔，以及调度器新测得的反应时间（按钮出现到被发现）
+        """
+        self.metrics.set_gauge('poll_interval_seconds', round(interval, 3))
+        if self.scheduler:
+            new = min(self.scheduler.reaction_count - self._reactions_recorded, len(self.scheduler.reaction_times))
+            for reaction in list(self.scheduler.reaction_times)[len(self.scheduler.reaction_times) - new:]:
+                self.metrics.observe('reaction', reaction)
+            self._reactions_recorded = self.scheduler.reaction_count
+    
+    def start_metrics_export(self):
+        """
+        按配置启动指标HTTP接口和定期JSON导出
+        返回: 已启动的导出器列表，退出时逐个 stop()
+        """
+        exporters = []
+        if self.metrics_http_enabled:
+            server = MetricsServer(self.metrics, self.metrics_host, self.metrics_port)
+            if server.start():
+                exporters.append(server)
+        if self.metrics_dump_file:
+            dumper = MetricsDumper(self.metrics, self.metrics_dump_file, self.metrics_dump_interval)
+            dumper.start()
+            exporters.append(dumper)
+        return exporters
+    
+    def print_stats(self):
+        """
+        打印各组件的统计信息
+        """
+        log.info("📊 模板缓存统计: %s", self.template_cache.get_stats())
+        log.info("📊 状态检测统计: %s", self.detection_engine.get_stats())
+        log.info("📊 阈值校准统计: %s", self.threshold_calibrator.get_stats())
+        log.info("📊 窗口注册表统计: %s", self.window_registry.get_stats())
+        log.info("📊 窗口分类缓存统计: %s", self.window_classifier.get_stats())
+        log.info("📊 输入框布局统计: %s", self.input_layout.get_stats())
+        log.info("📊 动作状态统计: %s", self.action_guard.get_stats())
+        if self.config_watcher:
+            log.info("📊 配置热加载统计: %s", self.config_watcher.get_stats())
+        if self.state_snapshot:
+            log.info("📊 状态快照统计: %s", self.state_snapshot.get_stats())
+        log.info("📊 各阶段耗时: %s", self.metrics.get_stats())
+        if self.multi_window:
+            for state in self.window_states.values():
+                log.info("📊 窗口统计: %s", state.get_stats())
+        else:
+            log.info("📊 检测统计: %s", self.default_state.get_stats())
+        if self.scheduler:
+            log.info("📊 轮询调度统计: %s", self.scheduler.get_stats())
+    
+    def monitor_tick(self):
+        """
+        单窗口模式下的一次监控
+        返回: (是否发现按钮, 是否发送成功)
+        """
+        if self.background_capture:
+            return self.monitor_tick_background()
+        
+        # 冷却期（发送确认成功后或重试等待）内不检测，也不激活窗口
+        state = self.default_state
+        self.action_guard.refresh(state)
+        if state.in_cooldown():
+            log.debug("发送冷却中，跳过本轮")
+            return False, False
+        
+        # 保存干扰窗口状态的变量
+        saved_window_states = None
+        
+        # 根据配置决定是否激活Trae IDE窗口
+        if self.auto_activate:
+            # 首先保存并处理可能的干扰窗口
+            saved_window_states = self._save_and_handle_interfering_windows()
+            
+            # 然后尝试激活Trae IDE窗口
+            if not self.activate_trae_window():
+                log.warning("⚠️  无法激活Trae IDE窗口，将在下次循环重试", extra=THROTTLE)
+                # 如果激活失败，恢复窗口状态
+                if saved_window_states:
+                    self._restore_window_states(saved_window_states)
+                return False, False
+        
+        # 检测所有状态，按排序处理第一个需要操作界面的状态（等待确认期间的命中不重复发送）
+        self.last_frame_changed = False
+        found, hit = self.find_trigger_on_screen()
+        send_ok = verified = False
+        
+        if hit and self.action_guard.begin(state, hit):
+            log.info("发现状态 %s 位置: %s", hit.name, hit.position)
+            # 执行该状态对应的动作，之后等待下一轮检测确认按钮已消失
+            try:
+                send_ok, verified = self.perform_action(hit, self.trae_hwnd)
+            finally:
+                self.action_guard.finish(state, send_ok, verified)
+            # 发送后界面状态已改变，下一次必须重新匹配
+            if state.change_detector:
+                state.change_detector.reset()
+            if send_ok:
+                state.sends += 1
+                log.info("消息发送成功")
+                # 根据配置决定是否最小化窗口
+                if self.auto_minimize:
+                    self.minimize_trae_window()
+                log.info("等待下次监控...")
+            else:
+                log.warning("消息发送失败")
+                # 根据配置决定是否最小化窗口
+                if self.auto_minimize:
+                    self.minimize_trae_window()
+        else:
+            if found:
+                log.info("⏳ 上次发送后按钮仍在，等待确认或重试...", extra=THROTTLE)
+            else:
+                log.info("未发现目标按钮，AI助手可能正在工作中...", extra=THROTTLE)
+            # 根据配置决定是否最小化窗口
+            if self.auto_minimize:
+                self.minimize_trae_window()
+        
+        # 恢复之前保存的窗口状态
+        if saved_window_states:
+            log.debug("🔄 恢复其他应用的窗口状态...")
+            self._restore_window_states(saved_window_states)
+        
+        return found, send_ok
+    
+    def monitor_tick_background(self):
+        """
+        后台截图模式下的单窗口监控：检测时不激活、不最小化窗口，
+        只有发现需要操作的状态时才激活窗口（不最大化，保持检测时的窗口布局），发送后交还焦点
+        返回: (是否发现按钮, 是否发送成功)
+        """
+        if not self.find_trae_window():
+            log.error("❌ 未找到Trae IDE窗口", extra=THROTTLE)
+            return False, False
+        
+        self.last_frame_changed = False
+        found, hit = self.find_trigger_on_screen()
+        if not hit:
+            if found:
+                log.info("⏳ 上次发送后按钮仍在，等待确认或重试...", extra=THROTTLE)
+            else:
+                log.info("未发现目标按钮，AI助手可能正在工作中...", extra=THROTTLE)
+            return found, False
+        
+        send_ok = self.send_to_window(self.default_state, hit)
+        # 发送后界面状态已改变，下一次必须重新匹配
+        if self.default_state.change_detector:
+            self.default_state.change_detector.reset()
+        return True, send_ok
+    
+    def send_to_window(self, state, hit):
+        """
+        激活指定窗口（不最大化）并执行命中状态的动作，之后等待检测确认按钮已消失，
+        确认后该窗口进入冷却期，失败或未生效时按指数退避重试
+        后台截图模式下发送完成后把焦点交还给之前的前台窗口
+        返回: 是否执行成功
+        """
+        if not self.action_guard.begin(state, hit):
+            log.debug("窗口 %s 正在发送或等待确认，忽略本次命中", state.title)
             return False
+        log.info("发现状态 %s 位置: %s (%s)", hit.name, hit.position, state.title)
+        send_ok = verified = False
+        try:
+            send_ok, verified = self._activate_and_perform(state, hit)
+        finally:
+            self.action_guard.finish(state, send_ok, verified)
+        if send_ok:
+            state.sends += 1
+            log.info("消息发送成功 (%s)", state.title)
+        else:
+            log.warning("消息发送失败 (%s)", state.title)
+        return send_ok
+    
+    def _activate_and_perform(self, state, hit):
+        previous_foreground = None
+        if self.background_capture:
+            try:
+                previous_foreground = win32gui.GetForegroundWindow()
+            except Exception:
+                previous_foreground = None
+        if self.auto_activate and state.hwnd and not self.activate_trae_window(state.hwnd, maximize=False):
+            log.warning("⚠️  无法激活窗口 %s", state.title)
+            return False, False
+        
+        try:
+            return self.perform_action(hit, state.hwnd)
+        finally:
+            if previous_foreground != state.hwnd:
+                self._restore_foreground(previous_foreground)
+    
+    def actuate(self, state, hit):
+        """
+        执行一个窗口的命中动作，供流水线和异步运行时的执行线程调用
+        非后台截图模式下先处理干扰窗口，完成后恢复
+        返回: 是否执行成功
+        """
+        saved_window_states = None
+        try:
+            if self.auto_activate and not self.background_capture:
+                saved_window_states = self._save_and_handle_interfering_windows()
+            return self.send_to_window(state, hit)
+        finally:
+            # 发送后界面状态已改变，下一次必须重新匹配
+            with state.lock:
+                if state.change_detector:
+                    state.change_detector.reset()
+            if saved_window_states:
+                log.debug("🔄 恢复其他应用的窗口状态...")
+                self._restore_window_states(saved_window_states)
     
     def monitor_loop(self):
         """
-        主监控循环
+        主监控循环（同步入口），阻塞直到按下Ctrl+C
+        流水线模式使用 MonitorPipeline，否则在 asyncio 事件循环中运行 AsyncMonitorRuntime
         """
+        pipeline = runtime = None
+        exporters = []
         try:
-            while True:
-                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] 正在监控...")
-                
-                # 保存干扰窗口状态的变量
-                saved_window_states = None
-                
-                # 根据配置决定是否激活Trae IDE窗口
-                if self.auto_activate:
-                    # 首先保存并处理可能的干扰窗口
-                    saved_window_states = self._save_and_handle_interfering_windows()
-                    
-                    # 然后尝试激活Trae IDE窗口
-                    if not self.activate_trae_window():
-                        print("⚠️  无法激活Trae IDE窗口，将在下次循环重试")
-                        # 如果激活失败，恢复窗口状态
-                        if saved_window_states:
-                            self._restore_window_states(saved_window_states)
-                        time.sleep(self.monitor_interval)
-                        continue
-                
-                # 查找目标按钮
-                button_pos = self.find_button_on_screen()
-                
-                if button_pos:
-                    print(f"发现目标按钮位置: {button_pos}")
-                    # 发送消息
-                    if self.send_message(button_pos):
-                        print("消息发送成功")
-                        # 根据配置决定是否最小化窗口
-                        if self.auto_minimize:
-                            self.minimize_trae_window()
-                        print("等待下次监控...")
-                    else:
-                        print("消息发送失败")
-                        # 根据配置决定是否最小化窗口
-                        if self.auto_minimize:
-                            self.minimize_trae_window()
-                else:
-                    print("未发现目标按钮，AI助手可能正在工作中...")
-                    # 根据配置决定是否最小化窗口
-                    if self.auto_minimize:
-                        self.minimize_trae_window()
-                
-                # 恢复之前保存的窗口状态
-                if saved_window_states:
-                    print("🔄 恢复其他应用的窗口状态...")
-                    self._restore_window_states(saved_window_states)
-                
-                # 等待下次监控
-                print(f"等待 {self.monitor_interval} 秒后继续监控...\n")
-                time.sleep(self.monitor_interval)
+            if self.pipeline_mode:
+                exporters = self.start_metrics_export()
+                pipeline = MonitorPipeline(self, self.detection_workers, self.queue_size)
+                pipeline.run()
+                return
+            
+            runtime = AsyncMonitorRuntime(self, self.detection_workers)
+            asyncio.run(runtime.run())
                 
         except KeyboardInterrupt:
-            print("\n监控已停止")
+            log.info("监控已停止")
+            self.threshold_calibrator.save()
+            self.print_stats()
+            if pipeline:
+                log.info("📊 流水线统计: %s", pipeline.get_stats())
+            if runtime:
+                log.info("📊 异步运行时统计: %s", runtime.get_stats())
         except Exception as e:
-            print(f"监控过程中发生错误: {e}")
+            log.exception("监控过程中发生错误: %s", e)
+        finally:
+            for exporter in exporters:
+                exporter.stop()
+            self.save_state_snapshot(force=True)
+            self.matcher.close()
+            self.window_registry.close()
 
 def main():
     """
     主函数
     """
-    monitor = EnhancedTraeIDEMonitor()
-    monitor.monitor_loop()
+    # 日志由后台线程写入控制台和文件，退出前写完队列中剩余的日志
+    log_listener = setup_logging(**load_logging_settings())
+    try:
+        monitor = EnhancedTraeIDEMonitor()
+        monitor.monitor_loop()
+    finally:
+        shutdown_logging(log_listener)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画面变化检测
+功能：把监控区域缩小成很小的分块签名并与上一帧比较，
+只有区域发生变化或距离上次匹配超过最长间隔时才需要重新进行模板匹配
+"""
+
+import time
+import cv2
+import numpy as np
+
+
+class FrameChangeDetector:
+    """
+    基于分块平均值的画面变化检测器，与上一次进行匹配时的画面比较
+
+    Args:
+        grid_size: 签名的分块数 (列, 行)，每块取区域内像素平均值
+        tolerance: 任一分块的平均亮度变化超过该值即视为画面变化
+        max_staleness: 距离上次匹配的最长时间（秒），超过后即使画面未变也重新匹配
+    """
+
+    def __init__(self, grid_size=(32, 32), tolerance=2.0, max_staleness=60.0):
+        self.grid_size = tuple(grid_size)
+        self.tolerance = tolerance
+        self.max_staleness = max_staleness
+
+        self._last_signature = None
+        self._last_region = None
+        self._last_evaluated = 0.0
+        # 最近一次判断时画面是否发生了变化（不含超时强制匹配）
+        self.last_changed = False
+
+        # 统计计数
+        self.evaluated = 0
+        self.skipped = 0
+
+    def compute_signature(self, frame):
+        """
+        计算画面签名（灰度分块平均值）
+        """
+        grid_w = min(self.grid_size[0], frame.shape[1])
+        grid_h = min(self.grid_size[1], frame.shape[0])
+        small = cv2.resize(frame, (grid_w, grid_h), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.int16)
+
+    def should_evaluate(self, frame, region=None):
+        """
+        判断是否需要对当前画面进行模板匹配
+        Args:
+            frame: 当前截取的区域画面
+            region: 区域在屏幕上的位置，区域变化时总是重新匹配
+        返回: True 表示需要匹配
+        """
+        now = time.monotonic()
+        signature = self.compute_signature(frame)
+
+        changed = (
+            self._last_signature is None
+            or region != self._last_region
+            or signature.shape != self._last_signature.shape
+            or np.abs(signature - self._last_signature).max() > self.tolerance
+        )
+        stale = now - self._last_evaluated >= self.max_staleness
+        self.last_changed = changed
+
+        if changed or stale:
+            # 只在匹配时更新基准签名，避免缓慢变化被逐帧累积忽略
+            self._last_signature = signature
+            self._last_region = region
+            self._last_evaluated = now
+            self.evaluated += 1
+            return True
+
+        self.skipped += 1
+        return False
+
+    def reset(self):
+        """
+        清除上一帧记录，下一帧必定重新匹配
+        """
+        self._last_signature = None
+        self._last_region = None
+
+    def get_stats(self):
+        """
+        返回检测统计信息
+        """
+        total = self.evaluated + self.skipped
+        return {
+            'evaluated': self.evaluated,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / total if total else 0.0,
+        }
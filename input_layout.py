@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入框布局
+功能：根据命中的按钮位置和Trae窗口区域推算输入框和鼠标安全位置，
+窗口移动或改变大小后跟随按钮位置变化，不再依赖固定的屏幕坐标
+- 没有配置偏移时，第一次命中时用配置的输入框位置减去按钮中心得到偏移，之后按该偏移推算
+- 推算结果按窗口几何（窗口区域、按钮位置、缩放比例）缓存
+- 点击前截取输入框中心的一小块区域，与上次在同一几何下成功发送时的画面比较，
+  差别过大说明布局已变化（例如面板被移动），本次不点击
+"""
+
+import collections
+import logging
+
+import cv2
+
+log = logging.getLogger(__name__)
+
+# 一次推算的结果：key 为缓存键，input_pos 为输入框点击位置，input_bbox 为判断输入框内容变化的区域，
+# probe_bbox 为点击前检查的小区域，safe_pos 为发送后鼠标移到的位置
+Layout = collections.namedtuple('Layout', 'key input_pos input_bbox probe_bbox safe_pos')
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+class InputLayout:
+    """
+    输入框布局模型
+
+    Args:
+        input_offset: 输入框中心相对按钮中心的偏移 (dx, dy)，按命中时的模板缩放比例缩放；
+            为 None 时在第一次命中时由 anchor_input 推算
+        anchor_input: 已知的输入框位置 (x, y)，input_offset 为 None 时必须提供
+        safe_ratio: 鼠标安全位置在窗口中的相对位置 (横向比例, 纵向比例)
+        fixed_input: 固定的输入框位置 (x, y)，设置后不再根据按钮位置推算
+        fixed_safe: 固定的鼠标安全位置 (x, y)
+        probe_size: 点击前检查的区域尺寸 (宽, 高)
+        tolerance: 检查区域与上次成功发送时相比允许的平均灰度差
+        cache_size: 缓存的窗口几何数量
+    """
+
+    def __init__(self, input_offset=None, safe_ratio=(0.9, 0.1), fixed_input=None, fixed_safe=None,
+                 probe_size=(60, 16), tolerance=40.0, cache_size=16, anchor_input=None):
+        self.input_offset = tuple(input_offset) if input_offset else None
+        self.anchor_input = tuple(anchor_input) if anchor_input else None
+        self.safe_ratio = tuple(safe_ratio)
+        self.fixed_input = tuple(fixed_input) if fixed_input else None
+        self.fixed_safe = tuple(fixed_safe) if fixed_safe else None
+        self.probe_size = probe_size
+        self.tolerance = tolerance
+        self.cache_size = max(1, cache_size)
+
+        self._layouts = collections.OrderedDict()
+        # 各几何下最近一次成功发送前的检查区域画面（灰度）
+        self._references = {}
+
+        # 统计计数
+        self.computed = 0
+        self.cache_hits = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def locate(self, button_pos, window_rect, scale=1.0):
+        """
+        返回按钮所在窗口的输入框布局
+        Args:
+            button_pos: 按钮中心 (x, y)
+            window_rect: Trae窗口区域 (x, y, w, h)，推算结果限制在窗口内
+            scale: 命中时的模板缩放比例，界面缩放时偏移按同样比例变化
+        返回: Layout
+        """
+        key = (tuple(window_rect), tuple(button_pos), round(scale, 3))
+        layout = self._layouts.get(key)
+        if layout is not None:
+            self._layouts.move_to_end(key)
+            self.cache_hits += 1
+            return layout
+
+        self.computed += 1
+        x, y, w, h = window_rect
+        if self.fixed_input:
+            input_x, input_y = self.fixed_input
+        else:
+            if self.input_offset is None:
+                # 第一次命中：按配置的输入框位置得到相对按钮的偏移（换算为模板原始比例）
+                self.input_offset = (round((self.anchor_input[0] - button_pos[0]) / scale),
+                                     round((self.anchor_input[1] - button_pos[1]) / scale))
+                log.info("📐 根据输入框位置 %s 和按钮位置 %s 得到输入框偏移 %s",
+                         self.anchor_input, tuple(button_pos), self.input_offset)
+            input_x = _clamp(button_pos[0] + round(self.input_offset[0] * scale), x + 1, x + w - 2)
+            input_y = _clamp(button_pos[1] + round(self.input_offset[1] * scale), y + 1, y + h - 2)
+
+        if self.fixed_safe:
+            safe_pos = self.fixed_safe
+        else:
+            safe_pos = (x + round(w * self.safe_ratio[0]), y + round(h * self.safe_ratio[1]))
+
+        probe_w, probe_h = self.probe_size
+        layout = Layout(
+            key=key,
+            input_pos=(input_x, input_y),
+            input_bbox=(input_x - 100, input_y - 15, 200, 30),
+            probe_bbox=(input_x - probe_w // 2, input_y - probe_h // 2, probe_w, probe_h),
+            safe_pos=safe_pos,
+        )
+        self._layouts[key] = layout
+        while len(self._layouts) > self.cache_size:
+            old_key, _ = self._layouts.popitem(last=False)
+            self._references.pop(old_key, None)
+        return layout
+
+    def verify(self, layout, probe):
+        """
+        点击前检查：与该几何下上次成功发送时的画面比较
+        没有记录时视为通过；不通过时丢弃该几何的缓存，下一次重新推算和记录
+        Args:
+            probe: 截取的 probe_bbox 区域（BGR），截图失败时为 None
+        返回: 是否可以点击
+        """
+        reference = self._references.get(layout.key)
+        if reference is None or probe is None:
+            return True
+        gray = cv2.cvtColor(probe, cv2.COLOR_BGR2GRAY)
+        if gray.shape == reference.shape and cv2.norm(gray, reference, cv2.NORM_L1) / gray.size <= self.tolerance:
+            self.verified += 1
+            return True
+        self.rejected += 1
+        self._references.pop(layout.key, None)
+        self._layouts.pop(layout.key, None)
+        return False
+
+    def confirm(self, layout, probe):
+        """
+        发送成功后记录点击前的检查区域画面，作为该几何下次检查的基准
+        """
+        if probe is not None and layout.key in self._layouts:
+            self._references[layout.key] = cv2.cvtColor(probe, cv2.COLOR_BGR2GRAY)
+
+    def get_stats(self):
+        return {
+            'cached': len(self._layouts),
+            'computed': self.computed,
+            'cache_hits': self.cache_hits,
+            'verified': self.verified,
+            'rejected': self.rejected,
+        }
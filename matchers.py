@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板匹配器
+功能：提供可替换的模板匹配实现，统一返回 (max_val, max_loc)，
+与 cv2.minMaxLoc 的最大值部分含义相同
+- exhaustive: 全分辨率逐点匹配（原有实现）
+- pyramid: 先在缩小（可选灰度）的画面上找候选峰值，再在全分辨率的小邻域内精确匹配
+- tiled: 把大区域（多显示器的整个桌面）切成重叠的块，在线程池或进程池中并行全分辨率匹配
+画面可以是 BGR 数组，也可以是 PreparedFrame：多个模板在同一画面上匹配时，
+灰度图和金字塔缩小图只计算一次
+灰度图、金字塔缩小图和 matchTemplate 的结果都写入按尺寸复用的数组（ArrayPool），
+画面尺寸不变时每次检测不再分配与画面同样大小的内存
+"""
+
+import collections
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class ArrayPool:
+    """
+    按键复用的数组，每个键保留一块连续内存，只有需要更大的尺寸时才重新分配，
+    最多保留 max_arrays 个（最近最少使用的先释放）
+    不是线程安全的，每个线程使用自己的池（thread_pool）
+    """
+
+    def __init__(self, max_arrays=32):
+        self.max_arrays = max_arrays
+        self._arrays = collections.OrderedDict()
+        self.allocations = 0
+
+    def get(self, key, shape, dtype=np.uint8):
+        """
+        返回指定形状的数组（内容未初始化，与同一键上一次返回的数组共用内存）
+        """
+        size = int(np.prod(shape))
+        storage = self._arrays.get(key)
+        if storage is None or storage.size < size or storage.dtype != dtype:
+            storage = self._arrays[key] = np.empty(size, dtype)
+            self.allocations += 1
+            while len(self._arrays) > self.max_arrays:
+                self._arrays.popitem(last=False)
+        else:
+            self._arrays.move_to_end(key)
+        return storage[:size].reshape(shape)
+
+
+_thread_local = threading.local()
+
+
+def thread_pool():
+    """
+    返回当前线程的 ArrayPool
+    """
+    pool = getattr(_thread_local, 'pool', None)
+    if pool is None:
+        pool = _thread_local.pool = ArrayPool()
+    return pool
+
+
+def match_template(image, template):
+    """
+    TM_CCOEFF_NORMED 匹配，结果写入当前线程按尺寸复用的数组
+    返回的结果数组在同一线程下一次匹配同样尺寸时会被覆盖
+    """
+    shape = (image.shape[0] - template.shape[0] + 1, image.shape[1] - template.shape[1] + 1)
+    result = thread_pool().get(('result',) + shape, shape, np.float32)
+    return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED, result=result)
+
+
+class PreparedFrame:
+    """
+    一次截图的预处理结果，灰度图和各层金字塔按需计算并缓存
+
+    Args:
+        frame: BGR 画面
+        pool: 写入灰度图和金字塔的 ArrayPool，为 None 时每次新分配；
+              使用同一个池的下一个 PreparedFrame 会覆盖这些数组，因此只能用于检测完即丢弃的画面
+    """
+
+    def __init__(self, frame, pool=None):
+        self.bgr = frame
+        self.height, self.width = frame.shape[:2]
+        self._variants = {(0, False): frame}
+        self._pool = pool
+
+    def get(self, level=0, grayscale=False):
+        """
+        获取指定金字塔层级的整幅画面，构建顺序与模板金字塔一致：
+        BGR 各层由上一层 BGR 缩小得到，灰度各层先在原画面上转灰度，再由上一层灰度缩小得到
+        """
+        key = (level, grayscale)
+        image = self._variants.get(key)
+        if image is None:
+            if grayscale and level == 0:
+                image = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY, dst=self._buffer(key, self.bgr.shape[:2]))
+            else:
+                source = self.get(level - 1, grayscale)
+                shape = ((source.shape[0] + 1) // 2, (source.shape[1] + 1) // 2) + source.shape[2:]
+                image = cv2.pyrDown(source, dst=self._buffer(key, shape))
+            self._variants[key] = image
+        return image
+
+    def _buffer(self, key, shape):
+        if self._pool is None:
+            return None
+        return self._pool.get(('prepared',) + key, shape)
+
+    def crop(self, rect, level=0, grayscale=False):
+        """
+        获取区域 (x, y, w, h) 在指定层级上的视图，坐标为原画面坐标
+        """
+        x, y, w, h = rect
+        scale = 1 << level
+        image = self.get(level, grayscale)
+        return image[y // scale:(y + h) // scale, x // scale:(x + w) // scale]
+
+
+def prepare_frame(frame, pool=None):
+    """
+    将 BGR 数组包装为 PreparedFrame，已经是 PreparedFrame 时直接返回
+    """
+    return frame if isinstance(frame, PreparedFrame) else PreparedFrame(frame, pool)
+
+
+class ExhaustiveMatcher:
+    """
+    全分辨率 TM_CCOEFF_NORMED 匹配
+    """
+
+    name = "exhaustive"
+
+    def __init__(self, grayscale=False):
+        self.grayscale = grayscale
+
+    def match(self, frame, template, rect=None):
+        """
+        在 BGR 画面中匹配模板
+        Args:
+            frame: BGR 画面（可以是整屏的切片视图）或 PreparedFrame
+            template: TemplateEntry
+            rect: 只在画面中的该区域 (x, y, w, h) 内匹配，默认为整幅画面
+        返回: (max_val, (x, y))，坐标为模板左上角相对 rect 左上角的位置
+        """
+        prepared = prepare_frame(frame)
+        rect = rect or (0, 0, prepared.width, prepared.height)
+        search = prepared.crop(rect, 0, self.grayscale)
+        target = template.get_variant(0, self.grayscale)
+        _, max_val, _, max_loc = cv2.minMaxLoc(match_template(search, target))
+        return max_val, max_loc
+
+    def close(self):
+        pass
+
+
+class PyramidMatcher:
+    """
+    由粗到细的金字塔匹配
+
+    Args:
+        levels: 粗匹配所在的金字塔层级（每层长宽减半）
+        grayscale: 粗匹配是否使用灰度图
+        candidates: 送入精确匹配的候选峰值数量
+        refine_margin: 精确匹配时在候选位置周围搜索的半径（粗匹配层的像素数）
+    """
+
+    name = "pyramid"
+
+    def __init__(self, levels=1, grayscale=True, candidates=3, refine_margin=2):
+        self.levels = max(1, levels)
+        self.grayscale = grayscale
+        self.candidates = max(1, candidates)
+        self.refine_margin = max(1, refine_margin)
+        self._fallback = ExhaustiveMatcher()
+
+    def match(self, frame, template, rect=None):
+        """
+        在 BGR 画面中匹配模板，参数和返回值与 ExhaustiveMatcher 相同
+        """
+        prepared = prepare_frame(frame)
+        rect = rect or (0, 0, prepared.width, prepared.height)
+
+        # 模板缓存中实际可用的层级可能少于配置值
+        level = min(self.levels, len(template.pyramid_bgr) - 1)
+        if level < 1:
+            return self._fallback.match(prepared, template, rect)
+
+        coarse_template = template.get_variant(level, self.grayscale)
+        th, tw = coarse_template.shape[:2]
+
+        # 缩小图取自整幅画面的金字塔，多个模板共用
+        small = prepared.crop(rect, level, self.grayscale)
+        if small.shape[0] < th or small.shape[1] < tw:
+            return self._fallback.match(prepared, template, rect)
+
+        frame = prepared.crop(rect)
+
+        result = match_template(small, coarse_template)
+        peaks = self._find_peaks(result, tw, th)
+
+        # 在全分辨率下逐个精确匹配候选位置
+        scale = 1 << level
+        margin = self.refine_margin * scale
+        full_template = template.bgr
+        full_h, full_w = full_template.shape[:2]
+        frame_h, frame_w = frame.shape[:2]
+
+        best_val, best_loc = -1.0, (0, 0)
+        for px, py in peaks:
+            x0 = max(0, px * scale - margin)
+            y0 = max(0, py * scale - margin)
+            x1 = min(frame_w, px * scale + margin + full_w)
+            y1 = min(frame_h, py * scale + margin + full_h)
+            if x1 - x0 < full_w or y1 - y0 < full_h:
+                continue
+            _, max_val, _, max_loc = cv2.minMaxLoc(match_template(frame[y0:y1, x0:x1], full_template))
+            if max_val > best_val:
+                best_val = max_val
+                best_loc = (x0 + max_loc[0], y0 + max_loc[1])
+
+        return best_val, best_loc
+
+    def _find_peaks(self, result, tw, th):
+        """
+        取出前 N 个互不重叠的峰值位置
+        """
+        # result 为本线程的结果缓冲区，下次匹配前会被重新写入，可以直接原地抑制
+        peaks = []
+        for _ in range(self.candidates):
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            if peaks and max_val <= -1.0:
+                break
+            peaks.append(max_loc)
+            # 抑制当前峰值附近，避免同一个目标被重复选中
+            x, y = max_loc
+            result[max(0, y - th // 2):y + th // 2 + 1, max(0, x - tw // 2):x + tw // 2 + 1] = -1.0
+        return peaks
+
+    def close(self):
+        pass
+
+
+def _match_tile(image, template, tile):
+    """
+    在画面的一块 (x, y, w, h) 中匹配模板
+    返回: (max_val, (x, y))，坐标为模板左上角在整幅画面中的位置
+    """
+    x, y, w, h = tile
+    _, max_val, _, max_loc = cv2.minMaxLoc(match_template(image[y:y + h, x:x + w], template))
+    return max_val, (x + max_loc[0], y + max_loc[1])
+
+
+def _match_shared_tile(name, shape, template, tile):
+    """
+    在进程池中执行：按名称打开共享内存中的画面，只匹配其中一块
+    """
+    shared = shared_memory.SharedMemory(name=name)
+    try:
+        image = np.ndarray(shape, dtype=np.uint8, buffer=shared.buf)
+        result = _match_tile(image, template, tile)
+        # 关闭共享内存前需要释放对其缓冲区的引用
+        del image
+        return result
+    finally:
+        shared.close()
+
+
+class TiledMatcher:
+    """
+    分块并行匹配：把搜索区域切成若干块，相邻块重叠（模板尺寸 - 1）像素，
+    每个匹配位置恰好属于一块，且匹配窗口完整落在该块中；合并时分数相同的位置按整幅画面的 (y, x) 顺序取第一个，
+    与整块匹配时 minMaxLoc 的选择一致（分数为各块分别计算，OpenCV 内部的计算方式不同时可能有浮点舍入差异）
+    区域不超过一块时（例如 ROI 局部搜索）直接匹配，不经过线程池或进程池
+    进程池模式下画面写入共享内存（同一幅画面只写一次），各进程按名称读取自己的那一块，不通过 pickle 传递画面
+
+    Args:
+        tile_size: 每块负责的匹配位置数（宽和高，像素）
+        workers: 并行数量，为 None 时使用 CPU 核数
+        executor: thread（OpenCV 匹配时释放 GIL）或 process
+        grayscale: 是否在灰度图上匹配
+    """
+
+    name = "tiled"
+
+    def __init__(self, tile_size=1024, workers=None, executor="thread", grayscale=False):
+        self.tile_size = max(64, tile_size)
+        self.workers = workers or os.cpu_count() or 2
+        self.executor_type = executor
+        self.grayscale = grayscale
+        self._fallback = ExhaustiveMatcher(grayscale)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # 进程池模式：共享内存中当前存放的画面，同一次检测中多个模板和缩放比例共用
+        self._shared = None
+        self._published = None
+        self._shared_lock = threading.Lock()
+
+        # 统计计数
+        self.tiled_matches = 0
+        self.shared_writes = 0
+
+    def split(self, width, height, template_width, template_height):
+        """
+        返回覆盖 width x height 区域的分块 [(x, y, w, h), ...]，坐标相对区域左上角
+        """
+        positions_x = width - template_width + 1
+        positions_y = height - template_height + 1
+        tiles = []
+        for y in range(0, positions_y, self.tile_size):
+            for x in range(0, positions_x, self.tile_size):
+                tiles.append((x, y,
+                              min(self.tile_size, positions_x - x) + template_width - 1,
+                              min(self.tile_size, positions_y - y) + template_height - 1))
+        return tiles
+
+    def match(self, frame, template, rect=None):
+        """
+        在 BGR 画面中匹配模板，参数和返回值与 ExhaustiveMatcher 相同
+        """
+        prepared = prepare_frame(frame)
+        rect = rect or (0, 0, prepared.width, prepared.height)
+        rx, ry, rw, rh = rect
+        target = template.get_variant(0, self.grayscale)
+        th, tw = target.shape[:2]
+        if rw < tw or rh < th:
+            return self._fallback.match(prepared, template, rect)
+        tiles = [(rx + x, ry + y, w, h) for x, y, w, h in self.split(rw, rh, tw, th)]
+        if len(tiles) == 1:
+            return self._fallback.match(prepared, template, rect)
+
+        self.tiled_matches += 1
+        image = prepared.get(0, self.grayscale)
+        if self.executor_type == "process":
+            results = self._match_in_processes(prepared, image, target, tiles)
+        else:
+            results = list(self._get_executor().map(lambda tile: _match_tile(image, target, tile), tiles))
+
+        # 多块分数相同时取整幅画面中行优先顺序的第一个位置，与整块匹配时 minMaxLoc 的选择一致
+        best_val, (best_x, best_y) = max(results, key=lambda result: (result[0], -result[1][1], -result[1][0]))
+        return best_val, (best_x - rx, best_y - ry)
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                if self.executor_type == "process":
+                    self._executor = ProcessPoolExecutor(self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="tile")
+            return self._executor
+
+    def _match_in_processes(self, prepared, image, target, tiles):
+        # 共享内存只有一块，多个检测线程同时使用时依次进行
+        with self._shared_lock:
+            name = self._publish(prepared, image)
+            executor = self._get_executor()
+            futures = [executor.submit(_match_shared_tile, name, image.shape, target, tile) for tile in tiles]
+            return [future.result() for future in futures]
+
+    def _publish(self, prepared, image):
+        """
+        把画面写入共享内存，同一个 PreparedFrame 只写一次，共享内存只在画面变大时重新分配
+        返回: 共享内存名称
+        """
+        if self._published is not None and self._published() is prepared:
+            return self._shared.name
+        if self._shared is None or self._shared.size < image.nbytes:
+            self._release_shared()
+            self._shared = shared_memory.SharedMemory(create=True, size=image.nbytes)
+        np.copyto(np.ndarray(image.shape, dtype=np.uint8, buffer=self._shared.buf), image)
+        self._published = weakref.ref(prepared)
+        self.shared_writes += 1
+        return self._shared.name
+
+    def _release_shared(self):
+        if self._shared is not None:
+            self._shared.close()
+            self._shared.unlink()
+            self._shared = None
+            self._published = None
+
+    def close(self):
+        """
+        关闭线程池或进程池，释放共享内存
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        with self._shared_lock:
+            self._release_shared()
+
+
+MATCHERS = {
+    ExhaustiveMatcher.name: ExhaustiveMatcher,
+    PyramidMatcher.name: PyramidMatcher,
+    TiledMatcher.name: TiledMatcher,
+}
+
+
+def create_matcher(name="exhaustive", **options):
+    """
+    根据名称创建匹配器，未知名称时回退到 exhaustive
+    """
+    matcher_class = MATCHERS.get(name)
+    if matcher_class is None:
+        log.warning("⚠️  未知的匹配器 %s，使用 exhaustive", name)
+        matcher_class = ExhaustiveMatcher
+        options = {}
+    return matcher_class(**options)
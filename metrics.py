@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+功能：在监控循环的各个阶段记录耗时（截图、颜色转换、模板匹配、枚举窗口、激活窗口、发送消息等），
+并统计次数（监控轮次、命中、发送、激活失败、跳过的画面等）
+- MetricsRegistry: 耗时直方图、计数器和数值指标
+- MetricsServer: 本地 HTTP 接口，/metrics 为 Prometheus 文本格式，/metrics.json 为 JSON
+- AsyncMetricsServer: 同样的接口，运行在异步运行时的事件循环中
+- MetricsDumper: 定期把全部指标写入 JSON 文件
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from timing import StepTimer
+
+log = logging.getLogger(__name__)
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = "trae_monitor"
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label(value):
+    """
+    按 Prometheus 文本格式转义标签值中的反斜杠、双引号和换行
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, escape=False):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v) if escape else v}"' for k, v in labels) + "}"
+
+
+class MetricsRegistry(StepTimer):
+    """
+    指标注册表（线程安全）
+    step(name) 记录一个阶段的耗时，inc(name, **labels) 增加计数，set_gauge(name, value) 设置当前值
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.started = time.time()
+        self._counters = {}
+        self._gauges = {}
+
+    def inc(self, name, value=1, **labels):
+        """
+        增加计数，可以带标签，例如 inc('hits', state='send_button')
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def get_counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def snapshot(self):
+        """
+        返回全部指标的字典
+        """
+        with self._lock:
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                counters[name + _format_labels(labels)] = value
+            gauges = dict(self._gauges)
+        return {
+            'timestamp': time.time(),
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'counters': counters,
+            'gauges': gauges,
+            'stages': self.get_stats(),
+        }
+
+    def to_prometheus(self):
+        """
+        返回 Prometheus 文本格式的指标
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(self.histograms.items())
+
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels, escape=True)} {value}")
+
+        for name, value in gauges:
+            if value is None:
+                continue
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+
+        metric = f"{METRIC_PREFIX}_stage_seconds"
+        if histograms:
+            lines.append(f"# TYPE {metric} histogram")
+        for stage, histogram in histograms:
+            stage = _escape_label(stage)
+            counts, count, total = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {count}')
+        lines.append("")
+        return "\n".join(lines)
+
+
+class NullMetrics:
+    """
+    不记录任何指标，未传入 MetricsRegistry 的组件使用
+    """
+
+    def step(self, name):
+        return contextlib.nullcontext()
+
+    def observe(self, name, seconds):
+        pass
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def set_gauge(self, name, value):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def render_metrics(registry, path):
+    """
+    生成指标接口的响应内容
+    返回: (内容, Content-Type)，路径不存在时返回 None
+    """
+    if path == "/metrics":
+        return registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    if path == "/metrics.json":
+        return json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    return None
+
+
+class MetricsServer:
+    """
+    在后台线程中提供指标 HTTP 接口（默认只监听本机）
+
+    Args:
+        registry: MetricsRegistry
+        host: 监听地址
+        port: 监听端口
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        启动服务，端口被占用等情况返回 False
+        """
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                response = render_metrics(registry, self.path)
+                if response is None:
+                    self.send_error(404)
+                    return
+                body, content_type = response
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不在控制台输出访问日志
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            log.warning("⚠️  无法启动指标接口 %s:%s: %s", self.host, self.port, e)
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        log.info("📈 指标接口: http://%s:%s/metrics", self.host, self._server.server_port)
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class AsyncMetricsServer:
+    """
+    在事件循环中提供指标 HTTP 接口（只处理 GET，每个请求后关闭连接）
+
+    Args:
+        registry: MetricsRegistry
+        host: 监听地址
+        port: 监听端口
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        """
+        启动服务，端口被占用等情况返回 False
+        """
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        except OSError as e:
+            log.warning("⚠️  无法启动指标接口 %s:%s: %s", self.host, self.port, e)
+            return False
+        port = self._server.sockets[0].getsockname()[1]
+        log.info("📈 指标接口: http://%s:%s/metrics", self.host, port)
+        return True
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读完请求头，忽略内容
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            response = render_metrics(self.registry, parts[1]) if len(parts) >= 2 and parts[0] == "GET" else None
+            if response is None:
+                status, body, content_type = "404 Not Found", b"Not Found", "text/plain; charset=utf-8"
+            else:
+                status = "200 OK"
+                body, content_type = response
+            writer.write(f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+class MetricsDumper:
+    """
+    定期把指标写入 JSON 文件（先写临时文件再替换）
+
+    Args:
+        registry: MetricsRegistry
+        path: 输出文件
+        interval: 写入间隔（秒）
+    """
+
+    def __init__(self, registry, path="metrics.json", interval=60.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.registry.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log.warning("⚠️  写入指标文件失败: %s", e)
+
+    def stop(self):
+        """
+        停止定期写入，并写入最后一次
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.dump()
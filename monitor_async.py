@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步监控运行时
+功能：在一个 asyncio 事件循环中运行监控的所有周期任务，按 Ctrl+C 时统一取消
+- 检测任务：按调度间隔规划搜索区域、截图（截图线程池）、匹配（检测线程池，各窗口的画面并行匹配）
+- 执行动作：在执行线程中激活窗口、粘贴和点击发送，通过异步锁保证同一时间只有一个动作在操作界面
+- 配置热加载、指标接口、指标定期导出和状态快照保存与检测共用同一个事件循环
+截图、OpenCV 和 win32 调用都是阻塞的，全部放到线程池中执行，事件循环本身只负责调度
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from capture_backends import FrameBuffer
+from metrics import AsyncMetricsServer, MetricsDumper
+from monitor_logging import THROTTLE
+
+log = logging.getLogger(__name__)
+
+
+class AsyncMonitorRuntime:
+    """
+    基于 EnhancedTraeIDEMonitor 的异步运行时
+
+    Args:
+        monitor: EnhancedTraeIDEMonitor 实例
+        detection_workers: 检测线程数量
+    """
+
+    def __init__(self, monitor, detection_workers=2):
+        self.monitor = monitor
+        self.detection_workers = max(1, detection_workers)
+        self._capture_executor = None
+        self._detect_executor = None
+        self._action_executor = None
+
+        # 执行动作（以及需要操作前台窗口的整轮监控）同一时间只能有一个
+        self.action_lock = None
+        # 检测和配置热加载互斥，配置只在两轮检测之间替换
+        self.tick_lock = None
+
+        # 本轮检测使用的画面缓冲区，匹配全部完成后下一轮才会重新使用
+        self._buffers = []
+        # 已安排发送的窗口，避免同一窗口被重复触发
+        self._pending = set()
+        self._action_tasks = set()
+        self._sent = False
+
+        # 统计计数
+        self.ticks = 0
+        self.frames_captured = 0
+        self.actions = 0
+
+    async def run(self):
+        """
+        运行所有任务直到被取消（Ctrl+C），退出前取消未完成的任务并关闭线程池
+        正在执行线程中进行的发送无法中断，会在完成后退出
+        """
+        monitor = self.monitor
+        # 锁在事件循环中创建
+        self.action_lock = asyncio.Lock()
+        self.tick_lock = asyncio.Lock()
+        self._capture_executor = ThreadPoolExecutor(1, thread_name_prefix="capture")
+        self._detect_executor = ThreadPoolExecutor(self.detection_workers, thread_name_prefix="detect")
+        self._action_executor = ThreadPoolExecutor(1, thread_name_prefix="actuator")
+
+        tasks = [asyncio.create_task(self._detection_loop(), name="detection")]
+        if monitor.config_watcher:
+            tasks.append(asyncio.create_task(self._config_loop(), name="config-watcher"))
+        server = None
+        if monitor.metrics_http_enabled:
+            server = AsyncMetricsServer(monitor.metrics, monitor.metrics_host, monitor.metrics_port)
+            if not await server.start():
+                server = None
+        dumper = None
+        if monitor.metrics_dump_file:
+            dumper = MetricsDumper(monitor.metrics, monitor.metrics_dump_file, monitor.metrics_dump_interval)
+            tasks.append(asyncio.create_task(self._dump_loop(dumper), name="metrics-dump"))
+        if monitor.state_snapshot:
+            tasks.append(asyncio.create_task(self._snapshot_loop(), name="state-snapshot"))
+
+        log.info("🚀 异步运行时已启动: 1个截图线程, %s个检测线程, 1个执行线程", self.detection_workers)
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            pending = tasks + list(self._action_tasks)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if server is not None:
+                await server.stop()
+            if dumper is not None:
+                dumper.dump()
+            for executor in (self._capture_executor, self._detect_executor, self._action_executor):
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_in(self, executor, func, *args):
+        return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    def _frame_buffers(self, count):
+        while len(self._buffers) < count:
+            self._buffers.append(FrameBuffer())
+        return self._buffers[:count]
+
+    async def _detection_loop(self):
+        monitor = self.monitor
+        while True:
+            async with self.tick_lock:
+                self.ticks += 1
+                monitor.metrics.inc('ticks')
+                try:
+                    with monitor.metrics.step('tick'):
+                        button_found, sent = await self._tick()
+                except Exception as e:
+                    log.exception("❌ 检测任务发生错误: %s", e)
+                    button_found = sent = False
+
+            # 发送在执行任务中完成，计入完成后的第一轮
+            sent = sent or self._sent
+            self._sent = False
+            await asyncio.sleep(monitor.next_interval(button_found=button_found, sent=sent))
+
+    async def _tick(self):
+        """
+        一轮检测，发现需要操作的状态时安排执行任务，不等待发送完成
+        返回: (是否发现按钮, 本轮是否发送成功)
+        """
+        monitor = self.monitor
+        if not monitor.multi_window and not monitor.background_capture:
+            # 单窗口前台模式：截图前需要激活窗口，整轮都在操作界面，放到执行线程中进行
+            async with self.action_lock:
+                return await self._run_in(self._action_executor, monitor.monitor_tick)
+
+        states = await self._run_in(self._capture_executor, monitor.get_active_states)
+        if not any(state.hwnd for state in states):
+            log.error("❌ 未找到Trae IDE窗口", extra=THROTTLE)
+            return False, False
+        states = [state for state in states if id(state) not in self._pending]
+        plans = await self._run_in(self._capture_executor, monitor.plan_search_regions, states)
+        if not plans:
+            return False, False
+
+        jobs = await self._run_in(self._capture_executor, monitor.detector.capture_jobs,
+                                  plans, monitor.background_capture, self._frame_buffers)
+        self.frames_captured += len(jobs)
+        matched = await asyncio.gather(*(
+            self._run_in(self._detect_executor, monitor.detector.match, frame, box, job_plans)
+            for frame, box, job_plans in jobs
+        ))
+        monitor.last_frame_changed = any(state.last_frame_changed for state, _ in plans)
+
+        # 等待确认或冷却中的窗口即使再次检测到按钮也不会重复发送
+        found, triggers = monitor.observe_actions(plans, [item for results in matched for item in results])
+        for state, hit in triggers:
+            self._schedule_action(state, hit)
+        if not found and not self._pending:
+            log.info("未发现目标按钮，AI助手可能正在工作中...", extra=THROTTLE)
+        return found, False
+
+    def _schedule_action(self, state, hit):
+        if id(state) in self._pending:
+            return
+        self._pending.add(id(state))
+        task = asyncio.create_task(self._actuate(state, hit), name=f"actuate-{state.hwnd}")
+        self._action_tasks.add(task)
+        task.add_done_callback(self._action_tasks.discard)
+
+    async def _actuate(self, state, hit):
+        try:
+            async with self.action_lock:
+                if await self._run_in(self._action_executor, self.monitor.actuate, state, hit):
+                    self._sent = True
+                self.actions += 1
+        except Exception as e:
+            log.exception("❌ 执行动作时发生错误: %s", e)
+        finally:
+            self._pending.discard(id(state))
+
+    async def _config_loop(self):
+        monitor = self.monitor
+        watcher = monitor.config_watcher
+        while True:
+            await asyncio.sleep(watcher.check_interval)
+            config = await self._run_in(None, watcher.poll, True)
+            if config is None:
+                continue
+            # 等本轮检测和正在进行的发送结束后再替换配置和组件
+            async with self.tick_lock, self.action_lock:
+                await self._run_in(None, monitor.reload_config, config)
+
+    async def _dump_loop(self, dumper):
+        while True:
+            await asyncio.sleep(dumper.interval)
+            await self._run_in(None, dumper.dump)
+
+    async def _snapshot_loop(self):
+        snapshot = self.monitor.state_snapshot
+        while True:
+            # 保存间隔可以热加载
+            await asyncio.sleep(snapshot.save_interval)
+            await self._run_in(None, self.monitor.save_state_snapshot, True)
+
+    def get_stats(self):
+        """
+        返回运行时统计信息
+        """
+        return {
+            'ticks': self.ticks,
+            'frames_captured': self.frames_captured,
+            'actions': self.actions,
+            'pending_actions': len(self._pending),
+        }
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志设置
+功能：各模块通过 logging.getLogger(__name__) 输出日志，由本模块统一配置：
+- 日志先放入队列，由后台线程写入控制台和文件，监控循环不会被控制台输出阻塞
+- 每轮都会重复的消息（如"未发现目标按钮"）在一段时间内只输出一次，之后附带省略的次数
+- 文件为 JSON Lines 格式（每行一条记录），按大小轮换，总大小有上限
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+# 需要合并重复输出的消息使用: log.info("...", extra=THROTTLE)
+THROTTLE = {'throttle': True}
+
+# 控制台输出格式
+CONSOLE_FORMAT = "[%(asctime)s] %(message)s"
+CONSOLE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# LogRecord 自带的属性，其余属性视为通过 extra 传入的字段写入 JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {'message', 'asctime'}
+
+
+class RepeatFilter(logging.Filter):
+    """
+    合并重复的日志（只处理带 throttle 标记的记录）
+    同一日志器、同一消息模板在 interval 秒内只输出第一次，
+    间隔结束后再次出现时输出，并在 repeated 字段中附带期间省略的次数
+
+    Args:
+        interval: 合并的时间窗口（秒），为 0 时不合并
+    """
+
+    def __init__(self, interval=60.0):
+        super().__init__()
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if self.interval <= 0 or not getattr(record, 'throttle', False):
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window[0] < self.interval:
+                window[1] += 1
+                self.suppressed += 1
+                return False
+            record.repeated = window[1] if window is not None else 0
+            self._windows[key] = [now, 0]
+        return True
+
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    控制台格式，被合并的消息后面附带省略的次数
+    """
+
+    def __init__(self):
+        super().__init__(CONSOLE_FORMAT, CONSOLE_DATE_FORMAT)
+
+    def format(self, record):
+        text = super().format(record)
+        repeated = getattr(record, 'repeated', 0)
+        if repeated:
+            text += f"（期间重复 {repeated} 次，已省略）"
+        return text
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    每条记录输出为一行 JSON，通过 extra 传入的字段一并写入
+    """
+
+    def format(self, record):
+        data = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != 'throttle':
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _parse_level(level):
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        print(f"⚠️  未知的日志级别 {level}，使用 INFO")
+        return logging.INFO
+    return value
+
+
+def load_logging_settings(config_file="config.json"):
+    """
+    读取配置文件中的 logging_settings，返回 setup_logging 的参数
+    """
+    settings = {}
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r', encoding='utf-8') as f:
+                settings = json.load(f).get('logging_settings', {})
+    except Exception as e:
+        print(f"⚠️  读取日志配置失败，使用默认设置: {e}")
+    return {
+        'level': settings.get('level', 'INFO'),
+        'console': settings.get('console', True),
+        'console_level': settings.get('console_level'),
+        'file': settings.get('file'),
+        'max_bytes': settings.get('max_file_bytes', 5 * 1024 * 1024),
+        'backup_count': settings.get('backup_count', 5),
+        'repeat_interval': settings.get('repeat_interval_seconds', 60),
+    }
+
+
+def setup_logging(level="INFO", console=True, console_level=None, file=None,
+                  max_bytes=5 * 1024 * 1024, backup_count=5, repeat_interval=60.0):
+    """
+    配置根日志器：记录经过重复合并后放入队列，由后台线程写入控制台和轮换文件
+
+    Args:
+        level: 日志级别
+        console: 是否输出到控制台
+        console_level: 控制台的日志级别，默认与 level 相同
+        file: JSON Lines 日志文件，为 None 时不写文件
+        max_bytes: 单个日志文件的最大字节数
+        backup_count: 保留的历史日志文件数量
+        repeat_interval: 重复消息的合并时间窗口（秒）
+
+    返回: QueueListener，退出前调用 shutdown_logging 写完队列中剩余的日志
+    """
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(ConsoleFormatter())
+        console_handler.setLevel(_parse_level(console_level or level))
+        handlers.append(console_handler)
+    if file:
+        directory = os.path.dirname(file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(file_handler)
+
+    # 重复合并在放入队列之前进行，被合并的记录不会进入队列
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RepeatFilter(repeat_interval))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(_parse_level(level))
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def shutdown_logging(listener):
+    """
+    写完队列中剩余的日志并关闭文件
+    """
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线监控
+功能：把截图、检测、执行操作拆分到不同线程，通过有界队列连接
+- 截图线程：按调度间隔截取所有窗口的搜索区域（后台截图时逐个截取各窗口自身的内容）
+- 检测线程池：并行进行模板匹配（OpenCV 计算时会释放 GIL）
+- 执行线程：唯一负责激活窗口、粘贴和点击发送的线程
+队列满时丢弃最旧的数据，发送消息期间检测仍在继续进行
+配置热加载时先暂停检测和执行线程，等正在进行的检测和发送结束后再替换组件
+"""
+
+import collections
+import contextlib
+import logging
+import threading
+
+from capture_backends import FrameBuffer
+
+log = logging.getLogger(__name__)
+
+
+class DropOldestQueue:
+    """
+    有界队列，满时丢弃最旧的元素
+    """
+
+    def __init__(self, maxsize=2):
+        self.maxsize = max(1, maxsize)
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """
+        放入元素
+        返回: 被丢弃的最旧元素，没有丢弃时返回 None
+        """
+        dropped = None
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        return dropped
+
+    def get(self, timeout=None):
+        """
+        取出最旧的元素，超时返回 None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def clear(self):
+        """
+        丢弃所有元素
+        返回: 丢弃的元素列表
+        """
+        with self._cond:
+            items = list(self._items)
+            self._items.clear()
+        return items
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class MonitorPipeline:
+    """
+    基于 EnhancedTraeIDEMonitor 的流水线运行器
+
+    Args:
+        monitor: EnhancedTraeIDEMonitor 实例
+        detection_workers: 检测线程数量
+        queue_size: 截图队列和操作队列的容量
+    """
+
+    def __init__(self, monitor, detection_workers=2, queue_size=2):
+        self.monitor = monitor
+        self.detection_workers = max(1, detection_workers)
+        self.capture_queue = DropOldestQueue(queue_size)
+        self.action_queue = DropOldestQueue(queue_size)
+
+        # 画面缓冲区按轮次轮换使用：队列中和检测中的画面都不会被新截图覆盖
+        # 每轮一组缓冲区，后台截图时每个窗口占用一个
+        self._buffers = [[] for _ in range(queue_size + self.detection_workers + 1)]
+        self._buffer_index = 0
+
+        # 已排队或正在发送的窗口，避免同一窗口被重复触发
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+        # 正在检测或发送的线程数，配置热加载时暂停新的工作并等待其归零
+        self._work_cond = threading.Condition()
+        self._busy = 0
+        self._paused = False
+
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._button_found = False
+        self._sent = False
+
+        # 统计计数
+        self.frames_captured = 0
+        self.frames_detected = 0
+        self.actions = 0
+
+    def run(self):
+        """
+        启动所有线程并阻塞，直到按下 Ctrl+C
+        """
+        self._threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        for i in range(self.detection_workers):
+            self._threads.append(threading.Thread(target=self._detect_loop, name=f"detect-{i}", daemon=True))
+        self._threads.append(threading.Thread(target=self._actuate_loop, name="actuator", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+        log.info("🚀 流水线模式已启动: 1个截图线程, %s个检测线程, 1个执行线程", self.detection_workers)
+        try:
+            while not self._stop_event.is_set():
+                self._stop_event.wait(0.5)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """
+        通知所有线程退出并等待结束
+        """
+        self._stop_event.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=10)
+
+    def _next_buffers(self, count):
+        buffers = self._buffers[self._buffer_index]
+        self._buffer_index = (self._buffer_index + 1) % len(self._buffers)
+        while len(buffers) < count:
+            buffers.append(FrameBuffer())
+        return buffers[:count]
+
+    @contextlib.contextmanager
+    def _working(self):
+        """
+        检测和执行线程处理一项工作期间持有，配置热加载期间等待
+        """
+        with self._work_cond:
+            self._work_cond.wait_for(lambda: not self._paused)
+            self._busy += 1
+        try:
+            yield
+        finally:
+            with self._work_cond:
+                self._busy -= 1
+                self._work_cond.notify_all()
+
+    def _check_config_reload(self):
+        """
+        配置变化时暂停检测和执行线程，等正在使用旧匹配器、截图后端和模板的工作结束后再替换，
+        队列中按旧配置截取的画面一并丢弃
+        """
+        monitor = self.monitor
+        if monitor.config_watcher is None:
+            return
+        config = monitor.config_watcher.poll()
+        if config is None:
+            return
+        with self._work_cond:
+            self._paused = True
+            self._work_cond.wait_for(lambda: self._busy == 0)
+        try:
+            self.capture_queue.clear()
+            monitor.reload_config(config)
+        finally:
+            with self._work_cond:
+                self._paused = False
+                self._work_cond.notify_all()
+
+    def _capture_loop(self):
+        monitor = self.monitor
+        while not self._stop_event.is_set():
+            try:
+                self._check_config_reload()
+                self._capture_once()
+                monitor.save_state_snapshot()
+            except Exception as e:
+                log.exception("❌ 截图线程发生错误: %s", e)
+
+            if monitor.scheduler:
+                interval = monitor.scheduler.record_tick(
+                    button_found=self._button_found,
+                    frame_changed=monitor.last_frame_changed,
+                    sent=self._sent
+                )
+                self._sent = False
+            else:
+                interval = monitor.monitor_interval
+            monitor.record_poll_metrics(interval)
+            self._stop_event.wait(interval)
+
+    def _capture_once(self):
+        monitor = self.monitor
+        monitor.metrics.inc('ticks')
+        with self._pending_lock:
+            states = [s for s in monitor.get_active_states() if id(s) not in self._pending]
+        plans = monitor.plan_search_regions(states)
+        if not plans:
+            return
+
+        # 直接写入轮换缓冲区，交给检测线程期间不会被下一次截图覆盖
+        # 后台截图时逐个截取各窗口自身的内容，否则截取所有搜索区域的外接矩形一次
+        job = monitor.detector.capture_jobs(plans, monitor.background_capture, self._next_buffers)
+        if not job:
+            return
+
+        self.frames_captured += 1
+        self.capture_queue.put(job)
+
+    def _detect_loop(self):
+        monitor = self.monitor
+        while not self._stop_event.is_set():
+            with self._working():
+                job = self.capture_queue.get(timeout=0.5)
+                if job is None:
+                    continue
+                try:
+                    found = False
+                    frame_changed = False
+                    for frame, capture_box, plans in job:
+                        results = monitor.match_planned_regions(frame, capture_box, plans)
+                        frame_changed = frame_changed or monitor.last_frame_changed
+                        # 等待确认或冷却中的窗口即使再次检测到按钮也不会重复发送
+                        part_found, triggers = monitor.observe_actions(plans, results)
+                        found = found or part_found
+                        for state, hit in triggers:
+                            self._enqueue_action(state, hit)
+                    monitor.last_frame_changed = frame_changed
+                    self.frames_detected += 1
+                    self._button_found = found
+                except Exception as e:
+                    log.exception("❌ 检测线程发生错误: %s", e)
+
+    def _enqueue_action(self, state, hit):
+        with self._pending_lock:
+            if id(state) in self._pending:
+                return
+            self._pending.add(id(state))
+        dropped = self.action_queue.put((state, hit))
+        if dropped is not None:
+            with self._pending_lock:
+                self._pending.discard(id(dropped[0]))
+
+    def _actuate_loop(self):
+        monitor = self.monitor
+        while not self._stop_event.is_set():
+            with self._working():
+                item = self.action_queue.get(timeout=0.5)
+                if item is None:
+                    continue
+                state, hit = item
+                try:
+                    if monitor.actuate(state, hit):
+                        self._sent = True
+                    self.actions += 1
+                except Exception as e:
+                    log.exception("❌ 执行线程发生错误: %s", e)
+                finally:
+                    with self._pending_lock:
+                        self._pending.discard(id(state))
+
+    def get_stats(self):
+        """
+        返回流水线统计信息
+        """
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_detected': self.frames_detected,
+            'frames_dropped': self.capture_queue.dropped,
+            'actions': self.actions,
+            'actions_dropped': self.action_queue.dropped,
+        }
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控状态快照
+功能：定期把各窗口的检测状态写入文件，重启后恢复，第一轮检测就能像稳定运行时一样
+只在上次命中位置附近、按上次的缩放比例匹配，不需要重新全屏搜索：
+- 各状态模板上次命中的位置（ROI）和最佳缩放比例
+- 窗口区域、各状态的匹配分数统计、最近一次发送的时间（用于恢复发送冷却期）
+读取时检查保存时间和虚拟桌面范围，显示器布局变化或快照过旧时整体丢弃；
+窗口区域与保存时不同的窗口只恢复缩放比例和统计，ROI 重新搜索；
+启动后第一轮检测时没有对应窗口的记录立即丢弃，其余记录在等待期后丢弃，不会被套用到之后出现的其他窗口
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# 快照格式版本，格式不兼容时递增
+SNAPSHOT_VERSION = 2
+
+
+class MonitorSnapshot:
+    """
+    监控状态快照文件
+
+    Args:
+        path: 快照文件路径
+        save_interval: 两次保存之间的最短间隔（秒）
+        max_age: 快照的有效时间（秒），超过后启动时不再恢复，为 0 时不限制
+        grace: 读取后等待对应窗口可以恢复（例如从最小化还原）的最长时间（秒）
+    """
+
+    def __init__(self, path, save_interval=30.0, max_age=3600.0, grace=30.0):
+        self.path = path
+        self.save_interval = save_interval
+        self.max_age = max_age
+        self.grace = grace
+        self._last_save = time.monotonic()
+        # 已读取、等待对应窗口出现后恢复的窗口记录
+        self._windows = []
+        self._deadline = None
+        self._lock = threading.Lock()
+
+        # 统计计数
+        self.saves = 0
+        self.restored = 0
+        self.roi_restored = 0
+        self.geometry_changed = 0
+        self.discarded = 0
+
+    def load(self, screen_bounds):
+        """
+        读取快照，检查格式版本、保存时间和虚拟桌面范围，通过后保留其中的窗口记录等待恢复
+        返回: 等待恢复的窗口数量
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("⚠️  读取监控状态快照失败: %s", e)
+            return 0
+
+        if data.get('version') != SNAPSHOT_VERSION:
+            log.info("监控状态快照格式已变化，不再使用")
+            return 0
+        age = time.time() - data.get('saved_at', 0)
+        if self.max_age and not 0 <= age <= self.max_age:
+            log.info("监控状态快照已过期（%.0f 秒前保存），重新开始检测", age)
+            return 0
+        if tuple(data.get('screen_bounds') or ()) != tuple(screen_bounds):
+            log.info("显示器布局已变化 (%s -> %s)，不恢复监控状态快照", data.get('screen_bounds'), list(screen_bounds))
+            return 0
+
+        with self._lock:
+            self._windows = [item for item in data.get('windows', []) if isinstance(item, dict)]
+            self._deadline = None
+            count = len(self._windows)
+        log.info("✅ 已加载监控状态快照 %s: %s 个窗口（%.0f 秒前保存）", self.path, count, age)
+        return count
+
+    @property
+    def waiting(self):
+        """
+        等待恢复的窗口记录数量
+        """
+        return len(self._windows)
+
+    def _take_window(self, hwnd, title, window_rect):
+        """
+        取出与窗口对应的记录：优先按句柄，其次按标题和窗口区域（Trae 重启后句柄会变化）
+        """
+        with self._lock:
+            for i, item in enumerate(self._windows):
+                if hwnd is not None and item.get('hwnd') == hwnd:
+                    return self._windows.pop(i)
+            for i, item in enumerate(self._windows):
+                if title and item.get('title') == title and _as_rect(item.get('window_rect')) == window_rect:
+                    return self._windows.pop(i)
+        return None
+
+    def expire(self, states):
+        """
+        在一轮恢复之后调用，丢弃不会再用到的记录：
+        第一次调用时丢弃与当前所有窗口的句柄和标题都不对应的记录，超过等待期后丢弃全部剩余记录
+        Args:
+            states: 本轮检测的 WindowState 列表（窗口注册表已完整刷新）
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not self._windows:
+                return
+            if self._deadline is None:
+                self._deadline = now + self.grace
+                hwnds = {state.hwnd for state in states if state.hwnd}
+                titles = {state.title for state in states if state.title}
+                keep = [item for item in self._windows
+                        if item.get('hwnd') in hwnds or item.get('title') in titles]
+            elif now >= self._deadline:
+                keep = []
+            else:
+                return
+            dropped = len(self._windows) - len(keep)
+            self._windows = keep
+        if dropped:
+            self.discarded += dropped
+            log.info("监控状态快照中有 %s 个窗口记录没有可以恢复的窗口，已丢弃", dropped)
+
+    def restore(self, state, window_rect, names, scales, cooldown):
+        """
+        把快照中的记录恢复到窗口状态，每条记录只使用一次
+        Args:
+            state: WindowState
+            window_rect: 窗口当前的区域 (x, y, w, h)，窗口不存在或为整个屏幕时为 None
+            names: 当前配置的状态模板名称，已删除的模板不恢复
+            scales: 当前可用的缩放比例，不在其中的最佳比例不恢复
+            cooldown: 发送冷却时间（秒），按上次发送时间恢复剩余的冷却期
+        返回: 是否恢复
+        """
+        if not self._windows:
+            return False
+        window_rect = _as_rect(window_rect)
+        item = self._take_window(state.hwnd, state.title, window_rect)
+        if item is None:
+            return False
+
+        same_geometry = _as_rect(item.get('window_rect')) == window_rect
+        if not same_geometry:
+            self.geometry_changed += 1
+        templates = item.get('templates', {})
+        with state.lock:
+            for name in names:
+                saved = templates.get(name)
+                if not saved:
+                    continue
+                if saved.get('best_scale') in scales:
+                    state.best_scales[name] = saved['best_scale']
+                if saved.get('score_stats'):
+                    state.score_stats[name] = dict(saved['score_stats'])
+                # ROI 为屏幕坐标，窗口移动或改变大小后不再有效
+                last_hit = _as_rect(saved.get('last_hit'))
+                if same_geometry and last_hit is not None:
+                    state.get_roi_tracker(name).last_hit = last_hit
+                    self.roi_restored += 1
+
+            last_send = item.get('last_send_time')
+            if last_send is not None:
+                state.last_send_time = last_send
+                remaining = cooldown - (time.time() - last_send)
+                if remaining > 0:
+                    state.cooldown_until = max(state.cooldown_until, time.monotonic() + remaining)
+        self.restored += 1
+        log.info("♻️  已恢复窗口的监控状态: %s%s", state.title or "(单窗口)",
+                 "" if same_geometry else "（窗口区域已变化，重新搜索按钮位置）")
+        return True
+
+    @staticmethod
+    def describe(state, window_rect):
+        """
+        返回一个窗口状态的快照记录
+        """
+        with state.lock:
+            names = set(state.roi_trackers) | set(state.best_scales) | set(state.score_stats)
+            templates = {}
+            for name in sorted(names):
+                tracker = state.roi_trackers.get(name)
+                templates[name] = {
+                    'last_hit': list(tracker.last_hit) if tracker and tracker.last_hit else None,
+                    'best_scale': state.best_scales.get(name),
+                    'score_stats': state.score_stats.get(name),
+                }
+            return {
+                'hwnd': state.hwnd,
+                'title': state.title,
+                'window_rect': list(window_rect) if window_rect else None,
+                'last_send_time': state.last_send_time,
+                'templates': templates,
+            }
+
+    def due(self):
+        """
+        距上次保存是否已超过保存间隔
+        """
+        return time.monotonic() - self._last_save >= self.save_interval
+
+    def save(self, windows, screen_bounds):
+        """
+        保存快照（先写临时文件再替换，避免写到一半时中断）
+        Args:
+            windows: describe 返回的窗口记录列表
+            screen_bounds: 当前虚拟桌面范围 (x, y, w, h)
+        """
+        self._last_save = time.monotonic()
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'saved_at': time.time(),
+            'screen_bounds': list(screen_bounds),
+            'windows': windows,
+        }
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self.saves += 1
+        except OSError as e:
+            log.warning("⚠️  保存监控状态快照失败: %s", e)
+
+    def get_stats(self):
+        return {
+            'saves': self.saves,
+            'restored': self.restored,
+            'roi_restored': self.roi_restored,
+            'geometry_changed': self.geometry_changed,
+            'discarded': self.discarded,
+            'waiting': self.waiting,
+        }
+
+
+def _as_rect(value):
+    """
+    把 JSON 中的区域转换为 (x, y, w, h)，格式不对时返回 None
+    """
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return None
+    try:
+        return tuple(int(v) for v in value)
+    except (TypeError, ValueError):
+        return None
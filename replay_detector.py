@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检测器离线回放与基准测试
+功能：把录制的画面（图片、图片目录或视频）逐帧送入与监控器相同的检测流程（DetectionRunner），
+截图使用 file 后端，不依赖 pyautogui 和 win32，可以在 Linux 上比较不同匹配器和参数
+输出每帧检测耗时的百分位数、吞吐量（帧/秒）、峰值内存、每帧临时分配的内存，以及与标注对比的精确率和召回率
+
+标注文件为 JSON，键为画面名称（图片文件名；视频为 "文件名#帧序号"），值为该画面中存在的状态：
+    {"frame_001.png": ["send_button"], "frame_002.png": [], "rec.mp4#000012": {"send_button": [1520, 520]}}
+值为字典时还会检查命中位置（状态中心坐标）是否在 --tolerance 像素以内；未出现在标注中的画面不参与统计
+
+用法：
+    python replay_detector.py recordings/ --labels labels.json --matcher exhaustive pyramid
+    python replay_detector.py detection_result.png --embed --repeat 20
+使用 --embed 时把第一个状态的模板贴入随机一半的画面（固定位置），并以贴入位置作为标注
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+
+import cv2
+
+from benchmark_matcher import percentile
+from capture_backends import FileCapture, IMAGE_EXTENSIONS
+from detection_engine import DetectionEngine, build_state_templates
+from detection_runner import DetectionRunner
+from matchers import create_matcher
+from template_cache import TemplateCache, scale_range
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv')
+
+
+def iter_frames(sources, limit=None):
+    """
+    依次读取画面，视频逐帧解码，不会一次性载入内存
+    返回: 生成 (画面名称, BGR 画面)
+    """
+    count = 0
+    for source in sources:
+        if os.path.isdir(source):
+            files = [os.path.join(source, name) for name in sorted(os.listdir(source))
+                     if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)]
+        else:
+            files = [source]
+
+        for file in files:
+            if file.lower().endswith(VIDEO_EXTENSIONS):
+                video = cv2.VideoCapture(file)
+                index = 0
+                try:
+                    while True:
+                        ok, frame = video.read()
+                        if not ok:
+                            break
+                        yield f"{os.path.basename(file)}#{index:06d}", frame
+                        index += 1
+                        count += 1
+                        if limit and count >= limit:
+                            return
+                finally:
+                    video.release()
+            else:
+                frame = cv2.imread(file)
+                if frame is None:
+                    print(f"⚠️  无法读取画面 {file}，已跳过")
+                    continue
+                yield os.path.basename(file), frame
+                count += 1
+                if limit and count >= limit:
+                    return
+
+
+def load_labels(path):
+    """
+    读取标注文件，统一转换为 {画面名称: {状态名称: 中心坐标或 None}}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    labels = {}
+    for name, states in raw.items():
+        if isinstance(states, dict):
+            labels[name] = {state: tuple(pos) if pos else None for state, pos in states.items()}
+        else:
+            labels[name] = {state: None for state in states}
+    return labels
+
+
+def load_detection_settings(config_file):
+    """
+    读取配置文件中的检测设置，与监控器使用相同的键和默认值
+    """
+    settings = {}
+    if config_file and os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            settings = json.load(f).get('detection_settings', {})
+    return {
+        'match_threshold': settings.get('match_threshold', 0.95),
+        'target_button_image': settings.get('target_button_image', 'dd.PNG'),
+        'templates': settings.get('templates'),
+        'search_region': settings.get('search_region'),
+        'roi_padding': settings.get('roi_padding', 100),
+        'roi_max_misses': settings.get('roi_max_misses', 5),
+        'change_detection': settings.get('change_detection', True),
+        'change_tolerance': settings.get('change_tolerance', 2.0),
+        'max_staleness': settings.get('max_staleness_seconds', 60),
+        'matcher': settings.get('matcher', 'exhaustive'),
+        'matcher_options': {
+            'pyramid': {
+                'levels': settings.get('pyramid_levels', 1),
+                'grayscale': settings.get('pyramid_grayscale', True),
+                'candidates': settings.get('pyramid_candidates', 3),
+            },
+            'tiled': {
+                'tile_size': settings.get('tile_size', 1024),
+                'workers': settings.get('tile_workers'),
+                'executor': settings.get('tile_executor', 'thread'),
+            },
+        },
+        'scales': scale_range(settings.get('scale_min', 1.0), settings.get('scale_max', 1.0),
+                              settings.get('scale_step', 0.25)),
+    }
+
+
+def build_runner(settings, matcher_name, first_frame):
+    """
+    按检测设置创建检测流程，截图后端为单帧的 file 后端，之后逐帧替换画面
+    返回: (DetectionRunner, FileCapture)
+    """
+    options = settings['matcher_options'].get(matcher_name, {})
+    engine = DetectionEngine(
+        TemplateCache(scales=settings['scales']),
+        create_matcher(matcher_name, **options),
+        build_state_templates(settings['templates'], settings['target_button_image'],
+                              settings['match_threshold'], settings['search_region'])
+    )
+    capture = FileCapture([first_frame], advance=False)
+    runner = DetectionRunner(
+        engine,
+        capture,
+        roi_padding=settings['roi_padding'],
+        roi_max_misses=settings['roi_max_misses'],
+        change_detection=settings['change_detection'],
+        change_tolerance=settings['change_tolerance'],
+        max_staleness=settings['max_staleness']
+    )
+    return runner, capture
+
+
+def score_frame(counts, expected, hits, tolerance):
+    """
+    按状态累计 TP/FP/FN
+    Args:
+        expected: {状态名称: 中心坐标或 None}
+        hits: 该画面的 [StateHit, ...]
+    """
+    found = {hit.name: hit.position for hit in hits}
+    for name in set(expected) | set(found):
+        c = counts.setdefault(name, {'tp': 0, 'fp': 0, 'fn': 0})
+        if name not in found:
+            c['fn'] += 1
+        elif name not in expected:
+            c['fp'] += 1
+        else:
+            pos = expected[name]
+            hit_pos = found[name]
+            if pos is None or (abs(hit_pos[0] - pos[0]) <= tolerance and abs(hit_pos[1] - pos[1]) <= tolerance):
+                c['tp'] += 1
+            else:
+                # 位置错误：既是误检也是漏检
+                c['fp'] += 1
+                c['fn'] += 1
+
+
+def replay(frames, settings, matcher_name, labels=None, tolerance=5):
+    """
+    回放画面序列，每一帧都走完整的检测流程（规划搜索区域、截图、画面变化判断、匹配）
+    Args:
+        frames: 可迭代的 (画面名称, BGR 画面, 标注或 None)
+    返回: 统计结果字典
+    """
+    runner = capture = state = None
+    latencies = []
+    # 每帧检测期间临时分配的内存峰值（字节）
+    tick_allocations = []
+    peak = 0
+    counts = {}
+    labeled = 0
+
+    tracemalloc.start()
+    for name, frame, expected in frames:
+        if runner is None:
+            runner, capture = build_runner(settings, matcher_name, frame)
+            state = runner.create_window_state()
+        capture.set_frame(frame)
+
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        results = runner.detect(runner.plan([(state, None)]))
+        latencies.append(time.perf_counter() - start)
+        _, tick_peak = tracemalloc.get_traced_memory()
+        tick_allocations.append(tick_peak - baseline)
+        peak = max(peak, tick_peak)
+
+        if expected is None and labels is not None:
+            expected = labels.get(name)
+        if expected is not None:
+            labeled += 1
+            score_frame(counts, expected, results[0][1] if results else [], tolerance)
+    tracemalloc.stop()
+
+    if not latencies:
+        return None
+    runner.engine.matcher.close()
+    total_tp = sum(c['tp'] for c in counts.values())
+    total_fp = sum(c['fp'] for c in counts.values())
+    total_fn = sum(c['fn'] for c in counts.values())
+    return {
+        'frames': len(latencies),
+        'labeled_frames': labeled,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000,
+        'fps': len(latencies) / sum(latencies) if sum(latencies) > 0 else float('inf'),
+        'peak_traced_mb': peak / 1024 / 1024,
+        'tick_alloc_mean_mb': sum(tick_allocations) / len(tick_allocations) / 1024 / 1024,
+        'tick_alloc_max_mb': max(tick_allocations) / 1024 / 1024,
+        'precision': total_tp / (total_tp + total_fp) if total_tp + total_fp else None,
+        'recall': total_tp / (total_tp + total_fn) if total_tp + total_fn else None,
+        'per_state': counts,
+        'engine': runner.engine.get_stats(),
+        'frame_change': state.change_detector.get_stats() if state.change_detector else None,
+    }
+
+
+def embedded_frames(frames, template, state_name, rng):
+    """
+    把模板贴入随机一半的画面，生成带标注的画面序列
+    与真实界面一样，按钮每次出现都在同一位置（位置在第一帧随机选定）
+    """
+    h, w = template.shape[:2]
+    position = None
+    for name, frame in frames:
+        if position is None:
+            position = (rng.randint(0, frame.shape[1] - w), rng.randint(0, frame.shape[0] - h))
+        if rng.random() < 0.5:
+            x, y = position
+            frame = frame.copy()
+            frame[y:y + h, x:x + w] = template
+            yield name, frame, {state_name: (x + w // 2, y + h // 2)}
+        else:
+            yield name, frame, {}
+
+
+def peak_rss_mb():
+    """
+    进程的峰值常驻内存（MB），不支持时返回 None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的单位为字节，Linux 为 KB
+    return peak / 1024 / 1024 if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def format_optional(value, fmt):
+    return '-' if value is None else format(value, fmt)
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="离线回放录制画面，测试检测器的耗时和准确度")
+    parser.add_argument('sources', nargs='*', default=['detection_result.png'],
+                        help="录制的画面文件、目录或视频")
+    parser.add_argument('--config', default='config.json', help="读取其中的 detection_settings")
+    parser.add_argument('--matcher', nargs='+', help="要比较的匹配器，默认使用配置文件中的设置")
+    parser.add_argument('--labels', help="标注文件（JSON）")
+    parser.add_argument('--embed', action='store_true', help="把模板随机贴入画面并自动生成标注")
+    parser.add_argument('--tolerance', type=int, default=5, help="命中位置判定为正确的像素误差")
+    parser.add_argument('--repeat', type=int, default=1, help="整个画面序列重复回放的次数")
+    parser.add_argument('--limit', type=int, help="最多回放的画面数量")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--output', help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    settings = load_detection_settings(args.config)
+    labels = load_labels(args.labels) if args.labels else None
+    matcher_names = args.matcher or [settings['matcher']]
+
+    embed_template_image = None
+    embed_state = None
+    if args.embed:
+        spec = build_state_templates(settings['templates'], settings['target_button_image'],
+                                     settings['match_threshold'])[0]
+        embed_template_image = cv2.imread(spec.image)
+        embed_state = spec.name
+        if embed_template_image is None:
+            print(f"❌ 错误: 无法加载模板 {spec.image}")
+            return
+
+    def repeated_frames():
+        for _ in range(args.repeat):
+            yield from iter_frames(args.sources, args.limit)
+
+    def frame_sequence():
+        if args.embed:
+            # 每个匹配器使用相同的随机序列，结果可以直接比较
+            yield from embedded_frames(repeated_frames(), embed_template_image, embed_state,
+                                       random.Random(args.seed))
+        else:
+            for name, frame in repeated_frames():
+                yield name, frame, None
+
+    results = {}
+    for matcher_name in matcher_names:
+        result = replay(frame_sequence(), settings, matcher_name, labels, args.tolerance)
+        if result is None:
+            print("❌ 错误: 没有可用的画面")
+            return
+        results[matcher_name] = result
+
+    first = next(iter(results.values()))
+    print(f"画面数量: {first['frames']}, 有标注: {first['labeled_frames']}")
+    print(f"{'匹配器':<12}{'P50(ms)':>10}{'P95(ms)':>10}{'P99(ms)':>10}{'最大(ms)':>10}"
+          f"{'帧/秒':>10}{'峰值内存(MB)':>14}{'每帧分配(MB)':>14}{'精确率':>8}{'召回率':>8}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}"
+              f"{r['fps']:>10.1f}{r['peak_traced_mb']:>14.1f}{r['tick_alloc_mean_mb']:>14.2f}"
+              f"{format_optional(r['precision'], '.0%'):>8}{format_optional(r['recall'], '.0%'):>8}")
+    for name, r in results.items():
+        print(f"📊 {name} 各状态: {r['per_state']}")
+        print(f"📊 {name} 检测统计: {r['engine']}, 画面变化: {r['frame_change']}")
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"进程峰值常驻内存: {rss:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'peak_rss_mb': rss}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+感兴趣区域（ROI）跟踪器
+功能：优先在上次命中位置附近（或配置的检测区域）进行模板匹配，
+连续多次未命中后再扩大到全屏搜索一次
+"""
+
+
+class ROITracker:
+    """
+    ROI 跟踪器
+
+    Args:
+        padding: 在上次命中的模板区域四周额外扩展的像素数
+        max_misses: ROI 连续未命中多少次后进行一次全屏搜索
+        search_region: 配置的检测区域 (x, y, w, h)，没有命中记录时使用
+    """
+
+    def __init__(self, padding=100, max_misses=5, search_region=None):
+        self.padding = padding
+        self.max_misses = max(1, max_misses)
+        self.search_region = tuple(search_region) if search_region else None
+
+        # 上次命中的模板左上角及尺寸 (x, y, w, h)
+        self.last_hit = None
+        self.consecutive_misses = 0
+        self._current_is_roi = False
+
+        # 统计计数
+        self.roi_searches = 0
+        self.full_searches = 0
+        self.roi_hits = 0
+        self.widenings = 0
+
+    def next_region(self, screen_bounds, template_w, template_h, bounds=None):
+        """
+        计算本次搜索区域
+        Args:
+            screen_bounds: 虚拟桌面范围 (x, y, w, h)，多显示器时原点可以为负
+            bounds: 全屏搜索时使用的范围 (x, y, w, h)，例如Trae窗口区域，默认为整个虚拟桌面
+        返回: (x, y, w, h)，已裁剪到搜索范围内且不小于模板尺寸
+        """
+        if bounds is None:
+            bounds = screen_bounds
+
+        base = None
+        if self.consecutive_misses < self.max_misses:
+            if self.last_hit is not None:
+                hx, hy, hw, hh = self.last_hit
+                base = (hx - self.padding, hy - self.padding,
+                        hw + 2 * self.padding, hh + 2 * self.padding)
+            elif self.search_region is not None:
+                base = self.search_region
+        else:
+            # 连续未命中次数达到上限，本次扩大到全屏
+            self.widenings += 1
+            self.consecutive_misses = 0
+
+        full_region = self._clip(bounds, screen_bounds, template_w, template_h)
+        if base is None:
+            self._current_is_roi = False
+            self.full_searches += 1
+            return full_region
+
+        region = self._clip(base, full_region, template_w, template_h)
+        self._current_is_roi = region != full_region
+        if self._current_is_roi:
+            self.roi_searches += 1
+        else:
+            self.full_searches += 1
+        return region
+
+    @property
+    def current_is_roi(self):
+        """
+        本次搜索是否为局部（ROI）搜索
+        """
+        return self._current_is_roi
+
+    def record_hit(self, x, y, w, h):
+        """
+        记录一次命中（模板左上角坐标及尺寸，均为整屏坐标）
+        """
+        if self._current_is_roi:
+            self.roi_hits += 1
+        self.last_hit = (x, y, w, h)
+        self.consecutive_misses = 0
+
+    def record_miss(self):
+        """
+        记录一次未命中，全屏搜索未命中不计入
+        """
+        if self._current_is_roi:
+            self.consecutive_misses += 1
+
+    def reset(self):
+        """
+        清除命中记录，下次从配置区域或全屏开始
+        """
+        self.last_hit = None
+        self.consecutive_misses = 0
+
+    def get_stats(self):
+        """
+        返回跟踪统计信息
+        """
+        return {
+            'roi_searches': self.roi_searches,
+            'full_searches': self.full_searches,
+            'roi_hits': self.roi_hits,
+            'widenings': self.widenings,
+            'last_hit': self.last_hit,
+        }
+
+    @staticmethod
+    def _clip(region, bounds, template_w, template_h):
+        x, y, w, h = region
+        bx, by, bw, bh = bounds
+        x0 = max(bx, int(x))
+        y0 = max(by, int(y))
+        x1 = min(bx + bw, int(x + w))
+        y1 = min(by + bh, int(y + h))
+
+        # 区域必须能容纳模板，否则向左上方扩展
+        if x1 - x0 < template_w:
+            x0 = max(bx, x1 - template_w)
+            x1 = min(bx + bw, x0 + template_w)
+        if y1 - y0 < template_h:
+            y0 = max(by, y1 - template_h)
+            y1 = min(by + bh, y0 + template_h)
+        return (x0, y0, max(0, x1 - x0), max(0, y1 - y0))
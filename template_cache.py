@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板图片缓存
+功能：每个模板只解码一次，常驻内存并预先计算灰度图、金字塔缩小图和多个缩放比例的模板（缩放模板库），
+仅当文件的修改时间或大小变化时才重新加载
+"""
+
+import os
+import threading
+import time
+import cv2
+
+
+def scale_range(min_scale=1.0, max_scale=1.0, step=0.25):
+    """
+    生成缩放比例列表，总是包含 1.0（模板原始尺寸）
+    例如 scale_range(1.0, 1.5, 0.25) -> (1.0, 1.25, 1.5)
+    """
+    scales = {1.0}
+    if step > 0 and max_scale >= min_scale:
+        count = int(round((max_scale - min_scale) / step))
+        scales.update(round(min_scale + i * step, 4) for i in range(count + 1))
+    return tuple(sorted(s for s in scales if s > 0))
+
+
+class TemplateEntry:
+    """
+    已解码的模板及其预处理结果
+
+    Args:
+        scales: 缩放模板库的比例，用于在不同 DPI 缩放的显示器上匹配
+    """
+
+    def __init__(self, path, image, mtime, size, pyramid_levels=2, scales=(1.0,), scale=1.0):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.scale = scale
+        self.bgr = image
+        self.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.height, self.width = image.shape[:2]
+
+        # 金字塔：pyramid[0] 为原图，之后每层长宽减半；灰度金字塔由灰度原图逐层缩小，
+        # PreparedFrame 按同样的顺序构建画面的金字塔，两边的分数可以直接比较
+        self.pyramid_bgr = [self.bgr]
+        self.pyramid_gray = [self.gray]
+        for _ in range(pyramid_levels):
+            prev_bgr = self.pyramid_bgr[-1]
+            # 模板过小时不再继续缩小，避免匹配失去意义
+            if min(prev_bgr.shape[:2]) < 8:
+                break
+            self.pyramid_bgr.append(cv2.pyrDown(prev_bgr))
+            self.pyramid_gray.append(cv2.pyrDown(self.pyramid_gray[-1]))
+
+        # 缩放模板库：加载时一次性生成，scale_bank 中包含原尺寸模板本身
+        self.scale_bank = [self]
+        for factor in scales:
+            if factor == scale:
+                continue
+            width = max(1, int(round(self.width * factor)))
+            height = max(1, int(round(self.height * factor)))
+            interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_CUBIC
+            resized = cv2.resize(image, (width, height), interpolation=interpolation)
+            self.scale_bank.append(TemplateEntry(path, resized, mtime, size, pyramid_levels, (), factor))
+
+    def get_variant(self, level=0, grayscale=False):
+        """
+        获取指定金字塔层级的模板
+        """
+        levels = self.pyramid_gray if grayscale else self.pyramid_bgr
+        level = max(0, min(level, len(levels) - 1))
+        return levels[level]
+
+    def get_scaled(self, scale=1.0):
+        """
+        获取缩放模板库中最接近指定比例的模板
+        """
+        return min(self.scale_bank, key=lambda entry: abs(entry.scale - scale))
+
+
+class TemplateCache:
+    """
+    模板缓存，按文件路径缓存已解码的模板（线程安全，检测线程池会并发调用）
+
+    Args:
+        pyramid_levels: 预先计算的金字塔层数
+        stat_interval: 两次检查文件状态之间的最短间隔（秒），0 表示每次都检查
+        scales: 每个模板预先生成的缩放比例
+    """
+
+    def __init__(self, pyramid_levels=2, stat_interval=1.0, scales=(1.0,)):
+        self.pyramid_levels = pyramid_levels
+        self.stat_interval = stat_interval
+        self.scales = tuple(scales)
+        self._entries = {}
+        self._last_stat = {}
+        self._lock = threading.Lock()
+        self.last_error = None
+
+        # 统计计数
+        self.hits = 0
+        self.reloads = 0
+        self.failures = 0
+
+    def get(self, path):
+        """
+        获取模板，必要时从磁盘加载
+        返回: TemplateEntry 或 None（失败原因见 last_error）
+        """
+        with self._lock:
+            return self._get_locked(path)
+
+    def _get_locked(self, path):
+        entry = self._entries.get(path)
+        now = time.monotonic()
+
+        # 在检查间隔内直接命中缓存，不触碰磁盘
+        if entry is not None and now - self._last_stat.get(path, 0) < self.stat_interval:
+            self.hits += 1
+            return entry
+
+        self._last_stat[path] = now
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._entries.pop(path, None)
+            self.failures += 1
+            self.last_error = f"找不到目标按钮图片 {path}"
+            return None
+
+        if entry is not None and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+            self.hits += 1
+            return entry
+
+        image = cv2.imread(path)
+        if image is None:
+            self._entries.pop(path, None)
+            self.failures += 1
+            self.last_error = f"无法读取目标按钮图片 {path}"
+            return None
+
+        entry = TemplateEntry(path, image, stat.st_mtime, stat.st_size, self.pyramid_levels, self.scales)
+        self._entries[path] = entry
+        self.reloads += 1
+        self.last_error = None
+        return entry
+
+    def set_scales(self, scales):
+        """
+        修改缩放比例，已缓存的模板需要重新生成各比例的版本，因此一并清空
+        """
+        scales = tuple(scales)
+        if scales != self.scales:
+            self.scales = scales
+            self.invalidate()
+
+    def invalidate(self, path=None):
+        """
+        使缓存失效，path 为 None 时清空全部
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._last_stat.clear()
+            else:
+                self._entries.pop(path, None)
+                self._last_stat.pop(path, None)
+
+    def get_stats(self):
+        """
+        返回缓存统计信息
+        """
+        return {
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'cached_templates': len(self._entries),
+        }
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口动作状态机测试：发送、等待确认、冷却和回到空闲的转换，重复命中被忽略，
+发送未生效后指数退避重试、重试用完后放弃，以及确认结果交给阈值校准器
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import action_state
+from action_state import AWAITING_CONFIRMATION, COOLDOWN, IDLE, SENDING, ActionGuard
+from detection_engine import ACTION_SEND_MESSAGE, StateHit
+from metrics import MetricsRegistry
+from roi_tracker import ROITracker
+from window_state import WindowState
+
+
+def make_hit(name='send_button', score=0.95, position=(816, 912)):
+    return StateHit(name=name, action=ACTION_SEND_MESSAGE, score=score, position=position,
+                    box=(800, 900, 32, 24), priority=0, threshold=0.9, scale=1.0)
+
+
+class RecordingCalibrator:
+
+    def __init__(self):
+        self.samples = []
+
+    def record(self, name, score, present):
+        self.samples.append((name, round(score, 3), present))
+
+
+class ActionGuardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(action_state.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.metrics = MetricsRegistry()
+        self.calibrator = RecordingCalibrator()
+        self.guard = ActionGuard(cooldown=10, confirm_timeout=3, max_retries=2, backoff_base=5,
+                                 backoff_factor=2, backoff_max=60, metrics=self.metrics,
+                                 calibrator=self.calibrator)
+        self.state = WindowState(1, 'main.py - Trae', lambda name: ROITracker())
+
+    def advance(self, seconds):
+        self.now += seconds
+        self.guard.refresh(self.state)
+
+    def send(self, ok=True, verified=True):
+        hit = make_hit()
+        self.assertTrue(self.guard.observe(self.state, hit))
+        self.assertTrue(self.guard.begin(self.state, hit))
+        if ok:
+            self.guard.finish(self.state, ok, verified)
+            return
+        with self.assertLogs('action_state', 'WARNING'):
+            self.guard.finish(self.state, ok, verified)
+
+    def cooldown_left(self):
+        return self.state.cooldown_until - self.now
+
+    def test_send_confirm_cooldown(self):
+        self.send()
+        self.assertEqual(self.state.action.phase, AWAITING_CONFIRMATION)
+        self.assertIsNotNone(self.state.last_send_time)
+        # 确认期内按钮多停留一帧不会重复发送
+        self.assertFalse(self.guard.observe(self.state, make_hit()))
+        self.assertFalse(self.guard.observe(self.state, None))
+        self.assertEqual(self.state.action.phase, COOLDOWN)
+        self.assertEqual(self.cooldown_left(), 10)
+        self.assertFalse(self.guard.begin(self.state, make_hit()))
+
+        self.advance(10)
+        self.assertEqual(self.state.action.phase, IDLE)
+        stats = self.guard.get_stats()
+        self.assertEqual(stats['transitions'], {
+            'idle->sending': 1, 'sending->awaiting_confirmation': 1,
+            'awaiting_confirmation->cooldown': 1, 'cooldown->idle': 1,
+        })
+        self.assertEqual((stats['confirmed'], stats['suppressed']), (1, 2))
+        self.assertEqual(self.metrics.get_counter('action_confirmed'), 1)
+        self.assertEqual(self.metrics.get_counter('action_transitions', source=IDLE, target=SENDING), 1)
+        self.assertEqual(self.calibrator.samples, [('send_button', 0.95, True)])
+
+    def test_other_state_confirms(self):
+        self.send()
+        self.guard.observe(self.state, make_hit('retry'))
+        self.assertEqual(self.state.action.phase, COOLDOWN)
+        self.assertEqual(self.guard.confirmed, 1)
+
+    def test_hits_while_sending_suppressed(self):
+        hit = make_hit()
+        self.guard.begin(self.state, hit)
+        self.assertFalse(self.guard.observe(self.state, hit))
+        self.assertFalse(self.guard.begin(self.state, hit))
+        self.assertEqual(self.metrics.get_counter('action_suppressed'), 2)
+
+    def test_retry_backoff_then_give_up(self):
+        delays = []
+        for _ in range(3):
+            self.send()
+            self.now += 3
+            with self.assertLogs('action_state', 'WARNING'):
+                self.assertFalse(self.guard.observe(self.state, make_hit()))
+            self.assertEqual(self.state.action.phase, COOLDOWN)
+            delays.append(self.cooldown_left())
+            self.advance(delays[-1])
+        self.assertEqual(delays, [5, 10, 60])
+        stats = self.guard.get_stats()
+        self.assertEqual((stats['retries'], stats['gave_up'], stats['confirmed']), (2, 1, 0))
+        self.assertEqual(self.metrics.get_counter('action_gave_up'), 1)
+        # 放弃后重新开始计算失败次数
+        self.assertEqual(self.state.action.failures, 0)
+        # 文本已粘贴、按钮仍不消失的命中记为误触发
+        self.assertEqual(self.calibrator.samples, [('send_button', 0.95, False)] * 3)
+
+    def test_backoff_capped(self):
+        self.guard.configure(10, 3, 5, 5, 10, 20)
+        self.send(ok=False)
+        self.advance(5)
+        self.send(ok=False)
+        self.assertEqual(self.cooldown_left(), 20)
+
+    def test_failed_send_not_recorded(self):
+        self.send(ok=False)
+        self.assertEqual(self.state.action.phase, COOLDOWN)
+        self.assertEqual(self.cooldown_left(), 5)
+        self.assertEqual(self.calibrator.samples, [])
+
+    def test_unverified_timeout_not_recorded(self):
+        self.send(verified=False)
+        self.now += 3
+        with self.assertLogs('action_state', 'WARNING'):
+            self.guard.observe(self.state, make_hit())
+        self.assertEqual(self.guard.retries, 1)
+        self.assertEqual(self.calibrator.samples, [])
+
+    def test_button_gone_resets_failures(self):
+        self.send(ok=False)
+        self.advance(5)
+        self.assertEqual(self.state.action.failures, 1)
+        self.guard.observe(self.state, None)
+        self.assertEqual(self.state.action.failures, 0)
+
+    def test_near_misses_recorded_on_confirmation(self):
+        self.state.record_near_misses([make_hit(score=0.86)], now=self.now - 40)
+        self.state.record_near_misses([make_hit(score=0.87), make_hit(score=0.88, position=(100, 100))],
+                                      now=self.now - 5)
+        self.send()
+        self.guard.observe(self.state, None)
+        # 只记录近似命中窗口期内、位置在命中区域内的近似命中
+        self.assertEqual(self.calibrator.samples, [('send_button', 0.95, True), ('send_button', 0.87, True)])
+        self.assertEqual(len(self.state.near_misses), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应轮询调度器测试：发送后快速轮询、无变化时指数退避、预计停止时间前提前唤醒、反应时间统计
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import adaptive_scheduler
+from adaptive_scheduler import AdaptivePollingScheduler
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class AdaptivePollingSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(adaptive_scheduler.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tick(self, scheduler, seconds, **result):
+        self.clock.now += seconds
+        return scheduler.record_tick(**result)
+
+    def test_backoff_until_max(self):
+        scheduler = AdaptivePollingScheduler(min_interval=2.0, max_interval=10.0, backoff_factor=2.0)
+        intervals = [self.tick(scheduler, 1) for _ in range(4)]
+        self.assertEqual(intervals, [4.0, 8.0, 10.0, 10.0])
+
+    def test_frame_change_resets_to_min(self):
+        scheduler = AdaptivePollingScheduler(min_interval=2.0, max_interval=10.0, backoff_factor=2.0)
+        self.tick(scheduler, 1)
+        self.tick(scheduler, 1)
+        self.assertEqual(self.tick(scheduler, 1, frame_changed=True), 2.0)
+
+    def test_fast_ticks_after_send(self):
+        scheduler = AdaptivePollingScheduler(min_interval=2.0, max_interval=30.0, backoff_factor=2.0,
+                                             fast_ticks_after_send=2)
+        self.tick(scheduler, 1)
+        self.tick(scheduler, 1)
+        intervals = [self.tick(scheduler, 1, sent=True), self.tick(scheduler, 2), self.tick(scheduler, 2)]
+        self.assertEqual(intervals, [2.0, 2.0, 4.0])
+
+    def test_wakes_before_expected_stop(self):
+        scheduler = AdaptivePollingScheduler(min_interval=1.0, max_interval=60.0, backoff_factor=10.0,
+                                             fast_ticks_after_send=0, pre_stop_lead=5.0)
+        # 第一次发送后 40 秒按钮出现，学到典型工作时长 40 秒
+        self.tick(scheduler, 1, sent=True)
+        self.tick(scheduler, 40, button_found=True)
+        self.assertAlmostEqual(scheduler.typical_work_duration, 40.0)
+        self.tick(scheduler, 1, sent=True)
+        # 不会睡过预计停止前 5 秒
+        self.assertAlmostEqual(self.tick(scheduler, 10), 25.0)
+        # 预计停止时间附近使用最短间隔
+        self.assertEqual(self.tick(scheduler, 26), 1.0)
+
+    def test_reaction_times(self):
+        scheduler = AdaptivePollingScheduler()
+        self.tick(scheduler, 1)
+        self.tick(scheduler, 3, button_found=True)
+        # 按钮持续可见时不重复记录
+        self.tick(scheduler, 2, button_found=True)
+        self.assertEqual(list(scheduler.reaction_times), [3.0])
+        self.assertEqual(scheduler.reaction_count, 1)
+        self.assertEqual(scheduler.get_stats()['reaction_max_seconds'], 3.0)
+
+    def test_reaction_window_bounded(self):
+        scheduler = AdaptivePollingScheduler()
+        self.tick(scheduler, 1)
+        for _ in range(adaptive_scheduler.REACTION_WINDOW + 10):
+            self.tick(scheduler, 1, button_found=True)
+            self.tick(scheduler, 1)
+        self.assertEqual(len(scheduler.reaction_times), adaptive_scheduler.REACTION_WINDOW)
+        self.assertEqual(scheduler.reaction_count, adaptive_scheduler.REACTION_WINDOW + 10)
+
+    def test_configure_keeps_learned_state(self):
+        scheduler = AdaptivePollingScheduler(min_interval=2.0, max_interval=10.0)
+        scheduler.typical_work_duration = 30.0
+        scheduler.configure(0.5, 4.0, 3.0, 2.0)
+        self.assertEqual((scheduler.min_interval, scheduler.max_interval), (0.5, 4.0))
+        self.assertEqual(scheduler.typical_work_duration, 30.0)
+        self.assertEqual(self.tick(scheduler, 1), 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图后端测试：虚拟桌面原点为负（副显示器在主显示器左侧）时仍能截取和搜索
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_backends import FileCapture, clip_bbox
+from detection_engine import DetectionEngine, build_state_templates
+from detection_runner import DetectionRunner
+from matchers import create_matcher
+from roi_tracker import ROITracker
+from template_cache import TemplateCache
+
+
+def make_template():
+    rng = np.random.default_rng(7)
+    return rng.integers(0, 255, (24, 32, 3), dtype=np.uint8)
+
+
+class ClipBBoxTest(unittest.TestCase):
+
+    def test_primary_screen(self):
+        self.assertEqual(clip_bbox((-10, -10, 50, 50), (0, 0, 100, 100)), (0, 0, 40, 40))
+
+    def test_negative_origin(self):
+        bounds = (-1920, 0, 3840, 1080)
+        self.assertEqual(clip_bbox((-1500, 100, 400, 300), bounds), (-1500, 100, 400, 300))
+        self.assertEqual(clip_bbox((-2000, -50, 200, 200), bounds), (-1920, 0, 120, 150))
+
+    def test_outside(self):
+        self.assertIsNone(clip_bbox((2000, 0, 10, 10), (-1920, 0, 3840, 1080)))
+
+
+class ROITrackerBoundsTest(unittest.TestCase):
+
+    def test_full_region_on_negative_monitor(self):
+        tracker = ROITracker(padding=10)
+        screen = (-1920, 0, 3840, 1080)
+        self.assertEqual(tracker.next_region(screen, 32, 24, bounds=(-1500, 100, 800, 600)),
+                         (-1500, 100, 800, 600))
+        self.assertFalse(tracker.current_is_roi)
+
+    def test_roi_on_negative_monitor(self):
+        tracker = ROITracker(padding=10)
+        tracker.last_hit = (-1900, 5, 32, 24)
+        region = tracker.next_region((-1920, 0, 3840, 1080), 32, 24)
+        self.assertEqual(region, (-1910, 0, 52, 39))
+        self.assertTrue(tracker.current_is_roi)
+
+
+class NegativeMonitorDetectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.template = make_template()
+        fd, self.template_path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        cv2.imwrite(self.template_path, self.template)
+
+    def tearDown(self):
+        os.remove(self.template_path)
+
+    def test_window_at_negative_x_is_searched(self):
+        # 虚拟桌面：左侧显示器 x ∈ [-1920, 0)，主显示器 x ∈ [0, 1920)
+        desktop = np.zeros((1080, 3840, 3), np.uint8)
+        desktop[400:424, 300:332] = self.template
+        capture = FileCapture([desktop], advance=False, origin=(-1920, 0))
+        engine = DetectionEngine(
+            TemplateCache(stat_interval=0),
+            create_matcher('exhaustive'),
+            build_state_templates(None, self.template_path, 0.9, None)
+        )
+        runner = DetectionRunner(engine, capture, change_detection=False)
+        state = runner.create_window_state(hwnd=1, title='main.py - Trae')
+
+        window = (-1800, 200, 960, 700)
+        results = runner.detect(runner.plan([(state, window)]))
+
+        self.assertEqual(len(results), 1)
+        hit = results[0][1][0]
+        self.assertEqual(hit.box, (300 - 1920, 400, 32, 24))
+        self.assertEqual(hit.position, (300 - 1920 + 16, 412))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置热加载测试：配置项校验、配置文件变化检查，以及监控器按变化的配置项只重建相关组件
+"""
+
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config_watcher
+from config_watcher import ConfigWatcher, validate_config
+from window_registry import FakeWindowPlatform
+
+try:
+    import enhanced_trae_ide_monitor
+except ImportError:
+    # 监控器依赖 pywin32、pyautogui、pyperclip，缺少时只测试配置校验
+    enhanced_trae_ide_monitor = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ValidateConfigTest(unittest.TestCase):
+
+    def test_shipped_config_valid(self):
+        with open(os.path.join(ROOT, 'config.json'), encoding='utf-8') as f:
+            self.assertEqual(validate_config(json.load(f)), [])
+
+    def test_type_and_range_errors(self):
+        errors = validate_config({
+            'monitor_settings': {'interval_seconds': 'fast', 'adaptive_polling': 1},
+            'detection_settings': {'match_threshold': 1.5, 'roi_padding': 2.5, 'matcher': 'magic'},
+            'metrics_settings': {'port': 70000},
+        })
+        self.assertEqual(errors, [
+            "monitor_settings.interval_seconds 应为数值",
+            "monitor_settings.adaptive_polling 应为 true 或 false",
+            "detection_settings.match_threshold 不能大于 1",
+            "detection_settings.roi_padding 应为整数",
+            "detection_settings.matcher 应为 exhaustive, pyramid, tiled 之一",
+            "metrics_settings.port 不能大于 65535",
+        ])
+
+    def test_unlisted_keys_and_null_ignored(self):
+        self.assertEqual(validate_config({
+            'detection_settings': {'description': "说明", 'search_region': None, 'calibration_file': None},
+            'other_settings': {'anything': 1},
+        }), [])
+
+    def test_template_items(self):
+        errors = validate_config({'detection_settings': {'templates': [
+            {'name': 'send_button', 'image': 'dd.PNG'},
+            {'name': 'retry'},
+        ]}})
+        self.assertEqual(errors, ["detection_settings.templates 第 2 项缺少 image"])
+        errors = validate_config({'detection_settings': {'templates': [
+            {'name': 'retry', 'image': 'retry.png', 'region': [0, 0, 10]},
+        ]}})
+        self.assertEqual(errors, ["detection_settings.templates 第 1 项region 应包含 4 个元素"])
+
+    def test_cross_field_checks(self):
+        self.assertEqual(validate_config({'detection_settings': {'scale_min': 1.5, 'scale_max': 1.0}}),
+                         ["detection_settings.scale_min 不能大于 scale_max"])
+        self.assertEqual(validate_config({'detection_settings': {'templates': [
+            {'name': 'a', 'image': 'a.png'}, {'name': 'a', 'image': 'b.png'},
+        ]}}), ["detection_settings.templates 中的状态名称不能重复"])
+
+    def test_structure_errors(self):
+        self.assertEqual(validate_config([]), ["配置文件的顶层应为对象"])
+        self.assertEqual(validate_config({'window_settings': []}), ["window_settings 应为对象"])
+
+
+class ConfigWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'config.json')
+        self.write({'monitor_settings': {'interval_seconds': 20}})
+        self.now = 1000.0
+        patcher = mock.patch.object(config_watcher.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, config):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(config if isinstance(config, str) else json.dumps(config))
+        # 保证修改时间变化，不依赖文件系统的时间精度
+        stat = os.stat(self.path)
+        self.mtime = getattr(self, 'mtime', stat.st_mtime_ns) + 10 ** 9
+        os.utime(self.path, ns=(stat.st_atime_ns, self.mtime))
+
+    def test_unchanged_file(self):
+        watcher = ConfigWatcher(self.path, check_interval=0)
+        self.assertIsNone(watcher.poll())
+        self.assertEqual(watcher.get_stats(), {'checks': 1, 'reloads': 0, 'rejected': 0})
+
+    def test_changed_file_returned(self):
+        watcher = ConfigWatcher(self.path, check_interval=0)
+        self.write({'monitor_settings': {'interval_seconds': 10}})
+        self.assertEqual(watcher.poll(), {'monitor_settings': {'interval_seconds': 10}})
+        self.assertIsNone(watcher.poll())
+        self.assertEqual(watcher.reloads, 1)
+
+    def test_invalid_files_rejected_once(self):
+        watcher = ConfigWatcher(self.path, check_interval=0)
+        with self.assertLogs('config_watcher', 'ERROR'):
+            self.write('{"monitor_settings": ')
+            self.assertIsNone(watcher.poll())
+            # 内容不变时不重复读取
+            self.assertIsNone(watcher.poll())
+            self.write({'monitor_settings': {'interval_seconds': 0}})
+            self.assertIsNone(watcher.poll())
+        self.assertEqual(watcher.rejected, 2)
+        self.write({'monitor_settings': {'interval_seconds': 5}})
+        self.assertIsNotNone(watcher.poll())
+
+    def test_check_interval(self):
+        watcher = ConfigWatcher(self.path, check_interval=2.0)
+        self.write({'monitor_settings': {'interval_seconds': 10}})
+        self.now += 1
+        self.assertIsNone(watcher.poll())
+        self.assertEqual(watcher.checks, 0)
+        self.assertIsNotNone(watcher.poll(force=True))
+        self.write({'monitor_settings': {'interval_seconds': 5}})
+        self.now += 2
+        self.assertIsNotNone(watcher.poll())
+
+    def test_missing_file(self):
+        watcher = ConfigWatcher(self.path, check_interval=0)
+        os.remove(self.path)
+        self.assertIsNone(watcher.poll())
+
+
+@unittest.skipIf(enhanced_trae_ide_monitor is None, "缺少 pywin32/pyautogui/pyperclip")
+class ReloadConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.default_rng(3)
+        template = rng.integers(0, 255, (24, 32, 3), dtype=np.uint8)
+        frame = np.zeros((300, 400, 3), np.uint8)
+        frame[100:124, 200:232] = template
+        self.template_path = os.path.join(self.directory, 'send.png')
+        frame_path = os.path.join(self.directory, 'frame.png')
+        cv2.imwrite(self.template_path, template)
+        cv2.imwrite(frame_path, frame)
+        self.config = {
+            'monitor_settings': {'interval_seconds': 20, 'config_reload_seconds': 0, 'state_file': None,
+                                 'queue_size': 2},
+            'message_settings': {'trigger_message': "继续"},
+            'detection_settings': {
+                'match_threshold': 0.9, 'target_button_image': self.template_path, 'roi_padding': 50,
+                'matcher': 'exhaustive', 'calibration_file': None,
+                'templates': [{'name': 'send_button', 'image': self.template_path}],
+            },
+            'capture_settings': {'backend': 'file', 'frame_source': frame_path},
+            'window_settings': {'multi_window': False, 'use_window_events': False},
+            'metrics_settings': {'http_enabled': False, 'json_dump_file': None},
+        }
+        path = os.path.join(self.directory, 'config.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.config, f)
+        with self.assertLogs(enhanced_trae_ide_monitor.log, 'INFO'):
+            self.monitor = enhanced_trae_ide_monitor.EnhancedTraeIDEMonitor(
+                path, window_platform=FakeWindowPlatform({1: 'main.py - Trae'}))
+        self.state = self.monitor.default_state
+        self.state.get_roi_tracker('send_button')
+
+    def tearDown(self):
+        self.monitor.matcher.close()
+        self.monitor.capture.close()
+        self.monitor.window_registry.close()
+        shutil.rmtree(self.directory)
+
+    def reload(self, **sections):
+        config = copy.deepcopy(self.config)
+        for section, values in sections.items():
+            config[section].update(values)
+        return self.monitor.reload_config(config)
+
+    def test_unchanged_config(self):
+        matcher = self.monitor.matcher
+        self.assertEqual(self.reload(), set())
+        self.assertIs(self.monitor.matcher, matcher)
+
+    def test_roi_padding_resets_rois(self):
+        changed = self.reload(detection_settings={'roi_padding': 80})
+        self.assertEqual(changed, {'roi_padding'})
+        self.assertEqual(self.monitor.detector.roi_padding, 80)
+        self.assertEqual(self.state.roi_trackers, {})
+
+    def test_unrelated_change_keeps_rois(self):
+        tracker = self.state.roi_trackers['send_button']
+        matcher, capture = self.monitor.matcher, self.monitor.capture
+        self.assertEqual(self.reload(message_settings={'trigger_message': "继续你的使命"}), {'input_text'})
+        self.assertEqual(self.monitor.input_text, "继续你的使命")
+        self.assertIs(self.state.roi_trackers['send_button'], tracker)
+        self.assertIs(self.monitor.matcher, matcher)
+        self.assertIs(self.monitor.capture, capture)
+
+    def test_matcher_replaced(self):
+        old_matcher = self.monitor.matcher
+        self.assertIn('matcher_name', self.reload(detection_settings={'matcher': 'pyramid'}))
+        self.assertIsNot(self.monitor.matcher, old_matcher)
+        self.assertIs(self.monitor.detection_engine.matcher, self.monitor.matcher)
+        self.assertIn('send_button', self.state.roi_trackers)
+
+    def test_restart_attributes_not_applied(self):
+        with self.assertLogs(enhanced_trae_ide_monitor.log, 'WARNING'):
+            self.assertEqual(self.reload(monitor_settings={'queue_size': 8}), set())
+        self.assertEqual(self.monitor.queue_size, 2)
+        self.assertEqual(self.monitor._pending_restart, {'queue_size'})
+
+    def test_failed_reload_keeps_state(self):
+        templates = [{'name': 'send_button', 'image': self.template_path},
+                     {'name': 'send_button', 'image': self.template_path}]
+        with self.assertLogs(enhanced_trae_ide_monitor.log, 'ERROR'):
+            changed = self.reload(detection_settings={'templates': templates, 'roi_padding': 80})
+        self.assertEqual(changed, set())
+        self.assertEqual(self.monitor.roi_padding, 50)
+        self.assertIn('send_button', self.state.roi_trackers)
+        self.assertEqual(len(self.monitor.detection_engine.templates), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多状态检测引擎测试：同一画面上匹配多个状态模板，按优先级和超出阈值的幅度排序，
+模板配置解析，以及近似命中的记录
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import (ACTION_CLICK, ACTION_NOTIFY, ACTION_SEND_MESSAGE, DetectionEngine, StateHit,
+                              StateTemplate, build_state_templates, index_templates, rank_hits)
+from matchers import create_matcher
+from roi_tracker import ROITracker
+from template_cache import TemplateCache
+from window_state import WindowState
+
+SCREEN = (0, 0, 640, 480)
+
+
+def make_hit(name, score, priority=0, threshold=0.9):
+    return StateHit(name=name, action=ACTION_SEND_MESSAGE, score=score, position=(0, 0), box=(0, 0, 1, 1),
+                    priority=priority, threshold=threshold, scale=1.0)
+
+
+class RankHitsTest(unittest.TestCase):
+
+    def test_priority_then_margin(self):
+        hits = [make_hit('a', 0.99), make_hit('b', 0.91, priority=1), make_hit('c', 0.95, threshold=0.8)]
+        self.assertEqual([hit.name for hit in rank_hits(hits)], ['b', 'c', 'a'])
+
+
+class StateTemplateConfigTest(unittest.TestCase):
+
+    def test_defaults(self):
+        templates = build_state_templates(None, 'dd.PNG', 0.9, (0, 0, 100, 100))
+        self.assertEqual(len(templates), 1)
+        self.assertEqual((templates[0].name, templates[0].image, templates[0].threshold, templates[0].region),
+                         ('send_button', 'dd.PNG', 0.9, (0, 0, 100, 100)))
+
+    def test_from_config(self):
+        templates = build_state_templates([
+            {'name': 'send_button', 'image': 'send.png'},
+            {'name': 'retry', 'image': 'retry.png', 'action': 'click', 'priority': 2, 'threshold': 0.8},
+            {'name': 'error', 'image': 'error.png', 'action': 'explode'},
+        ], 'dd.PNG', 0.9)
+        self.assertEqual([spec.action for spec in templates], [ACTION_SEND_MESSAGE, ACTION_CLICK, ACTION_NOTIFY])
+        self.assertEqual((templates[1].priority, templates[1].threshold), (2, 0.8))
+        self.assertEqual(templates[0].threshold, 0.9)
+
+    def test_index_rejects_duplicates_and_empty(self):
+        with self.assertRaises(ValueError):
+            index_templates([])
+        with self.assertRaises(ValueError):
+            index_templates([StateTemplate('a', 'a.png'), StateTemplate('a', 'b.png')])
+
+
+class DetectionEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.default_rng(11)
+        self.send = rng.integers(0, 255, (24, 32, 3), dtype=np.uint8)
+        self.retry = rng.integers(0, 255, (20, 40, 3), dtype=np.uint8)
+        self.send_path = os.path.join(self.directory, 'send.png')
+        self.retry_path = os.path.join(self.directory, 'retry.png')
+        cv2.imwrite(self.send_path, self.send)
+        cv2.imwrite(self.retry_path, self.retry)
+        self.scene = np.zeros((480, 640, 3), np.uint8)
+        self.scene[300:324, 500:532] = self.send
+        self.scene[100:120, 50:90] = self.retry
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_engine(self, templates, **options):
+        return DetectionEngine(TemplateCache(pyramid_levels=0, stat_interval=0), create_matcher('exhaustive'),
+                               templates, **options)
+
+    def create_state(self, engine):
+        def roi_tracker_factory(name):
+            return ROITracker(padding=20, search_region=engine.get_spec(name).region)
+
+        return WindowState(None, "Trae", roi_tracker_factory)
+
+    def detect(self, engine, state, near_misses=None):
+        planned = engine.plan(state, SCREEN)
+        return engine.evaluate(self.scene, SCREEN, planned, near_misses)
+
+    def test_all_states_in_one_pass(self):
+        engine = self.create_engine([
+            StateTemplate('send_button', self.send_path, 0.9),
+            StateTemplate('retry', self.retry_path, 0.9, action=ACTION_CLICK, priority=1),
+        ])
+        hits = self.detect(engine, self.create_state(engine))
+        self.assertEqual([hit.name for hit in hits], ['retry', 'send_button'])
+        self.assertEqual(hits[0].box, (50, 100, 40, 20))
+        self.assertEqual(hits[1].position, (516, 312))
+        self.assertEqual(hits[0].action, ACTION_CLICK)
+        self.assertEqual(engine.get_stats()['hits'], {'retry': 1, 'send_button': 1})
+
+    def test_rois_per_template(self):
+        engine = self.create_engine([
+            StateTemplate('send_button', self.send_path, 0.9),
+            StateTemplate('retry', self.retry_path, 0.9),
+        ])
+        state = self.create_state(engine)
+        self.detect(engine, state)
+        regions = {search.spec.name: search.region for search in engine.plan(state, SCREEN)}
+        self.assertEqual(regions, {'send_button': (480, 280, 72, 64), 'retry': (30, 80, 80, 60)})
+
+    def test_template_region_limits_search(self):
+        engine = self.create_engine([StateTemplate('send_button', self.send_path, 0.9, region=(0, 0, 320, 240))])
+        self.assertEqual(self.detect(engine, self.create_state(engine)), [])
+
+    def test_near_misses(self):
+        self.scene[300:324, 500:532] = cv2.GaussianBlur(self.send, (3, 3), 0)
+        score = cv2.minMaxLoc(cv2.matchTemplate(self.scene, self.send, cv2.TM_CCOEFF_NORMED))[1]
+        # 阈值略高于实际分数：低于阈值不超过 near_miss_margin 的匹配记为近似命中
+        engine = self.create_engine([StateTemplate('send_button', self.send_path, score + 0.05)],
+                                    near_miss_margin=0.1)
+        near_misses = []
+        hits = self.detect(engine, self.create_state(engine), near_misses)
+        self.assertEqual(hits, [])
+        self.assertEqual(len(near_misses), 1)
+        self.assertEqual(near_misses[0].box, (500, 300, 32, 24))
+        self.assertAlmostEqual(near_misses[0].score, score, places=4)
+
+        engine.near_miss_margin = 0.01
+        near_misses = []
+        self.detect(engine, self.create_state(engine), near_misses)
+        self.assertEqual(near_misses, [])
+
+    def test_calibrated_threshold(self):
+        class Calibrator:
+            def threshold_for(self, name, default):
+                return 1.01 if name == 'retry' else default
+
+        engine = self.create_engine([
+            StateTemplate('send_button', self.send_path, 0.9),
+            StateTemplate('retry', self.retry_path, 0.9),
+        ], calibrator=Calibrator())
+        hits = self.detect(engine, self.create_state(engine))
+        self.assertEqual([hit.name for hit in hits], ['send_button'])
+
+    def test_missing_template_reported(self):
+        engine = self.create_engine([
+            StateTemplate('send_button', self.send_path, 0.9),
+            StateTemplate('retry', os.path.join(self.directory, 'missing.png'), 0.9),
+        ])
+        loaded = engine.load_templates()
+        self.assertEqual([spec.name for spec, _ in loaded], ['send_button'])
+        self.assertEqual(len(engine.last_errors), 1)
+        self.assertTrue(engine.last_errors[0].startswith('retry'))
+
+
+if __name__ == '__main__':
+    unittest.main()
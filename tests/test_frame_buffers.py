@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓冲区复用测试：截图缓冲区、按键复用的数组池、匹配结果数组和预处理画面，
+以及截图后端写入指定缓冲区和连续检测时不再分配新的数组
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_backends import (CAPTURE_BACKENDS, DEFAULT_CAPTURE_BACKEND, FakeWindowCapture, FileCapture,
+                              FrameBuffer, create_capture_backend)
+from detection_engine import DetectionEngine, build_state_templates
+from detection_runner import DetectionRunner
+from matchers import ArrayPool, PreparedFrame, create_matcher, match_template, thread_pool
+from template_cache import TemplateCache
+
+
+def make_image(shape=(240, 320, 3), seed=0):
+    return np.random.default_rng(seed).integers(0, 255, shape, dtype=np.uint8)
+
+
+class FrameBufferTest(unittest.TestCase):
+
+    def test_reused_until_larger(self):
+        buffer = FrameBuffer()
+        large = buffer.get(320, 240)
+        small = buffer.get(32, 24)
+        self.assertEqual(small.shape, (24, 32, 3))
+        self.assertTrue(np.shares_memory(large, small))
+        self.assertEqual(buffer.allocations, 1)
+        buffer.get(640, 480)
+        self.assertEqual(buffer.allocations, 2)
+
+    def test_single_channel(self):
+        self.assertEqual(FrameBuffer(channels=1).get(32, 24).shape, (24, 32))
+
+
+class ArrayPoolTest(unittest.TestCase):
+
+    def test_reused_per_key(self):
+        pool = ArrayPool()
+        first = pool.get('a', (24, 32))
+        self.assertTrue(np.shares_memory(pool.get('a', (12, 16)), first))
+        self.assertFalse(np.shares_memory(pool.get('b', (24, 32)), first))
+        self.assertEqual(pool.allocations, 2)
+
+    def test_dtype_change_reallocates(self):
+        pool = ArrayPool()
+        pool.get('a', (24, 32))
+        self.assertEqual(pool.get('a', (24, 32), np.float32).dtype, np.float32)
+        self.assertEqual(pool.allocations, 2)
+
+    def test_least_recently_used_released(self):
+        pool = ArrayPool(max_arrays=2)
+        first = pool.get('a', (4, 4))
+        pool.get('b', (4, 4))
+        pool.get('a', (4, 4))
+        pool.get('c', (4, 4))
+        self.assertTrue(np.shares_memory(pool.get('a', (4, 4)), first))
+        pool.get('b', (4, 4))
+        self.assertEqual(pool.allocations, 4)
+
+    def test_thread_pool_per_thread(self):
+        self.assertIs(thread_pool(), thread_pool())
+
+
+class MatchResultTest(unittest.TestCase):
+
+    def test_result_reused_and_correct(self):
+        image = make_image()
+        template = image[100:124, 200:232].copy()
+        first = match_template(image, template)
+        expected = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        np.testing.assert_allclose(first, expected, atol=1e-5)
+        self.assertTrue(np.shares_memory(match_template(make_image(seed=1), template), first))
+
+
+class PreparedFrameTest(unittest.TestCase):
+
+    def test_variants_match_opencv(self):
+        frame = make_image()
+        prepared = PreparedFrame(frame, ArrayPool())
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        np.testing.assert_array_equal(prepared.get(0, True), gray)
+        np.testing.assert_array_equal(prepared.get(1, True), cv2.pyrDown(gray))
+        np.testing.assert_array_equal(prepared.get(1), cv2.pyrDown(frame))
+        self.assertEqual(prepared.crop((100, 50, 64, 32), level=1, grayscale=True).shape, (16, 32))
+
+    def test_pool_shared_between_frames(self):
+        pool = ArrayPool()
+        first = PreparedFrame(make_image(seed=1), pool).get(1, True)
+        second = PreparedFrame(make_image(seed=2), pool).get(1, True)
+        self.assertTrue(np.shares_memory(first, second))
+        # 不使用池时每次新分配
+        self.assertFalse(np.shares_memory(PreparedFrame(make_image()).get(0, True), second))
+
+
+class FileCaptureTest(unittest.TestCase):
+
+    def test_grab_into_buffer(self):
+        frames = [make_image(seed=1), make_image(seed=2)]
+        capture = FileCapture(frames)
+        buffer = FrameBuffer()
+        first = capture.grab((10, 20, 64, 32), buffer)
+        np.testing.assert_array_equal(first, frames[0][20:52, 10:74])
+        self.assertTrue(np.shares_memory(first, buffer.get(64, 32)))
+        # 每次 grab 切换到下一张画面，内部缓冲区不受影响
+        np.testing.assert_array_equal(capture.grab((0, 0, 8, 8)), frames[1][:8, :8])
+        self.assertEqual((buffer.allocations, capture.grabs), (1, 2))
+
+    def test_grab_clipped_to_screen(self):
+        capture = FileCapture([make_image()], origin=(-320, 0))
+        self.assertEqual(capture.grab((-340, -10, 60, 40)).shape, (30, 40, 3))
+        self.assertIsNone(capture.grab((10, 0, 20, 20)))
+
+    def test_fake_window_frames(self):
+        screen = make_image(seed=1)
+        capture = FakeWindowCapture([screen], advance=False)
+        np.testing.assert_array_equal(capture.grab_window(1, (10, 10, 40, 30)), screen[10:40, 10:50])
+        covered = make_image((30, 40, 3), seed=2)
+        capture.set_window_frame(1, covered)
+        np.testing.assert_array_equal(capture.grab_window(1, (10, 10, 40, 30)), covered)
+        self.assertIsNone(capture.grab_window(1, (10, 10, 50, 30)))
+        self.assertEqual(capture.window_grabs, 2)
+
+
+class CaptureBackendRegistryTest(unittest.TestCase):
+
+    def test_default_backend(self):
+        self.assertEqual(DEFAULT_CAPTURE_BACKEND, 'gdi' if sys.platform == 'win32' else 'pyautogui')
+        self.assertIn(DEFAULT_CAPTURE_BACKEND, CAPTURE_BACKENDS)
+
+    def test_create(self):
+        capture = create_capture_backend('file', source=[make_image()])
+        self.assertIsInstance(capture, FileCapture)
+        with self.assertRaises(ValueError):
+            create_capture_backend('magic')
+
+
+class SteadyStateAllocationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.frame = make_image((480, 640, 3), seed=3)
+        self.template_path = os.path.join(self.directory, 'send.png')
+        cv2.imwrite(self.template_path, self.frame[300:324, 500:532])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_no_allocations_after_warmup(self):
+        capture = FileCapture([self.frame], advance=False)
+        engine = DetectionEngine(TemplateCache(stat_interval=3600), create_matcher('pyramid'),
+                                 build_state_templates(None, self.template_path, 0.9, None))
+        runner = DetectionRunner(engine, capture, change_detection=False)
+        state = runner.create_window_state()
+
+        def tick():
+            results = runner.detect(runner.plan([(state, None)]))
+            self.assertEqual(results[0][1][0].box, (500, 300, 32, 24))
+            return capture.frame_buffer.allocations, runner._prepare_pool().allocations, thread_pool().allocations
+
+        # 第一次全屏搜索，第二次开始在ROI内搜索
+        tick()
+        warm = tick()
+        self.assertEqual(tick(), warm)
+        self.assertEqual(warm[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画面变化检测测试：未变化的画面跳过匹配，变化、区域变化、超时和重置后重新匹配
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_change import FrameChangeDetector
+
+REGION = (100, 100, 320, 240)
+
+
+def make_frame(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+
+
+class FrameChangeDetectorTest(unittest.TestCase):
+
+    def test_unchanged_frame_skipped(self):
+        detector = FrameChangeDetector(tolerance=2.0, max_staleness=60.0)
+        frame = make_frame()
+        self.assertTrue(detector.should_evaluate(frame, REGION))
+        self.assertTrue(detector.last_changed)
+        self.assertFalse(detector.should_evaluate(frame.copy(), REGION))
+        self.assertFalse(detector.last_changed)
+        self.assertEqual(detector.get_stats(), {'evaluated': 1, 'skipped': 1, 'skip_ratio': 0.5})
+
+    def test_noise_below_tolerance_skipped(self):
+        detector = FrameChangeDetector(tolerance=2.0)
+        frame = make_frame()
+        detector.should_evaluate(frame, REGION)
+        noisy = frame.copy()
+        noisy[0, 0] ^= 1
+        self.assertFalse(detector.should_evaluate(noisy, REGION))
+
+    def test_changed_block_evaluated(self):
+        detector = FrameChangeDetector(tolerance=2.0)
+        frame = make_frame()
+        detector.should_evaluate(frame, REGION)
+        changed = frame.copy()
+        changed[100:124, 200:232] = 255
+        self.assertTrue(detector.should_evaluate(changed, REGION))
+        self.assertTrue(detector.last_changed)
+
+    def test_region_change_evaluated(self):
+        detector = FrameChangeDetector()
+        frame = make_frame()
+        detector.should_evaluate(frame, REGION)
+        self.assertTrue(detector.should_evaluate(frame, (120, 100, 320, 240)))
+
+    def test_slow_drift_not_accumulated(self):
+        # 基准只在匹配时更新，每帧小幅变化累积超过容差后仍会重新匹配
+        detector = FrameChangeDetector(tolerance=2.0)
+        frame = np.full((240, 320, 3), 100, np.uint8)
+        detector.should_evaluate(frame, REGION)
+        results = [detector.should_evaluate(frame + step, REGION) for step in (1, 2, 3)]
+        self.assertEqual(results, [False, False, True])
+
+    def test_stale_frame_evaluated(self):
+        detector = FrameChangeDetector(max_staleness=0.0)
+        frame = make_frame()
+        detector.should_evaluate(frame, REGION)
+        self.assertTrue(detector.should_evaluate(frame, REGION))
+        self.assertFalse(detector.last_changed)
+
+    def test_reset(self):
+        detector = FrameChangeDetector()
+        frame = make_frame()
+        detector.should_evaluate(frame, REGION)
+        detector.reset()
+        self.assertTrue(detector.should_evaluate(frame, REGION))
+
+    def test_small_frame_signature(self):
+        detector = FrameChangeDetector(grid_size=(32, 32))
+        self.assertEqual(detector.compute_signature(make_frame()[:10, :20]).shape, (10, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
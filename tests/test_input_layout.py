@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入框布局测试：按按钮位置和窗口区域推算输入框与鼠标安全位置、固定坐标、
+由已知输入框位置得到偏移、按窗口几何缓存，以及点击前检查区域的比较
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input_layout import InputLayout
+
+WINDOW = (100, 50, 1200, 900)
+
+
+def make_probe(value=128, seed=None):
+    if seed is None:
+        return np.full((16, 60, 3), value, np.uint8)
+    return np.random.default_rng(seed).integers(0, 255, (16, 60, 3), dtype=np.uint8)
+
+
+class InputLayoutTest(unittest.TestCase):
+
+    def test_relative_layout(self):
+        layout = InputLayout(input_offset=(-500, 40), safe_ratio=(0.9, 0.1)).locate((900, 800), WINDOW)
+        self.assertEqual(layout.input_pos, (400, 840))
+        self.assertEqual(layout.safe_pos, (1180, 140))
+        self.assertEqual(layout.probe_bbox, (370, 832, 60, 16))
+        self.assertEqual(layout.input_bbox, (300, 825, 200, 30))
+
+    def test_follows_window_and_scale(self):
+        model = InputLayout(input_offset=(-500, 40))
+        self.assertEqual(model.locate((1000, 700), (200, 0, 1200, 900)).input_pos, (500, 740))
+        self.assertEqual(model.locate((1000, 700), (200, 0, 1200, 900), scale=1.5).input_pos, (250, 760))
+
+    def test_clamped_to_window(self):
+        layout = InputLayout(input_offset=(-2000, 500)).locate((900, 800), WINDOW)
+        self.assertEqual(layout.input_pos, (101, 948))
+
+    def test_fixed_layout(self):
+        model = InputLayout(input_offset=(-500, 40), fixed_input=(400, 870), fixed_safe=(1720, 100))
+        layout = model.locate((900, 800), WINDOW)
+        self.assertEqual((layout.input_pos, layout.safe_pos), ((400, 870), (1720, 100)))
+        self.assertEqual(model.locate((300, 200), (0, 0, 640, 480)).input_pos, (400, 870))
+
+    def test_anchor_input_derives_offset(self):
+        model = InputLayout(anchor_input=(400, 870))
+        with self.assertLogs('input_layout', 'INFO'):
+            layout = model.locate((900, 800), WINDOW, scale=1.25)
+        self.assertEqual(layout.input_pos, (400, 870))
+        self.assertEqual(model.input_offset, (-400, 56))
+        # 窗口移动后按学到的偏移推算
+        self.assertEqual(model.locate((1000, 700), (200, 0, 1200, 900)).input_pos, (600, 756))
+
+    def test_cached_by_geometry(self):
+        model = InputLayout(input_offset=(-500, 40), cache_size=2)
+        first = model.locate((900, 800), WINDOW)
+        self.assertIs(model.locate((900, 800), WINDOW), first)
+        model.locate((901, 800), WINDOW)
+        model.locate((902, 800), WINDOW)
+        self.assertIsNot(model.locate((900, 800), WINDOW), first)
+        self.assertEqual(model.get_stats(), {'cached': 2, 'computed': 4, 'cache_hits': 1,
+                                             'verified': 0, 'rejected': 0})
+
+
+class ProbeCheckTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model = InputLayout(input_offset=(-500, 40), tolerance=40.0)
+        self.layout = self.model.locate((900, 800), WINDOW)
+
+    def test_passes_without_reference(self):
+        self.assertTrue(self.model.verify(self.layout, make_probe(seed=1)))
+        self.assertTrue(self.model.verify(self.layout, None))
+        self.assertEqual(self.model.verified, 0)
+
+    def test_same_probe_verified(self):
+        self.model.confirm(self.layout, make_probe(128))
+        self.assertTrue(self.model.verify(self.layout, make_probe(150)))
+        self.assertEqual(self.model.verified, 1)
+
+    def test_changed_probe_rejected_and_relocated(self):
+        self.model.confirm(self.layout, make_probe(30))
+        self.assertFalse(self.model.verify(self.layout, make_probe(220)))
+        self.assertEqual(self.model.rejected, 1)
+        # 丢弃该几何的缓存和基准，下一次重新推算并视为通过
+        layout = self.model.locate((900, 800), WINDOW)
+        self.assertIsNot(layout, self.layout)
+        self.assertTrue(self.model.verify(layout, make_probe(220)))
+
+    def test_confirm_ignores_evicted_layout(self):
+        model = InputLayout(input_offset=(-500, 40), cache_size=1)
+        layout = model.locate((900, 800), WINDOW)
+        model.locate((901, 800), WINDOW)
+        model.confirm(layout, make_probe(30))
+        self.assertTrue(model.verify(layout, make_probe(220)))
+
+
+if __name__ == '__main__':
+    unittest.main()
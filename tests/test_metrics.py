@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标测试：计数、数值指标、阶段耗时直方图、Prometheus 文本格式（含标签转义）和 JSON 输出
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsDumper, MetricsRegistry, render_metrics
+
+
+class MetricsRegistryTest(unittest.TestCase):
+
+    def test_counters_by_label(self):
+        metrics = MetricsRegistry()
+        metrics.inc('hits', state='send_button')
+        metrics.inc('hits', state='send_button')
+        metrics.inc('hits', 3, state='retry_button')
+        self.assertEqual(metrics.get_counter('hits', state='send_button'), 2)
+        self.assertEqual(metrics.get_counter('hits', state='retry_button'), 3)
+        self.assertEqual(metrics.get_counter('hits'), 0)
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['hits{state="send_button"}'], 2)
+
+    def test_prometheus_text(self):
+        metrics = MetricsRegistry()
+        metrics.inc('ticks')
+        metrics.set_gauge('poll_interval_seconds', 0.5)
+        metrics.set_gauge('unset', None)
+        metrics.observe('capture', 0.002)
+        text = metrics.to_prometheus()
+        self.assertIn('# TYPE trae_monitor_ticks_total counter\ntrae_monitor_ticks_total 1\n', text)
+        self.assertIn('trae_monitor_poll_interval_seconds 0.5', text)
+        self.assertNotIn('unset', text)
+        self.assertIn('trae_monitor_stage_seconds_count{stage="capture"} 1', text)
+        self.assertIn('trae_monitor_stage_seconds_bucket{stage="capture",le="+Inf"} 1', text)
+
+    def test_prometheus_label_escaping(self):
+        metrics = MetricsRegistry()
+        metrics.inc('hits', state='say "hi"\\now\nnext')
+        text = metrics.to_prometheus()
+        self.assertIn('trae_monitor_hits_total{state="say \\"hi\\"\\\\now\\nnext"} 1', text)
+        # 每个样本占一行，换行不会拆开样本
+        self.assertEqual([line for line in text.splitlines() if line.startswith('trae_monitor_hits_total')],
+                         ['trae_monitor_hits_total{state="say \\"hi\\"\\\\now\\nnext"} 1'])
+
+    def test_render_metrics(self):
+        metrics = MetricsRegistry()
+        metrics.inc('ticks')
+        body, content_type = render_metrics(metrics, '/metrics')
+        self.assertIn(b'trae_monitor_ticks_total 1', body)
+        self.assertTrue(content_type.startswith('text/plain'))
+        body, content_type = render_metrics(metrics, '/metrics.json')
+        self.assertEqual(json.loads(body)['counters']['ticks'], 1)
+        self.assertIsNone(render_metrics(metrics, '/other'))
+
+
+class MetricsDumperTest(unittest.TestCase):
+
+    def test_dump(self):
+        metrics = MetricsRegistry()
+        metrics.inc('ticks', 5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.json')
+            MetricsDumper(metrics, path).dump()
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['counters']['ticks'], 5)
+            self.assertFalse(os.path.exists(path + '.tmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志设置测试：重复消息合并、控制台和 JSON Lines 格式、经队列写入日志文件、读取日志配置
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import monitor_logging
+from monitor_logging import (THROTTLE, ConsoleFormatter, JsonLinesFormatter, RepeatFilter, load_logging_settings,
+                             setup_logging, shutdown_logging)
+
+
+def make_record(msg="未发现目标按钮", throttle=True, name="monitor", **extra):
+    record = logging.LogRecord(name, logging.INFO, __file__, 1, msg, None, None)
+    if throttle:
+        record.throttle = True
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class RepeatFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(monitor_logging.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeats_merged_within_interval(self):
+        repeat_filter = RepeatFilter(interval=60)
+        self.assertTrue(repeat_filter.filter(make_record()))
+        self.now += 10
+        self.assertFalse(repeat_filter.filter(make_record()))
+        self.assertFalse(repeat_filter.filter(make_record()))
+        self.now += 60
+        record = make_record()
+        self.assertTrue(repeat_filter.filter(record))
+        self.assertEqual(record.repeated, 2)
+        self.assertEqual(repeat_filter.suppressed, 2)
+
+    def test_only_marked_records(self):
+        repeat_filter = RepeatFilter(interval=60)
+        self.assertTrue(repeat_filter.filter(make_record(throttle=False)))
+        self.assertTrue(repeat_filter.filter(make_record(throttle=False)))
+
+    def test_different_messages_and_loggers(self):
+        repeat_filter = RepeatFilter(interval=60)
+        self.assertTrue(repeat_filter.filter(make_record()))
+        self.assertTrue(repeat_filter.filter(make_record(msg="其他消息")))
+        self.assertTrue(repeat_filter.filter(make_record(name="other")))
+
+    def test_disabled(self):
+        repeat_filter = RepeatFilter(interval=0)
+        self.assertTrue(repeat_filter.filter(make_record()))
+        self.assertTrue(repeat_filter.filter(make_record()))
+
+
+class FormatterTest(unittest.TestCase):
+
+    def test_console_repeated_suffix(self):
+        text = ConsoleFormatter().format(make_record(repeated=3))
+        self.assertTrue(text.endswith("未发现目标按钮（期间重复 3 次，已省略）"))
+        self.assertTrue(ConsoleFormatter().format(make_record()).endswith("未发现目标按钮"))
+
+    def test_json_lines(self):
+        data = json.loads(JsonLinesFormatter().format(make_record(hwnd=42, repeated=1)))
+        self.assertEqual((data['level'], data['logger'], data['message']), ('INFO', 'monitor', "未发现目标按钮"))
+        self.assertEqual((data['hwnd'], data['repeated']), (42, 1))
+        self.assertNotIn('throttle', data)
+
+
+class SetupLoggingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        root = logging.getLogger()
+        self.saved = (list(root.handlers), root.level)
+
+    def tearDown(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in self.saved[0]:
+            root.addHandler(handler)
+        root.setLevel(self.saved[1])
+        shutil.rmtree(self.directory)
+
+    def test_file_output_through_queue(self):
+        path = os.path.join(self.directory, 'logs', 'monitor.jsonl')
+        listener = setup_logging(level="DEBUG", console=False, file=path, repeat_interval=60)
+        log = logging.getLogger("test_monitor_logging")
+        log.debug("调试 %s", 1)
+        for _ in range(3):
+            log.info("未发现目标按钮", extra=THROTTLE)
+        shutdown_logging(listener)
+        with open(path, encoding='utf-8') as f:
+            messages = [json.loads(line)['message'] for line in f]
+        self.assertEqual(messages, ["调试 1", "未发现目标按钮"])
+
+    def test_level_filter(self):
+        path = os.path.join(self.directory, 'monitor.jsonl')
+        listener = setup_logging(level="WARNING", console=False, file=path)
+        log = logging.getLogger("test_monitor_logging")
+        log.info("忽略")
+        log.warning("保留")
+        shutdown_logging(listener)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['message'] for line in f], ["保留"])
+
+    def test_load_settings(self):
+        path = os.path.join(self.directory, 'config.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'logging_settings': {'level': 'DEBUG', 'file': 'monitor.jsonl',
+                                            'repeat_interval_seconds': 5}}, f)
+        settings = load_logging_settings(path)
+        self.assertEqual((settings['level'], settings['file'], settings['repeat_interval']),
+                         ('DEBUG', 'monitor.jsonl', 5))
+        self.assertEqual(load_logging_settings(os.path.join(self.directory, 'missing.json'))['level'], 'INFO')
+
+
+if __name__ == '__main__':
+    unittest.main()
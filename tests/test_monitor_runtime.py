@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控运行时测试：丢弃最旧元素的有界队列、流水线的截图队列和操作队列，
+以及异步运行时在发送期间继续检测、同一窗口不重复触发、配置热加载等待发送结束
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry
+from monitor_async import AsyncMonitorRuntime
+from monitor_pipeline import DropOldestQueue, MonitorPipeline
+
+
+class RecordingMonitor:
+    """
+    记录调用的监控器替身，只实现运行时使用的接口，每个窗口每轮都命中一次
+    """
+
+    multi_window = True
+    background_capture = True
+    metrics_http_enabled = False
+    metrics_dump_file = None
+    state_snapshot = None
+    scheduler = None
+    monitor_interval = 0.01
+
+    def __init__(self, windows=(1, 2)):
+        self.states = [SimpleNamespace(hwnd=hwnd, last_frame_changed=False) for hwnd in windows]
+        self.metrics = MetricsRegistry()
+        self.detector = self
+        self.config_watcher = None
+        self.last_frame_changed = False
+        # 清除后发送会一直阻塞，直到再次设置
+        self.release = threading.Event()
+        self.release.set()
+        self.actions = []
+        self.acting = 0
+        self.reloads = []
+
+    def get_active_states(self):
+        return list(self.states)
+
+    def plan_search_regions(self, states):
+        return [(state, ['send_button']) for state in states]
+
+    def capture_jobs(self, plans, per_window, frame_buffers):
+        return [(buffer, (0, 0, 10, 10), [plan]) for buffer, plan in zip(frame_buffers(len(plans)), plans)]
+
+    def match(self, frame, capture_box, plans):
+        return [(state, ['send_button']) for state, _ in plans]
+
+    match_planned_regions = match
+
+    def observe_actions(self, plans, results):
+        triggers = [(state, hits[0]) for state, hits in results]
+        return bool(triggers), triggers
+
+    def next_interval(self, button_found=False, sent=False):
+        return 0.01
+
+    def actuate(self, state, hit):
+        self.acting += 1
+        self.actions.append(state.hwnd)
+        self.release.wait(5)
+        self.acting -= 1
+        return True
+
+    def reload_config(self, config):
+        self.reloads.append((config, self.acting))
+
+    def save_state_snapshot(self, force=False):
+        pass
+
+    def record_poll_metrics(self, interval):
+        pass
+
+
+class DropOldestQueueTest(unittest.TestCase):
+
+    def test_drops_oldest_when_full(self):
+        queue = DropOldestQueue(maxsize=2)
+        self.assertIsNone(queue.put('a'))
+        self.assertIsNone(queue.put('b'))
+        self.assertEqual(queue.put('c'), 'a')
+        self.assertEqual((len(queue), queue.dropped), (2, 1))
+        self.assertEqual([queue.get(), queue.get()], ['b', 'c'])
+
+    def test_get_timeout(self):
+        self.assertIsNone(DropOldestQueue().get(timeout=0.01))
+
+    def test_get_waits_for_put(self):
+        queue = DropOldestQueue()
+        timer = threading.Timer(0.05, queue.put, ('a',))
+        timer.start()
+        self.assertEqual(queue.get(timeout=2), 'a')
+        timer.join()
+
+    def test_clear(self):
+        queue = DropOldestQueue(maxsize=3)
+        queue.put('a')
+        queue.put('b')
+        self.assertEqual(queue.clear(), ['a', 'b'])
+        self.assertEqual(len(queue), 0)
+
+
+class MonitorPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = RecordingMonitor()
+
+    def test_capture_queue_drops_oldest(self):
+        pipeline = MonitorPipeline(self.monitor, detection_workers=1, queue_size=2)
+        for _ in range(3):
+            pipeline._capture_once()
+        self.assertEqual(len(pipeline.capture_queue), 2)
+        self.assertEqual(pipeline.get_stats()['frames_captured'], 3)
+        self.assertEqual(pipeline.get_stats()['frames_dropped'], 1)
+        # 队列中的画面使用不同的缓冲区
+        first, second = pipeline.capture_queue.get(), pipeline.capture_queue.get()
+        self.assertIsNot(first[0][0], second[0][0])
+
+    def test_pending_window_skipped(self):
+        pipeline = MonitorPipeline(self.monitor, queue_size=2)
+        state = self.monitor.states[0]
+        pipeline._enqueue_action(state, 'send_button')
+        pipeline._enqueue_action(state, 'send_button')
+        self.assertEqual(len(pipeline.action_queue), 1)
+        pipeline._capture_once()
+        job = pipeline.capture_queue.get()
+        self.assertEqual([plans[0][0].hwnd for _, _, plans in job], [2])
+
+    def test_dropped_action_releases_window(self):
+        pipeline = MonitorPipeline(self.monitor, queue_size=1)
+        first, second = self.monitor.states
+        pipeline._enqueue_action(first, 'send_button')
+        pipeline._enqueue_action(second, 'send_button')
+        pipeline._enqueue_action(first, 'send_button')
+        self.assertEqual(pipeline.get_stats()['actions_dropped'], 2)
+        self.assertEqual(pipeline.action_queue.get(), (first, 'send_button'))
+
+    def test_config_reload_discards_queued_frames(self):
+        self.monitor.config_watcher = SimpleNamespace(poll=lambda: {'monitor_settings': {}})
+        pipeline = MonitorPipeline(self.monitor, queue_size=2)
+        pipeline._capture_once()
+        pipeline._check_config_reload()
+        self.assertEqual(len(pipeline.capture_queue), 0)
+        self.assertEqual(self.monitor.reloads, [({'monitor_settings': {}}, 0)])
+
+    def test_run_detects_and_acts_on_every_window(self):
+        pipeline = MonitorPipeline(self.monitor, detection_workers=2, queue_size=2)
+        thread = threading.Thread(target=pipeline.run)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while set(self.monitor.actions) != {1, 2} and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pipeline._stop_event.set()
+        thread.join(timeout=10)
+        self.assertEqual(set(self.monitor.actions), {1, 2})
+        self.assertGreater(pipeline.frames_detected, 0)
+
+
+class AsyncMonitorRuntimeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = RecordingMonitor()
+        self.runtime = AsyncMonitorRuntime(self.monitor, detection_workers=2)
+
+    async def wait_for(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                self.fail("等待超时")
+            await asyncio.sleep(0.01)
+
+    def run_scenario(self, scenario):
+        async def main():
+            task = asyncio.create_task(self.runtime.run())
+            try:
+                await scenario()
+            finally:
+                self.monitor.release.set()
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(main())
+
+    def test_detection_continues_while_sending(self):
+        self.monitor.release.clear()
+
+        async def scenario():
+            await self.wait_for(lambda: self.monitor.actions)
+            ticks = self.runtime.ticks
+            await self.wait_for(lambda: self.runtime.ticks >= ticks + 3)
+            # 同一时间只有一个动作，等待中的窗口不会被重复安排
+            self.assertEqual(self.monitor.actions, [1])
+            self.assertEqual(self.runtime.get_stats()['pending_actions'], 2)
+            self.monitor.release.set()
+            await self.wait_for(lambda: self.runtime.actions >= 2)
+            self.assertEqual(sorted(self.monitor.actions[:2]), [1, 2])
+
+        self.run_scenario(scenario)
+
+    def test_config_reload_waits_for_action(self):
+        configs = [{'monitor_settings': {}}]
+        self.monitor.config_watcher = SimpleNamespace(
+            check_interval=0.01, poll=lambda force: configs.pop() if configs else None)
+        self.monitor.release.clear()
+
+        async def scenario():
+            await self.wait_for(lambda: self.monitor.actions)
+            await asyncio.sleep(0.1)
+            self.assertEqual(self.monitor.reloads, [])
+            self.monitor.release.set()
+            await self.wait_for(lambda: self.monitor.reloads)
+            self.assertEqual(self.monitor.reloads, [({'monitor_settings': {}}, 0)])
+
+        self.run_scenario(scenario)
+
+
+if __name__ == '__main__':
+    unittest.main()
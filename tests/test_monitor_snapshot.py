@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控状态快照测试：保存和读取、按句柄或标题与窗口区域对应记录、窗口区域变化、
+快照过期和显示器布局变化、等待期后丢弃没有对应窗口的记录
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor_snapshot import MonitorSnapshot
+from roi_tracker import ROITracker
+from window_state import WindowState
+
+SCREEN = (0, 0, 1920, 1080)
+WINDOW = (0, 0, 960, 1046)
+NAMES = ['send_button', 'retry']
+SCALES = (1.0, 1.25)
+
+
+def make_state(hwnd=1, title='main.py - Trae'):
+    return WindowState(hwnd, title, lambda name: ROITracker(padding=20))
+
+
+class MonitorSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'monitor_state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def save(self, *states, window_rect=WINDOW):
+        snapshot = MonitorSnapshot(self.path)
+        snapshot.save([MonitorSnapshot.describe(state, window_rect) for state in states], SCREEN)
+        return snapshot
+
+    def load(self, screen_bounds=SCREEN, **options):
+        snapshot = MonitorSnapshot(self.path, **options)
+        return snapshot, snapshot.load(screen_bounds)
+
+    def saved_state(self, hwnd=1, title='main.py - Trae', last_send=None):
+        state = make_state(hwnd, title)
+        state.get_roi_tracker('send_button').last_hit = (800, 900, 32, 24)
+        state.best_scales['send_button'] = 1.25
+        state.score_stats['send_button'] = {'count': 3, 'mean': 0.95, 'min': 0.93, 'max': 0.97}
+        state.last_send_time = last_send
+        return state
+
+    def test_round_trip(self):
+        self.save(self.saved_state(last_send=time.time() - 4))
+        snapshot, count = self.load()
+        self.assertEqual(count, 1)
+        state = make_state()
+        self.assertTrue(snapshot.restore(state, WINDOW, NAMES, SCALES, cooldown=10))
+        self.assertEqual(state.roi_trackers['send_button'].last_hit, (800, 900, 32, 24))
+        self.assertEqual(state.best_scales, {'send_button': 1.25})
+        self.assertEqual(state.score_stats['send_button']['count'], 3)
+        # 剩余约 6 秒的冷却期
+        self.assertTrue(state.in_cooldown())
+        self.assertEqual(snapshot.waiting, 0)
+        self.assertFalse(snapshot.restore(make_state(), WINDOW, NAMES, SCALES, cooldown=10))
+
+    def test_expired_cooldown_not_restored(self):
+        self.save(self.saved_state(last_send=time.time() - 20))
+        snapshot, _ = self.load()
+        state = make_state()
+        snapshot.restore(state, WINDOW, NAMES, SCALES, cooldown=10)
+        self.assertFalse(state.in_cooldown())
+        self.assertIsNotNone(state.last_send_time)
+
+    def test_matched_by_title_and_rect(self):
+        # Trae 重启后句柄变化，标题和窗口区域相同时仍可对应
+        self.save(self.saved_state(hwnd=1))
+        snapshot, _ = self.load()
+        self.assertFalse(snapshot.restore(make_state(hwnd=7), (10, 0, 960, 1046), NAMES, SCALES, 10))
+        self.assertFalse(snapshot.restore(make_state(hwnd=7, title='a.md - Trae'), WINDOW, NAMES, SCALES, 10))
+        self.assertTrue(snapshot.restore(make_state(hwnd=7), WINDOW, NAMES, SCALES, 10))
+
+    def test_geometry_changed(self):
+        self.save(self.saved_state())
+        snapshot, _ = self.load()
+        state = make_state()
+        self.assertTrue(snapshot.restore(state, (100, 0, 960, 1046), NAMES, SCALES, 10))
+        self.assertEqual(state.roi_trackers, {})
+        self.assertEqual(state.best_scales, {'send_button': 1.25})
+        self.assertEqual((snapshot.geometry_changed, snapshot.roi_restored), (1, 0))
+
+    def test_removed_templates_and_scales_skipped(self):
+        self.save(self.saved_state())
+        snapshot, _ = self.load()
+        state = make_state()
+        snapshot.restore(state, WINDOW, ['retry'], SCALES, 10)
+        self.assertEqual((state.roi_trackers, state.best_scales, state.score_stats), ({}, {}, {}))
+
+        self.save(self.saved_state())
+        snapshot, _ = self.load()
+        state = make_state()
+        snapshot.restore(state, WINDOW, NAMES, (1.0,), 10)
+        self.assertEqual(state.best_scales, {})
+        self.assertIn('send_button', state.roi_trackers)
+
+    def test_screen_bounds_changed(self):
+        self.save(self.saved_state())
+        with self.assertLogs('monitor_snapshot', 'INFO'):
+            self.assertEqual(self.load(screen_bounds=(-1920, 0, 3840, 1080))[1], 0)
+
+    def test_max_age(self):
+        self.save(self.saved_state())
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        data['saved_at'] -= 600
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        self.assertEqual(self.load(max_age=300)[1], 0)
+        self.assertEqual(self.load(max_age=3600)[1], 1)
+        self.assertEqual(self.load(max_age=0)[1], 1)
+
+    def test_unusable_files(self):
+        self.assertEqual(self.load()[1], 0)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"version": ')
+        with self.assertLogs('monitor_snapshot', 'WARNING'):
+            self.assertEqual(self.load()[1], 0)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'saved_at': time.time(), 'screen_bounds': list(SCREEN), 'windows': [{}]}, f)
+        self.assertEqual(self.load()[1], 0)
+
+    def test_expire_unmatched_then_after_grace(self):
+        self.save(self.saved_state(hwnd=1), self.saved_state(hwnd=2, title='a.md - Trae'),
+                  self.saved_state(hwnd=3, title='old.py - Trae'))
+        snapshot, _ = self.load(grace=0)
+        states = [make_state(1), make_state(9, 'a.md - Trae')]
+        # 第一轮：与当前窗口的句柄和标题都不对应的记录立即丢弃
+        snapshot.expire(states)
+        self.assertEqual(snapshot.waiting, 2)
+        # 等待期后丢弃全部剩余记录
+        snapshot.expire(states)
+        self.assertEqual(snapshot.waiting, 0)
+        self.assertEqual(snapshot.get_stats()['discarded'], 3)
+
+    def test_expire_waits_for_grace(self):
+        self.save(self.saved_state())
+        snapshot, _ = self.load(grace=60)
+        snapshot.expire([make_state()])
+        snapshot.expire([make_state()])
+        self.assertEqual(snapshot.waiting, 1)
+
+    def test_due(self):
+        snapshot = MonitorSnapshot(self.path, save_interval=0)
+        self.assertTrue(snapshot.due())
+        snapshot.save_interval = 3600
+        snapshot.save([], SCREEN)
+        self.assertFalse(snapshot.due())
+        self.assertEqual(snapshot.saves, 1)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+金字塔匹配测试：画面金字塔与模板金字塔的构建顺序一致，粗到细匹配的命中位置与全分辨率匹配相同
+"""
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matchers import ArrayPool, ExhaustiveMatcher, PreparedFrame, PyramidMatcher
+from template_cache import TemplateEntry
+
+
+def make_scene(seed=3, size=(240, 320)):
+    rng = np.random.default_rng(seed)
+    scene = rng.integers(0, 255, size + (3,), dtype=np.uint8)
+    # 平滑后金字塔缩小不会把纹理完全抹掉
+    return cv2.GaussianBlur(scene, (5, 5), 0)
+
+
+class PreparedFrameTest(unittest.TestCase):
+
+    def test_gray_pyramid_matches_template_order(self):
+        scene = make_scene()
+        entry = TemplateEntry('template', scene, 0, 0, pyramid_levels=2, scales=())
+        prepared = PreparedFrame(scene)
+        for level in range(3):
+            np.testing.assert_array_equal(prepared.get(level, True), entry.get_variant(level, True))
+            np.testing.assert_array_equal(prepared.get(level, False), entry.get_variant(level, False))
+
+    def test_pool_reuses_arrays(self):
+        pool = ArrayPool()
+        PreparedFrame(make_scene(1), pool).get(2, True)
+        allocations = pool.allocations
+        prepared = PreparedFrame(make_scene(2), pool)
+        gray = prepared.get(2, True)
+        self.assertEqual(pool.allocations, allocations)
+        expected = cv2.pyrDown(cv2.pyrDown(cv2.cvtColor(make_scene(2), cv2.COLOR_BGR2GRAY)))
+        np.testing.assert_array_equal(gray, expected)
+
+    def test_crop_coordinates(self):
+        scene = make_scene()
+        prepared = PreparedFrame(scene)
+        crop = prepared.crop((40, 20, 80, 60), level=1, grayscale=True)
+        self.assertEqual(crop.shape, (30, 40))
+        np.testing.assert_array_equal(crop, prepared.get(1, True)[10:40, 20:60])
+
+
+class PyramidMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scene = make_scene()
+        self.template = TemplateEntry('template', self.scene[100:132, 180:228].copy(), 0, 0,
+                                      pyramid_levels=2, scales=())
+
+    def test_same_location_as_exhaustive(self):
+        for grayscale in (True, False):
+            for levels in (1, 2):
+                matcher = PyramidMatcher(levels=levels, grayscale=grayscale)
+                score, location = matcher.match(self.scene, self.template)
+                self.assertEqual(location, (180, 100))
+                self.assertAlmostEqual(score, 1.0, places=4)
+        score, location = ExhaustiveMatcher().match(self.scene, self.template)
+        self.assertEqual(location, (180, 100))
+
+    def test_rect_offset(self):
+        score, location = PyramidMatcher().match(self.scene, self.template, (150, 80, 120, 90))
+        self.assertEqual(location, (30, 20))
+        self.assertGreater(score, 0.99)
+
+    def test_tight_region(self):
+        score, location = PyramidMatcher(levels=2).match(self.scene, self.template, (176, 96, 56, 40))
+        self.assertEqual(location, (4, 4))
+        self.assertGreater(score, 0.99)
+
+    def test_template_without_pyramid_falls_back(self):
+        # 模板缓存中没有金字塔层级时改用全分辨率匹配
+        template = TemplateEntry('template', self.template.bgr, 0, 0, pyramid_levels=0, scales=())
+        score, location = PyramidMatcher(levels=2).match(self.scene, template)
+        self.assertEqual(location, (180, 100))
+        self.assertAlmostEqual(score, 1.0, places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ROI 跟踪器测试：命中后在附近搜索、连续未命中后扩大到全屏、配置的检测区域和边界裁剪
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roi_tracker import ROITracker
+
+SCREEN = (0, 0, 1920, 1080)
+
+
+class ROITrackerTest(unittest.TestCase):
+
+    def test_full_search_without_history(self):
+        tracker = ROITracker()
+        self.assertEqual(tracker.next_region(SCREEN, 32, 24), SCREEN)
+        self.assertFalse(tracker.current_is_roi)
+        self.assertEqual(tracker.full_searches, 1)
+
+    def test_padded_roi_after_hit(self):
+        tracker = ROITracker(padding=50)
+        tracker.next_region(SCREEN, 32, 24)
+        tracker.record_hit(500, 400, 32, 24)
+        self.assertEqual(tracker.next_region(SCREEN, 32, 24), (450, 350, 132, 124))
+        self.assertTrue(tracker.current_is_roi)
+        tracker.record_hit(510, 400, 32, 24)
+        self.assertEqual(tracker.get_stats()['roi_hits'], 1)
+
+    def test_widens_after_max_misses(self):
+        tracker = ROITracker(padding=50, max_misses=2)
+        tracker.record_hit(500, 400, 32, 24)
+        for _ in range(2):
+            tracker.next_region(SCREEN, 32, 24)
+            self.assertTrue(tracker.current_is_roi)
+            tracker.record_miss()
+        self.assertEqual(tracker.next_region(SCREEN, 32, 24), SCREEN)
+        self.assertFalse(tracker.current_is_roi)
+        self.assertEqual(tracker.widenings, 1)
+        # 全屏搜索未命中不计入，之后重新回到 ROI
+        tracker.record_miss()
+        self.assertNotEqual(tracker.next_region(SCREEN, 32, 24), SCREEN)
+        self.assertTrue(tracker.current_is_roi)
+
+    def test_search_region_before_first_hit(self):
+        tracker = ROITracker(search_region=(1000, 600, 400, 300))
+        self.assertEqual(tracker.next_region(SCREEN, 32, 24), (1000, 600, 400, 300))
+        self.assertTrue(tracker.current_is_roi)
+
+    def test_roi_clipped_to_window_bounds(self):
+        tracker = ROITracker(padding=100)
+        tracker.record_hit(210, 110, 32, 24)
+        region = tracker.next_region(SCREEN, 32, 24, bounds=(200, 100, 800, 600))
+        self.assertEqual(region, (200, 100, 142, 134))
+
+    def test_region_holds_template(self):
+        tracker = ROITracker(padding=0)
+        tracker.record_hit(1900, 1070, 32, 24)
+        x, y, w, h = tracker.next_region(SCREEN, 32, 24)
+        self.assertGreaterEqual(w, 32)
+        self.assertGreaterEqual(h, 24)
+        self.assertLessEqual(x + w, 1920)
+        self.assertLessEqual(y + h, 1080)
+
+    def test_reset(self):
+        tracker = ROITracker()
+        tracker.record_hit(500, 400, 32, 24)
+        tracker.reset()
+        self.assertEqual(tracker.next_region(SCREEN, 32, 24), SCREEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
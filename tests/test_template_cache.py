@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板缓存测试：缩放比例列表、缩放模板库、按文件状态重新加载、并发加载，
+以及在不同显示缩放下命中后记住最佳比例
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import DetectionEngine, StateTemplate
+from matchers import create_matcher
+from roi_tracker import ROITracker
+from template_cache import TemplateCache, TemplateEntry, scale_range
+from window_state import WindowState
+
+
+def make_template(seed=5, shape=(24, 32)):
+    rng = np.random.default_rng(seed)
+    return cv2.GaussianBlur(rng.integers(0, 255, shape + (3,), dtype=np.uint8), (3, 3), 0)
+
+
+class ScaleRangeTest(unittest.TestCase):
+
+    def test_range(self):
+        self.assertEqual(scale_range(1.0, 1.5, 0.25), (1.0, 1.25, 1.5))
+
+    def test_always_contains_original(self):
+        self.assertEqual(scale_range(1.25, 1.5, 0.25), (1.0, 1.25, 1.5))
+        self.assertEqual(scale_range(0.75, 0.75, 0.25), (0.75, 1.0))
+
+    def test_invalid_step_or_range(self):
+        self.assertEqual(scale_range(1.0, 2.0, 0), (1.0,))
+        self.assertEqual(scale_range(2.0, 1.0, 0.25), (1.0,))
+
+
+class TemplateEntryTest(unittest.TestCase):
+
+    def test_scale_bank(self):
+        entry = TemplateEntry('template', make_template(), 0, 0, pyramid_levels=1, scales=(1.0, 1.25, 1.5))
+        self.assertEqual([variant.scale for variant in entry.scale_bank], [1.0, 1.25, 1.5])
+        self.assertIs(entry.scale_bank[0], entry)
+        self.assertEqual((entry.scale_bank[2].width, entry.scale_bank[2].height), (48, 36))
+        # 缩放模板也有各自的金字塔
+        self.assertEqual(entry.scale_bank[1].get_variant(1, True).shape, (15, 20))
+
+    def test_get_scaled_nearest(self):
+        entry = TemplateEntry('template', make_template(), 0, 0, pyramid_levels=0, scales=(1.0, 1.25, 1.5))
+        self.assertEqual(entry.get_scaled(1.3).scale, 1.25)
+        self.assertEqual(entry.get_scaled(2.0).scale, 1.5)
+
+    def test_pyramid_stops_at_small_templates(self):
+        entry = TemplateEntry('template', make_template(shape=(10, 12)), 0, 0, pyramid_levels=3, scales=())
+        self.assertEqual(len(entry.pyramid_bgr), 2)
+        self.assertEqual(entry.get_variant(3).shape, entry.pyramid_bgr[-1].shape)
+
+
+class TemplateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'button.png')
+        cv2.imwrite(self.path, make_template())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_until_file_changes(self):
+        cache = TemplateCache(stat_interval=0)
+        entry = cache.get(self.path)
+        self.assertIs(cache.get(self.path), entry)
+        cv2.imwrite(self.path, make_template(seed=6, shape=(30, 40)))
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        reloaded = cache.get(self.path)
+        self.assertIsNot(reloaded, entry)
+        self.assertEqual((reloaded.width, reloaded.height), (40, 30))
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'reloads': 2, 'failures': 0, 'cached_templates': 1})
+
+    def test_stat_interval_skips_disk(self):
+        cache = TemplateCache(stat_interval=3600)
+        entry = cache.get(self.path)
+        os.remove(self.path)
+        self.assertIs(cache.get(self.path), entry)
+
+    def test_missing_and_unreadable(self):
+        cache = TemplateCache(stat_interval=0)
+        self.assertIsNone(cache.get(os.path.join(self.directory, 'missing.png')))
+        self.assertIn('missing.png', cache.last_error)
+        broken = os.path.join(self.directory, 'broken.png')
+        with open(broken, 'wb') as f:
+            f.write(b'not an image')
+        self.assertIsNone(cache.get(broken))
+        self.assertEqual(cache.failures, 2)
+        self.assertIsNotNone(cache.get(self.path))
+        self.assertIsNone(cache.last_error)
+
+    def test_set_scales_rebuilds_bank(self):
+        cache = TemplateCache(stat_interval=0)
+        self.assertEqual(len(cache.get(self.path).scale_bank), 1)
+        cache.set_scales(scale_range(1.0, 1.5, 0.25))
+        self.assertEqual([variant.scale for variant in cache.get(self.path).scale_bank], [1.0, 1.25, 1.5])
+
+    def test_concurrent_loads_decode_once(self):
+        cache = TemplateCache(stat_interval=3600, scales=scale_range(1.0, 2.0, 0.25))
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(self.path))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.reloads, 1)
+        self.assertTrue(all(entry is results[0] for entry in results))
+
+    def test_detects_scaled_button_and_remembers_scale(self):
+        template = make_template()
+        scene = np.zeros((300, 400, 3), np.uint8)
+        scaled = cv2.resize(template, (40, 30), interpolation=cv2.INTER_CUBIC)
+        scene[100:130, 200:240] = scaled
+        cache = TemplateCache(pyramid_levels=0, stat_interval=0, scales=scale_range(1.0, 1.5, 0.25))
+        engine = DetectionEngine(cache, create_matcher('exhaustive'), [StateTemplate('send_button', self.path, 0.9)])
+        state = WindowState(None, "Trae", lambda name: ROITracker(padding=20))
+        hits = engine.evaluate(scene, (0, 0, 400, 300), engine.plan(state, (0, 0, 400, 300)))
+        self.assertEqual(len(hits), 1)
+        self.assertEqual((hits[0].scale, hits[0].box), (1.25, (200, 100, 40, 30)))
+        self.assertEqual(state.best_scales, {'send_button': 1.25})
+        # 局部搜索只尝试记住的比例
+        matches = engine.matches
+        engine.evaluate(scene, (0, 0, 400, 300), engine.plan(state, (0, 0, 400, 300)))
+        self.assertEqual(engine.matches - matches, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
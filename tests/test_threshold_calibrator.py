@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阈值校准测试：阈值推导、滞回、只有确认存在样本时的阈值上限、保存和加载，
+以及 ActionGuard 交给校准器的样本（近似命中和验证过的发送）
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from action_state import ActionGuard
+from detection_engine import StateHit
+from threshold_calibrator import ThresholdCalibrator
+from window_state import WindowState
+
+
+def make_hit(score, position=(100, 100), name='send_button', threshold=0.9):
+    return StateHit(name=name, action='send_message', score=score, position=position,
+                    box=(position[0] - 16, position[1] - 12, 32, 24), priority=0,
+                    threshold=threshold, scale=1.0)
+
+
+class DeriveTest(unittest.TestCase):
+
+    def test_threshold_between_classes(self):
+        calibrator = ThresholdCalibrator(min_positive=3, min_negative=3)
+        for score in (0.93, 0.95, 0.97):
+            calibrator.record('send_button', score, True)
+        for score in (0.80, 0.82, 0.84):
+            calibrator.record('send_button', score, False)
+        # 0.85 到 0.93 之间的分桶边界代价都为 0，取中间
+        self.assertAlmostEqual(calibrator.derive('send_button'), 0.89)
+        self.assertAlmostEqual(calibrator.threshold_for('send_button', 0.95), 0.89)
+
+    def test_not_enough_samples(self):
+        calibrator = ThresholdCalibrator(min_positive=3, min_negative=3)
+        calibrator.record('send_button', 0.95, True)
+        calibrator.record('send_button', 0.80, False)
+        self.assertIsNone(calibrator.derive('send_button'))
+        self.assertIsNone(calibrator.derive_ceiling('send_button'))
+        self.assertEqual(calibrator.threshold_for('send_button', 0.95), 0.95)
+
+    def test_clamped_to_bounds(self):
+        calibrator = ThresholdCalibrator(min_positive=1, min_negative=1, bounds=(0.75, 0.98))
+        calibrator.record('send_button', 0.40, True)
+        calibrator.record('send_button', 0.20, False)
+        self.assertEqual(calibrator.derive('send_button'), 0.75)
+
+    def test_miss_weight_prefers_lower_threshold(self):
+        calibrator = ThresholdCalibrator(min_positive=2, min_negative=2)
+        for score in (0.86, 0.95, 0.96):
+            calibrator.record('send_button', score, True)
+        for score in (0.80, 0.90):
+            calibrator.record('send_button', score, False)
+        balanced = calibrator.derive('send_button')
+        calibrator.miss_weight = 3.0
+        self.assertLess(calibrator.derive('send_button'), balanced)
+
+    def test_positives_only_ceiling(self):
+        calibrator = ThresholdCalibrator(min_positive=5, min_negative=3, ceiling_quantile=0.0)
+        for score in (0.88, 0.91, 0.93, 0.95, 0.97):
+            calibrator.record('send_button', score, True)
+        self.assertIsNone(calibrator.derive('send_button'))
+        self.assertAlmostEqual(calibrator.derive_ceiling('send_button'), 0.88)
+        # 上限只会降低配置的阈值，不会提高
+        self.assertAlmostEqual(calibrator.threshold_for('send_button', 0.95), 0.88)
+        self.assertEqual(calibrator.threshold_for('send_button', 0.85), 0.85)
+
+    def test_ceiling_ignores_low_outlier(self):
+        calibrator = ThresholdCalibrator(min_positive=5, ceiling_quantile=0.1)
+        calibrator.record('send_button', 0.50, True)
+        for score in (0.90, 0.91, 0.92, 0.93, 0.94, 0.95, 0.96, 0.97, 0.98):
+            calibrator.record('send_button', score, True)
+        self.assertAlmostEqual(calibrator.derive_ceiling('send_button'), 0.90)
+
+    def test_not_applied(self):
+        calibrator = ThresholdCalibrator(min_positive=1, min_negative=1, apply=False)
+        calibrator.record('send_button', 0.95, True)
+        calibrator.record('send_button', 0.80, False)
+        self.assertEqual(calibrator.threshold_for('send_button', 0.9), 0.9)
+        self.assertIsNotNone(calibrator.get_stats()['states']['send_button']['threshold'])
+
+
+class HysteresisTest(unittest.TestCase):
+
+    def test_small_change_ignored(self):
+        calibrator = ThresholdCalibrator(min_positive=1, min_negative=1, hysteresis=0.03, window=1)
+        calibrator.record('send_button', 0.95, True)
+        calibrator.record('send_button', 0.84, False)
+        self.assertAlmostEqual(calibrator.threshold_for('send_button', None), 0.90)
+        # 推导值变为 0.91，相差小于滞回量，保持原值
+        self.assertFalse(calibrator.record('send_button', 0.86, False))
+        self.assertAlmostEqual(calibrator.derive('send_button'), 0.91)
+        self.assertAlmostEqual(calibrator.threshold_for('send_button', None), 0.90)
+        # 相差超过滞回量时更新
+        self.assertTrue(calibrator.record('send_button', 0.93, False))
+        self.assertAlmostEqual(calibrator.threshold_for('send_button', None), 0.945)
+
+    def test_rolling_window(self):
+        calibrator = ThresholdCalibrator(min_positive=1, min_negative=1, window=2)
+        for score in (0.5, 0.6, 0.95, 0.96):
+            calibrator.record('send_button', score, True)
+        self.assertEqual(sorted(calibrator._positives['send_button'].samples), [0.95, 0.96])
+
+
+class SaveLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'threshold_calibration.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        calibrator = ThresholdCalibrator(path=self.path, min_positive=2, min_negative=2)
+        for score in (0.93, 0.96):
+            calibrator.record('send_button', score, True)
+        for score in (0.81, 0.83):
+            calibrator.record('send_button', score, False)
+        for score in (0.90, 0.92):
+            calibrator.record('retry_button', score, True)
+        calibrator.save()
+
+        loaded = ThresholdCalibrator(path=self.path, min_positive=2, min_negative=2)
+        self.assertEqual(loaded.threshold_for('send_button', None), calibrator.threshold_for('send_button', None))
+        self.assertEqual(loaded.threshold_for('retry_button', 0.95), calibrator.threshold_for('retry_button', 0.95))
+        self.assertEqual(loaded.get_stats()['states'], calibrator.get_stats()['states'])
+        self.assertEqual(loaded.derive('send_button'), calibrator.derive('send_button'))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_corrupt_file_ignored(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{')
+        calibrator = ThresholdCalibrator(path=self.path)
+        self.assertEqual(calibrator.threshold_for('send_button', 0.9), 0.9)
+
+
+class GuardSamplesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calibrator = ThresholdCalibrator(min_positive=1, min_negative=1, apply=False)
+        self.guard = ActionGuard(confirm_timeout=3.0, max_retries=2, calibrator=self.calibrator,
+                                 near_miss_window=30.0)
+        self.state = WindowState(1, "Trae", lambda name: None)
+        self.now = time.monotonic() + 1000
+
+    def samples(self, present):
+        histograms = self.calibrator._positives if present else self.calibrator._negatives
+        histogram = histograms.get('send_button')
+        return [] if histogram is None else list(histogram.samples)
+
+    def send(self, hit, verified):
+        self.assertTrue(self.guard.begin(self.state, hit, now=self.now))
+        self.guard.finish(self.state, True, verified, now=self.now)
+
+    def test_confirmed_send_labels_near_misses(self):
+        hit = make_hit(0.93)
+        self.state.record_near_misses([make_hit(0.85, (102, 101))], now=self.now - 10)
+        # 太早或不在命中位置的近似命中不计入
+        self.state.record_near_misses([make_hit(0.84, (102, 101))], now=self.now - 60)
+        self.state.record_near_misses([make_hit(0.86, (400, 400))], now=self.now - 5)
+        self.send(hit, verified=False)
+        self.guard.observe(self.state, None, now=self.now + 1)
+        self.assertEqual(sorted(self.samples(True)), [0.85, 0.93])
+        self.assertEqual(self.samples(False), [])
+        self.assertEqual(len(self.state.near_misses), 0)
+
+    def test_verified_send_not_confirmed_is_negative(self):
+        hit = make_hit(0.91)
+        self.send(hit, verified=True)
+        self.guard.observe(self.state, hit, now=self.now + 3)
+        self.assertEqual(self.samples(False), [0.91])
+        self.assertEqual(self.samples(True), [])
+
+    def test_unverified_send_not_confirmed_is_not_recorded(self):
+        hit = make_hit(0.91)
+        self.send(hit, verified=False)
+        self.guard.observe(self.state, hit, now=self.now + 3)
+        self.assertEqual(self.samples(False), [])
+        self.assertEqual(self.guard.retries, 1)
+
+    def test_failed_action_is_not_recorded(self):
+        hit = make_hit(0.91)
+        self.assertTrue(self.guard.begin(self.state, hit, now=self.now))
+        self.guard.finish(self.state, False, True, now=self.now)
+        self.assertEqual(self.samples(False), [])
+        self.assertEqual(self.samples(True), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块匹配测试：分块覆盖所有匹配位置，结果与整块匹配一致（包括块边界和分数相同的情况）
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matchers import ExhaustiveMatcher, TiledMatcher
+from template_cache import TemplateEntry
+
+
+def entry(image):
+    return TemplateEntry('template', image, 0, 0, pyramid_levels=0, scales=())
+
+
+class TiledMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = TiledMatcher(tile_size=64, workers=2)
+        self.exhaustive = ExhaustiveMatcher()
+        self.rng = np.random.default_rng(3)
+
+    def tearDown(self):
+        self.matcher.close()
+
+    def test_split_covers_every_position_once(self):
+        width, height, tw, th = 300, 200, 20, 10
+        covered = np.zeros((height - th + 1, width - tw + 1), np.int32)
+        for x, y, w, h in self.matcher.split(width, height, tw, th):
+            self.assertLessEqual(x + w, width)
+            self.assertLessEqual(y + h, height)
+            covered[y:y + h - th + 1, x:x + w - tw + 1] += 1
+        self.assertTrue((covered == 1).all())
+
+    def test_hit_across_tile_boundary(self):
+        image = self.rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+        # 模板跨越 x=64 和 y=64 两条分块边界
+        template = entry(image[50:80, 55:95].copy())
+        tiled = self.matcher.match(image, template)
+        whole = self.exhaustive.match(image, template)
+        self.assertEqual(tiled[1], whole[1])
+        self.assertEqual(tiled[1], (55, 50))
+        self.assertAlmostEqual(tiled[0], whole[0], places=5)
+        self.assertGreater(self.matcher.tiled_matches, 0)
+
+    def test_rect_offset(self):
+        image = self.rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+        template = entry(image[150:170, 200:230].copy())
+        rect = (100, 40, 200, 180)
+        self.assertEqual(self.matcher.match(image, template, rect)[1],
+                         self.exhaustive.match(image, template, rect)[1])
+
+    def test_equal_scores_pick_first_in_raster_order(self):
+        image = np.zeros((200, 200, 3), np.uint8)
+        pattern = self.rng.integers(0, 255, (12, 12, 3), dtype=np.uint8)
+        # 同样的图案出现在同一行的左块（较低）和右块（较高）中，
+        # 分块顺序下左块在前，但整幅画面行优先顺序下右块的位置在前
+        image[10:22, 150:162] = pattern
+        image[50:62, 10:22] = pattern
+        template = entry(pattern)
+        tiled = self.matcher.match(image, template)
+        whole = self.exhaustive.match(image, template)
+        self.assertEqual(tiled[1], (150, 10))
+        self.assertEqual(tiled[1], whole[1])
+
+    def test_small_region_is_not_tiled(self):
+        image = self.rng.integers(0, 255, (60, 60, 3), dtype=np.uint8)
+        template = entry(image[10:30, 10:30].copy())
+        self.assertEqual(self.matcher.match(image, template)[1], (10, 10))
+        self.assertEqual(self.matcher.tiled_matches, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口标题分类器测试：编译后的正则与逐个关键词比较的原始规则结果一致、关键词重叠、
+自定义规则和按标题缓存
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from window_classifier import (DEFAULT_EXCLUDE_KEYWORDS, DEFAULT_INTERFERING_KEYWORDS, DEFAULT_TRAE_INDICATORS,
+                               WindowTitleClassifier)
+
+TITLES = [
+    'main.py - Trae', 'README.md - Trae', 'Trae - Welcome', 'Trae IDE', 'config.json - TRAE',
+    'Trae', 'portrae.py - Notepad', 'traefik - Trae - Terminal', 'main.py - Trae - Google Chrome',
+    'Google Chrome', 'Mozilla Firefox', 'Microsoft Edge', '360安全浏览器', 'Windows PowerShell',
+    'edge-cases.md - Trae', 'Browser Tools - Trae', '', '命令提示符',
+]
+
+
+def classify_by_keywords(title):
+    """
+    逐个关键词比较的原始规则
+    """
+    lower = title.lower()
+    if not any(keyword in lower for keyword in DEFAULT_EXCLUDE_KEYWORDS) and \
+            any(indicator in lower for indicator in DEFAULT_TRAE_INDICATORS):
+        return 'trae'
+    if any(keyword in lower for keyword in DEFAULT_INTERFERING_KEYWORDS):
+        return 'interfering'
+    return None
+
+
+class WindowTitleClassifierTest(unittest.TestCase):
+
+    def test_same_as_keyword_rules(self):
+        classifier = WindowTitleClassifier()
+        for title in TITLES:
+            with self.subTest(title=title):
+                self.assertEqual(classifier.classify(title), classify_by_keywords(title))
+
+    def test_examples(self):
+        classifier = WindowTitleClassifier()
+        self.assertTrue(classifier.is_trae_window('main.py - Trae'))
+        self.assertFalse(classifier.is_trae_window('Trae'))
+        # 排除关键词优先于Trae标识
+        self.assertIsNone(classifier.classify('traefik - Trae - Terminal'))
+        self.assertEqual(classifier.classify('main.py - Trae - Google Chrome'), 'interfering')
+
+    def test_overlapping_keywords(self):
+        # '.py - trae' 与 '- trae' 重叠，'edge' 出现在其他单词中
+        classifier = WindowTitleClassifier(trae_indicators=['.py - trae', '- trae'],
+                                           exclude_keywords=['edge'], interfering_keywords=['ledger'])
+        self.assertEqual(classifier.classify('x.py - Trae'), 'trae')
+        self.assertEqual(classifier.classify('Ledger - Trae'), 'interfering')
+
+    def test_custom_rules(self):
+        classifier = WindowTitleClassifier(trae_indicators=['- myeditor'], interfering_keywords=['slack'])
+        self.assertEqual(classifier.classify('foo - MyEditor'), 'trae')
+        self.assertIsNone(classifier.classify('main.py - Trae'))
+        self.assertEqual(classifier.classify('Slack'), 'interfering')
+
+    def test_cached_by_title(self):
+        classifier = WindowTitleClassifier(cache_size=2)
+        for title in ('a - Trae', 'a - Trae', 'b - Trae', 'c - Trae', 'a - Trae'):
+            classifier.classify(title)
+        self.assertEqual(classifier.get_stats(), {'cache_hits': 1, 'cache_misses': 4, 'cached_titles': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口注册表测试：分类规则变化后已缓存的窗口需要重新分类
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from window_classifier import WindowTitleClassifier
+from window_registry import FakeWindowPlatform, WindowRegistry
+
+
+class WindowRegistryReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.platform = FakeWindowPlatform({1: 'main.py - Trae', 2: 'foo - MyEditor'})
+        self.classifier = WindowTitleClassifier()
+        # 与监控器相同：注册表通过函数间接使用当前的分类器，热加载时只替换分类器
+        self.registry = WindowRegistry(self.platform, lambda title: self.classifier.classify(title),
+                                       use_events=False)
+
+    def test_invalidate_reclassifies_known_windows(self):
+        self.assertEqual(self.registry.get_windows('trae'), [(1, 'main.py - Trae')])
+
+        self.classifier = WindowTitleClassifier(trae_indicators=['- trae', '- myeditor'])
+        self.registry.invalidate()
+
+        self.assertEqual(self.registry.get_windows('trae'), [(1, 'main.py - Trae'), (2, 'foo - MyEditor')])
+
+    def test_cached_classification_kept_without_invalidate(self):
+        self.registry.get_windows('trae')
+        classifications = self.registry.classifications
+
+        self.registry.refresh(force=True)
+
+        self.assertEqual(self.registry.classifications, classifications)
+
+
+if __name__ == '__main__':
+    unittest.main()
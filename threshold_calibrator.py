@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+匹配阈值自动校准
+功能：按状态记录每次模板匹配的最高分（cv2.minMaxLoc 的 max_val），
+并按之后确认的结果分为两类（由 ActionGuard 在确认结果后记录）：
+- 确认存在：执行动作后该状态从界面上消失；发送前同一位置略低于阈值的匹配（近似命中）也记为确认存在
+- 确认不存在：文本已粘贴到输入框、点击发送后该状态却没有消失的命中（误触发）
+没有后续结果的近似命中、动作本身未被验证（例如粘贴没有生效）的命中结果不明确，不作为样本
+两类分数各保留最近的 N 个，组成滚动直方图，从中推导能把两类分开的阈值；
+只有确认存在的样本时，只推导阈值的上限（使已确认的分数都能命中），不会提高配置的阈值。
+只有新阈值与当前阈值相差超过滞回量时才更新，并保存到文件，重启后继续使用
+"""
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# 直方图分桶数（分数 0~1，每桶 0.01）
+HISTOGRAM_BINS = 100
+
+
+class RollingHistogram:
+    """
+    保留最近 window 个分数的直方图
+    """
+
+    def __init__(self, window=500, bins=HISTOGRAM_BINS):
+        self.bins = bins
+        self.samples = collections.deque()
+        self.window = max(1, window)
+        self.counts = [0] * bins
+
+    def _bin(self, score):
+        return min(self.bins - 1, max(0, int(score * self.bins)))
+
+    def add(self, score):
+        if len(self.samples) >= self.window:
+            self.counts[self._bin(self.samples.popleft())] -= 1
+        self.samples.append(score)
+        self.counts[self._bin(score)] += 1
+
+    def __len__(self):
+        return len(self.samples)
+
+    def count_below(self, edge):
+        """
+        分数低于第 edge 个分桶边界（edge / bins）的数量
+        """
+        return sum(self.counts[:edge])
+
+    def quantile_edge(self, fraction):
+        """
+        返回最大的分桶边界，使低于该边界的分数不超过总数的 fraction
+        """
+        limit = fraction * len(self.samples)
+        below = 0
+        for edge, count in enumerate(self.counts):
+            if below + count > limit:
+                return edge
+            below += count
+        return self.bins
+
+
+class ThresholdCalibrator:
+    """
+    基于分数分布的阈值校准器（线程安全）
+
+    Args:
+        path: 保存校准结果的文件，为 None 时不保存
+        window: 每类保留的分数数量
+        hysteresis: 新阈值与当前阈值相差超过该值才更新
+        bounds: 自动阈值的范围 (最低, 最高)
+        min_positive: 推导阈值所需的最少确认存在样本数
+        min_negative: 推导阈值所需的最少确认不存在样本数，不足时只推导阈值上限
+        ceiling_quantile: 推导阈值上限时允许低于上限的确认存在样本比例（排除个别异常低分）
+        update_every: 每记录多少个新分数重新推导一次
+        miss_weight: 漏检相对误检的代价权重，大于 1 时阈值偏向宽松
+        apply: 是否使用推导出的阈值（为 False 时只记录和保存，供 calibrate_threshold.py 查看）
+        save_interval: 阈值未变化时，两次保存之间的最短间隔（秒）
+    """
+
+    def __init__(self, path=None, window=500, hysteresis=0.02, bounds=(0.75, 0.98),
+                 min_positive=5, min_negative=3, ceiling_quantile=0.05, update_every=1, miss_weight=1.0,
+                 apply=True, save_interval=300.0):
+        self.path = path
+        self.window = window
+        self.hysteresis = hysteresis
+        self.bounds = tuple(bounds)
+        self.min_positive = min_positive
+        self.min_negative = min_negative
+        self.ceiling_quantile = ceiling_quantile
+        self.update_every = max(1, update_every)
+        self.miss_weight = miss_weight
+        self.apply = apply
+        self.save_interval = save_interval
+        self._last_save = time.monotonic()
+
+        self._positives = {}
+        self._negatives = {}
+        self._thresholds = {}
+        self._ceilings = {}
+        self._pending = collections.Counter()
+        self._lock = threading.Lock()
+
+        # 统计计数
+        self.updates = 0
+        self.load()
+
+    def threshold_for(self, name, default):
+        """
+        返回状态当前使用的阈值，没有校准结果或未启用时返回 default
+        只有阈值上限时返回 default 和上限中较低的一个
+        """
+        if not self.apply:
+            return default
+        if name in self._thresholds:
+            return self._thresholds[name]
+        ceiling = self._ceilings.get(name)
+        if ceiling is None or default is None:
+            return default
+        return min(default, ceiling)
+
+    def record(self, name, score, present):
+        """
+        记录一次已确认结果的匹配分数
+        Args:
+            present: 该状态是否确认存在
+        返回: 阈值是否因此更新
+        """
+        with self._lock:
+            histograms = self._positives if present else self._negatives
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = RollingHistogram(self.window)
+            histogram.add(score)
+
+            self._pending[name] += 1
+            if self._pending[name] < self.update_every:
+                return False
+            self._pending[name] = 0
+            changed = self._update(name)
+            due = time.monotonic() - self._last_save >= self.save_interval
+        if changed or due:
+            self.save()
+        return changed
+
+    def derive(self, name):
+        """
+        根据当前分布推导阈值，样本不足时返回 None
+        在所有分桶边界中选择加权错误率最低的位置，多个位置并列时取中间，使两类之间的间隔最大
+        """
+        positives = self._positives.get(name)
+        negatives = self._negatives.get(name)
+        if (positives is None or negatives is None
+                or len(positives) < self.min_positive or len(negatives) < self.min_negative):
+            return None
+
+        best_cost = None
+        best_edges = []
+        for edge in range(HISTOGRAM_BINS + 1):
+            missed = positives.count_below(edge) / len(positives)
+            false_hits = 1 - negatives.count_below(edge) / len(negatives)
+            cost = round(self.miss_weight * missed + false_hits, 9)
+            if best_cost is None or cost < best_cost:
+                best_cost, best_edges = cost, [edge]
+            elif cost == best_cost and edge == best_edges[-1] + 1:
+                best_edges.append(edge)
+
+        threshold = (best_edges[0] + best_edges[-1]) / 2 / HISTOGRAM_BINS
+        return self._clamp(threshold)
+
+    def derive_ceiling(self, name):
+        """
+        只根据确认存在的分数推导阈值上限，样本不足时返回 None
+        上限取确认存在分数的低分位（ceiling_quantile），低于该分位的个别样本不计
+        """
+        positives = self._positives.get(name)
+        if positives is None or len(positives) < self.min_positive:
+            return None
+        return self._clamp(positives.quantile_edge(self.ceiling_quantile) / HISTOGRAM_BINS)
+
+    def _clamp(self, threshold):
+        return min(self.bounds[1], max(self.bounds[0], threshold))
+
+    def _update(self, name):
+        threshold = self.derive(name)
+        if threshold is not None:
+            self._ceilings.pop(name, None)
+            return self._set(self._thresholds, name, threshold, "匹配阈值")
+        ceiling = self.derive_ceiling(name)
+        if ceiling is None:
+            return False
+        return self._set(self._ceilings, name, ceiling, "匹配阈值上限")
+
+    def _set(self, values, name, value, label):
+        """
+        新值与当前值相差超过滞回量时更新
+        返回: 是否更新
+        """
+        current = values.get(name)
+        if current is not None and abs(value - current) < self.hysteresis:
+            return False
+        values[name] = round(value, 3)
+        self.updates += 1
+        log.info("🎯 状态 %s 的%s校准为 %.3f%s", name, label, values[name],
+                 "" if self.apply else "（未启用自动阈值，仅记录）")
+        return True
+
+    def load(self):
+        """
+        读取保存的校准结果
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for name, item in data.get('states', {}).items():
+                for key, histograms in (('positives', self._positives), ('negatives', self._negatives)):
+                    histogram = histograms[name] = RollingHistogram(self.window)
+                    for score in item.get(key, []):
+                        histogram.add(score)
+                if item.get('threshold') is not None:
+                    self._thresholds[name] = item['threshold']
+                elif item.get('ceiling') is not None:
+                    self._ceilings[name] = item['ceiling']
+            log.info("✅ 已加载阈值校准结果 %s: 阈值 %s, 阈值上限 %s", self.path, self._thresholds, self._ceilings)
+        except Exception as e:
+            log.warning("⚠️  读取阈值校准结果失败: %s", e)
+
+    def save(self):
+        """
+        保存校准结果（先写临时文件再替换，避免写到一半时中断）
+        """
+        if not self.path:
+            return
+        with self._lock:
+            self._last_save = time.monotonic()
+            names = set(self._positives) | set(self._negatives) | set(self._thresholds) | set(self._ceilings)
+            data = {'states': {
+                name: {
+                    'threshold': self._thresholds.get(name),
+                    'ceiling': self._ceilings.get(name),
+                    'positives': self._samples(self._positives, name),
+                    'negatives': self._samples(self._negatives, name),
+                } for name in sorted(names)
+            }}
+        try:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log.warning("⚠️  保存阈值校准结果失败: %s", e)
+
+    @staticmethod
+    def _samples(histograms, name):
+        histogram = histograms.get(name)
+        return [] if histogram is None else [round(score, 4) for score in histogram.samples]
+
+    def get_stats(self):
+        """
+        返回各状态的样本数和阈值
+        """
+        with self._lock:
+            names = set(self._positives) | set(self._negatives)
+            return {
+                'updates': self.updates,
+                'states': {
+                    name: {
+                        'positives': len(self._positives.get(name, ())),
+                        'negatives': len(self._negatives.get(name, ())),
+                        'threshold': self._thresholds.get(name),
+                        'ceiling': self._ceilings.get(name),
+                    } for name in sorted(names)
+                },
+            }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+等待与耗时统计工具
+功能：
+- wait_until: 轮询一个开销很小的条件直到满足或超时，替代固定时长的 time.sleep
+- LatencyHistogram: 固定分桶的耗时直方图
+- StepTimer: 按步骤名称记录耗时直方图
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 直方图分桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def wait_until(predicate, timeout=2.0, interval=0.02, min_wait=0.0):
+    """
+    轮询 predicate 直到返回真值或超时
+
+    Args:
+        predicate: 无参数的判断函数，抛出异常视为未满足
+        timeout: 最长等待时间（秒）
+        interval: 两次判断之间的间隔（秒）
+        min_wait: 首次判断前至少等待的时间（秒）
+
+    返回: 条件是否在超时前满足
+    """
+    deadline = time.monotonic() + timeout
+    if min_wait > 0:
+        time.sleep(min_wait)
+    while True:
+        try:
+            if predicate():
+                return True
+        except Exception:
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+
+
+class LatencyHistogram:
+    """
+    耗时直方图（线程安全）
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        """
+        返回: (各分桶计数, 总次数, 总耗时)，用于导出
+        """
+        with self._lock:
+            return list(self.counts), self.count, self.total
+
+    def percentile(self, pct):
+        """
+        根据分桶估算百分位数（返回所在分桶的上限，不超过最大值）
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = pct / 100 * self.count
+            cumulative = 0
+            for i, count in enumerate(self.counts):
+                cumulative += count
+                if cumulative >= target:
+                    return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+            return self.max
+
+    def get_stats(self):
+        """
+        返回: 次数、平均值、P50/P95（估算）和最大值，单位毫秒
+        """
+        if self.count == 0:
+            return {'count': 0}
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 1),
+            'p50_ms': round(p50 * 1000, 1),
+            'p95_ms': round(p95 * 1000, 1),
+            'max_ms': round(self.max * 1000, 1),
+        }
+
+
+class StepTimer:
+    """
+    按步骤名称记录耗时
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def step(self, name):
+        """
+        用法: with timer.step('paste'): ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def get_stats(self):
+        with self._lock:
+            items = list(self.histograms.items())
+        return {name: histogram.get_stats() for name, histogram in items}
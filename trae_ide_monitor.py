@@ -10,7 +10,7 @@ import pyautogui
 import cv2
 import numpy as np
 from PIL import Image
-import os
+from template_cache import TemplateCache
 
 class TraeIDEMonitor:
     def __init__(self):
@@ -20,6 +20,9 @@ class TraeIDEMonitor:
         # 目标按钮图片路径
         self.target_button_path = "dd.PNG"
         
+        # 模板缓存，避免每次循环都重新读取和解码图片
+        self.template_cache = TemplateCache()
+        
         # 要输入的文本
         self.input_text = "继续你的使命"
         
@@ -46,15 +49,12 @@ class TraeIDEMonitor:
             screenshot_np = np.array(screenshot)
             screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
             
-            # 读取目标按钮图片
-            if not os.path.exists(self.target_button_path):
-                print(f"错误: 找不到目标按钮图片 {self.target_button_path}")
-                return None
-                
-            target_img = cv2.imread(self.target_button_path)
-            if target_img is None:
-                print(f"错误: 无法读取目标按钮图片 {self.target_button_path}")
+            # 从缓存获取目标按钮图片
+            template = self.template_cache.get(self.target_button_path)
+            if template is None:
+                print(f"错误: {self.template_cache.last_error}")
                 return None
+            target_img = template.bgr
             
             # 模板匹配
             result = cv2.matchTemplate(screenshot_cv, target_img, cv2.TM_CCOEFF_NORMED)
@@ -163,6 +163,7 @@ class TraeIDEMonitor:
                 
         except KeyboardInterrupt:
             print("\n监控已停止")
+            print(f"模板缓存统计: {self.template_cache.get_stats()}")
         except Exception as e:
             print(f"监控过程中发生错误: {e}")
 
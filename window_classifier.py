@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口标题分类器
+功能：把Trae识别规则、排除关键词和干扰窗口关键词编译成一个正则表达式，
+一次扫描标题即可得到全部命中的关键词，并按标题做 LRU 缓存
+窗口标题在监控循环之间基本不变，稳定运行时几乎所有分类都直接命中缓存
+"""
+
+import re
+from functools import lru_cache
+
+# 明显不是Trae的窗口
+DEFAULT_EXCLUDE_KEYWORDS = [
+    '命令提示符', 'cmd', 'powershell', 'terminal',
+    'chrome', 'firefox', 'edge', 'browser',
+    'explorer', 'notepad', 'word', 'excel',
+    'outlook', 'teams', 'zoom', 'skype'
+]
+
+# 典型的Trae IDE窗口标题格式
+DEFAULT_TRAE_INDICATORS = [
+    '- trae',  # 典型的Trae IDE窗口格式
+    'trae -',  # 另一种格式
+    'trae ide',  # 明确的IDE标识
+    '.py - trae',  # Python文件在Trae中打开
+    '.js - trae',  # JavaScript文件
+    '.md - trae',  # Markdown文件
+    '.json - trae',  # JSON文件
+    '.txt - trae',  # 文本文件
+]
+
+# 可能干扰Trae IDE激活的窗口
+DEFAULT_INTERFERING_KEYWORDS = ['chrome', 'firefox', 'edge', '浏览器', 'browser']
+
+
+class WindowTitleClassifier:
+    """
+    编译后的窗口标题分类器，所有关键词均不区分大小写
+
+    Args:
+        trae_indicators: 判定为Trae窗口的标题片段
+        exclude_keywords: 出现即不是Trae窗口的关键词
+        interfering_keywords: 判定为干扰窗口的关键词
+        cache_size: LRU 缓存的标题数量
+    """
+
+    TRAE = 'trae'
+    INTERFERING = 'interfering'
+    EXCLUDE = 'exclude'
+
+    def __init__(self, trae_indicators=None, exclude_keywords=None,
+                 interfering_keywords=None, cache_size=4096):
+        rules = {}
+        for category, keywords in (
+            (self.TRAE, trae_indicators or DEFAULT_TRAE_INDICATORS),
+            (self.EXCLUDE, exclude_keywords or DEFAULT_EXCLUDE_KEYWORDS),
+            (self.INTERFERING, interfering_keywords or DEFAULT_INTERFERING_KEYWORDS),
+        ):
+            for keyword in keywords:
+                rules.setdefault(keyword.lower(), set()).add(category)
+        self._rules = rules
+
+        # 前瞻断言让每个位置都尝试匹配，关键词互相重叠时也不会漏掉；长关键词优先
+        alternatives = sorted(rules, key=len, reverse=True)
+        self._pattern = re.compile('(?=(' + '|'.join(map(re.escape, alternatives)) + '))')
+
+        self.classify = lru_cache(maxsize=cache_size)(self._classify_uncached)
+
+    def _classify_uncached(self, window_title):
+        """
+        返回: 'trae'、'interfering' 或 None
+        """
+        categories = set()
+        for match in self._pattern.finditer(window_title.lower()):
+            categories |= self._rules[match.group(1)]
+
+        if self.TRAE in categories and self.EXCLUDE not in categories:
+            return self.TRAE
+        if self.INTERFERING in categories:
+            return self.INTERFERING
+        return None
+
+    def is_trae_window(self, window_title):
+        return self.classify(window_title) == self.TRAE
+
+    def get_stats(self):
+        """
+        返回缓存统计信息
+        """
+        info = self.classify.cache_info()
+        return {'cache_hits': info.hits, 'cache_misses': info.misses, 'cached_titles': info.currsize}
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口注册表
+功能：缓存顶层窗口的 句柄 → 标题/分类，避免每次都 EnumWindows 并对所有窗口重新做关键词判断
+- Windows 下通过 WinEvent 钩子（窗口创建/销毁/显示/隐藏/标题变化）增量更新
+- 没有钩子时按 TTL 定期重新枚举
+- 平台层可替换，FakeWindowPlatform 可在 Linux 上测试
+"""
+
+import logging
+import threading
+import time
+
+from metrics import NULL_METRICS
+
+log = logging.getLogger(__name__)
+
+
+class Win32WindowPlatform:
+    """
+    基于 pywin32 / ctypes 的 Windows 平台层
+    """
+
+    # WinEvent 常量
+    EVENT_OBJECT_CREATE = 0x8000
+    EVENT_OBJECT_DESTROY = 0x8001
+    EVENT_OBJECT_SHOW = 0x8002
+    EVENT_OBJECT_HIDE = 0x8003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WINEVENT_SKIPOWNPROCESS = 0x0002
+    OBJID_WINDOW = 0
+    GA_ROOT = 2
+    WM_QUIT = 0x0012
+
+    def __init__(self):
+        import win32gui
+        self._win32gui = win32gui
+        self._hook_thread = None
+        self._hook_thread_id = None
+
+    def enumerate_windows(self):
+        """
+        枚举所有可见且有标题的顶层窗口
+        返回: [(句柄, 标题), ...]
+        """
+        def enum_windows_callback(hwnd, windows):
+            if self._win32gui.IsWindowVisible(hwnd):
+                title = self._win32gui.GetWindowText(hwnd)
+                if title:
+                    windows.append((hwnd, title))
+            return True
+
+        windows = []
+        self._win32gui.EnumWindows(enum_windows_callback, windows)
+        return windows
+
+    def is_top_level(self, hwnd):
+        """
+        是否为顶层窗口（EnumWindows 只枚举顶层窗口，子窗口如 Electron 的 "Chrome Legacy Window" 不算）
+        """
+        import ctypes
+        from ctypes import wintypes
+
+        get_ancestor = ctypes.windll.user32.GetAncestor
+        get_ancestor.argtypes = (wintypes.HWND, wintypes.UINT)
+        get_ancestor.restype = wintypes.HWND
+        return get_ancestor(hwnd, self.GA_ROOT) == hwnd
+
+    def get_window_title(self, hwnd):
+        """
+        返回: 可见顶层窗口的标题；窗口不存在、不可见或不是顶层窗口时返回 None
+        """
+        try:
+            if not self._win32gui.IsWindow(hwnd) or not self._win32gui.IsWindowVisible(hwnd):
+                return None
+            if not self.is_top_level(hwnd):
+                return None
+            return self._win32gui.GetWindowText(hwnd) or None
+        except Exception:
+            return None
+
+    def start_event_hook(self, on_window_event):
+        """
+        在后台线程安装 WinEvent 钩子，窗口变化时调用 on_window_event(hwnd)
+        返回: 是否安装成功
+        """
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        started = threading.Event()
+        result = {'ok': False}
+
+        def callback(hook, event, hwnd, id_object, id_child, thread_id, timestamp):
+            # 只关心顶层窗口本身的事件，子窗口（有标题的子 HWND）的事件忽略
+            if hwnd and id_object == self.OBJID_WINDOW and id_child == 0 and self.is_top_level(hwnd):
+                on_window_event(hwnd)
+
+        def hook_thread():
+            # 回调对象必须在钩子存在期间保持引用
+            proc = WinEventProc(callback)
+            hook = user32.SetWinEventHook(
+                self.EVENT_OBJECT_CREATE, self.EVENT_OBJECT_NAMECHANGE, 0, proc, 0, 0,
+                self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS
+            )
+            self._hook_thread_id = kernel32.GetCurrentThreadId()
+            result['ok'] = bool(hook)
+            started.set()
+            if not hook:
+                return
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+            user32.UnhookWinEvent(hook)
+
+        self._hook_thread = threading.Thread(target=hook_thread, name="winevent-hook", daemon=True)
+        self._hook_thread.start()
+        started.wait(timeout=5)
+        return result['ok']
+
+    def stop_event_hook(self):
+        if self._hook_thread_id:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._hook_thread_id, self.WM_QUIT, 0, 0)
+            self._hook_thread_id = None
+        # 等待钩子线程退出消息循环并卸载钩子
+        if self._hook_thread:
+            self._hook_thread.join(timeout=2)
+            self._hook_thread = None
+
+
+class FakeWindowPlatform:
+    """
+    内存中的假平台层，用于测试
+    """
+
+    def __init__(self, windows=None, supports_events=False):
+        self.windows = dict(windows or {})
+        self.supports_events = supports_events
+        self.enumerations = 0
+        self._on_window_event = None
+
+    def enumerate_windows(self):
+        self.enumerations += 1
+        return list(self.windows.items())
+
+    def get_window_title(self, hwnd):
+        return self.windows.get(hwnd)
+
+    def start_event_hook(self, on_window_event):
+        if not self.supports_events:
+            return False
+        self._on_window_event = on_window_event
+        return True
+
+    def stop_event_hook(self):
+        self._on_window_event = None
+
+    def set_window(self, hwnd, title=None):
+        """
+        创建/修改窗口标题，title 为 None 表示关闭窗口，同时模拟 WinEvent 事件
+        """
+        if title is None:
+            self.windows.pop(hwnd, None)
+        else:
+            self.windows[hwnd] = title
+        if self._on_window_event:
+            self._on_window_event(hwnd)
+
+
+class WindowRegistry:
+    """
+    窗口注册表
+
+    Args:
+        platform: 平台层（Win32WindowPlatform 或 FakeWindowPlatform）
+        classifier: 根据标题返回分类（如 'trae'、'interfering'）或 None 的函数
+        ttl: 没有事件钩子时重新枚举的间隔（秒）
+        use_events: 是否尝试安装 WinEvent 钩子
+        event_rescan_interval: 有事件钩子时的兜底全量枚举间隔（秒）
+        metrics: 记录枚举窗口耗时的 MetricsRegistry
+    """
+
+    def __init__(self, platform, classifier, ttl=5.0, use_events=True, event_rescan_interval=300.0,
+                 metrics=NULL_METRICS):
+        self.platform = platform
+        self.metrics = metrics
+        self.classifier = classifier
+        self.ttl = ttl
+        self.event_rescan_interval = event_rescan_interval
+
+        self._windows = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_scan = None
+
+        self.events_enabled = False
+        if use_events:
+            try:
+                self.events_enabled = platform.start_event_hook(self._on_window_event)
+            except Exception as e:
+                log.warning("⚠️  无法安装窗口事件钩子，改为定期枚举: %s", e)
+
+        # 统计计数
+        self.full_scans = 0
+        self.incremental_updates = 0
+        self.classifications = 0
+
+    def _on_window_event(self, hwnd):
+        with self._lock:
+            self._dirty.add(hwnd)
+
+    def _classify(self, title):
+        self.classifications += 1
+        return self.classifier(title)
+
+    def refresh(self, force=False):
+        """
+        按需更新注册表：TTL 过期时全量枚举，否则只处理有事件的窗口
+        """
+        with self._refresh_lock:
+            self._refresh(force)
+
+    def _refresh(self, force):
+        now = time.monotonic()
+        rescan_interval = self.event_rescan_interval if self.events_enabled else self.ttl
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+
+        if force or self._last_scan is None or now - self._last_scan >= rescan_interval:
+            with self.metrics.step('enumerate_windows'):
+                self._full_scan()
+            self._last_scan = now
+            return
+
+        for hwnd in dirty:
+            self.incremental_updates += 1
+            title = self.platform.get_window_title(hwnd)
+            if title is None:
+                self._windows.pop(hwnd, None)
+                continue
+            cached = self._windows.get(hwnd)
+            if cached is None or cached[0] != title:
+                self._windows[hwnd] = (title, self._classify(title))
+
+    def _full_scan(self):
+        self.full_scans += 1
+        windows = {}
+        for hwnd, title in self.platform.enumerate_windows():
+            cached = self._windows.get(hwnd)
+            # 标题未变化的窗口沿用之前的分类结果
+            if cached is not None and cached[0] == title:
+                windows[hwnd] = cached
+            else:
+                windows[hwnd] = (title, self._classify(title))
+        self._windows = windows
+
+    def invalidate(self):
+        """
+        丢弃已缓存的窗口分类，下一次查询时重新枚举并分类（分类规则变化后使用）
+        """
+        with self._refresh_lock:
+            self._windows = {}
+            self._last_scan = None
+
+    def get_windows(self, category):
+        """
+        返回: 指定分类的窗口 [(句柄, 标题), ...]，按枚举顺序
+        """
+        with self._refresh_lock:
+            self._refresh(False)
+            return [(hwnd, title) for hwnd, (title, cat) in self._windows.items() if cat == category]
+
+    def close(self):
+        if self.events_enabled:
+            self.platform.stop_event_hook()
+            self.events_enabled = False
+
+    def get_stats(self):
+        """
+        返回注册表统计信息
+        """
+        return {
+            'windows': len(self._windows),
+            'events_enabled': self.events_enabled,
+            'full_scans': self.full_scans,
+            'incremental_updates': self.incremental_updates,
+            'classifications': self.classifications,
+        }
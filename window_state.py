@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单个Trae窗口的监控状态
+功能：多实例监控时，每个窗口独立保存上次命中的状态、各模板的ROI、画面变化基准、匹配分数统计和发送冷却时间
+"""
+
+import collections
+import threading
+import time
+
+from action_state import ActionState
+
+# 每个窗口保留的近似命中数量
+NEAR_MISS_WINDOW = 50
+
+
+class WindowState:
+    """
+    单个Trae窗口的监控状态
+
+    Args:
+        hwnd: 窗口句柄，单窗口模式下可以为 None
+        title: 窗口标题
+        roi_tracker_factory: 根据状态名称创建 ROITracker 的函数，每个模板使用独立的ROI
+        change_detector: 该窗口的 FrameChangeDetector，未启用时为 None
+    """
+
+    def __init__(self, hwnd, title, roi_tracker_factory, change_detector=None):
+        self.hwnd = hwnd
+        self.title = title
+        self.roi_tracker_factory = roi_tracker_factory
+        self.roi_trackers = {}
+        # 各状态模板上次命中的缩放比例，下次优先尝试
+        self.best_scales = {}
+        self.change_detector = change_detector
+
+        # 上次检测到的状态命中列表（已排序）
+        self.last_hits = []
+        self.last_frame_changed = False
+        self.cooldown_until = 0.0
+        # 最近一次发送成功的时间（time.time()），保存到状态快照中，重启后恢复冷却期
+        self.last_send_time = None
+        # 动作状态（idle/sending/awaiting_confirmation/cooldown），由 ActionGuard 推进
+        self.action = ActionState()
+        # 各状态模板命中时的匹配分数统计 {名称: {'count', 'mean', 'min', 'max'}}
+        self.score_stats = {}
+        # 最近一次规划搜索区域时的窗口区域 (x, y, w, h)，为 None 时表示整个屏幕
+        self.bounds = None
+        # 最近的近似命中 [(time.monotonic(), StateHit), ...]，发送确认后由 ActionGuard 标记为确认存在
+        self.near_misses = collections.deque(maxlen=NEAR_MISS_WINDOW)
+
+        # 流水线模式下检测线程与截图线程共享该状态
+        self.lock = threading.Lock()
+
+        # 统计计数
+        self.hits = 0
+        self.sends = 0
+
+    def get_roi_tracker(self, name):
+        """
+        获取指定状态模板的 ROITracker，首次使用时创建
+        """
+        tracker = self.roi_trackers.get(name)
+        if tracker is None:
+            tracker = self.roi_trackers[name] = self.roi_tracker_factory(name)
+        return tracker
+
+    def forget_templates(self, names=None):
+        """
+        丢弃指定状态模板（names 为 None 时为全部）的ROI和最佳缩放比例，并要求下一次重新匹配
+        用于模板或检测参数变化后，其余模板的ROI保持不变
+        """
+        for name in list(self.roi_trackers if names is None else names):
+            self.roi_trackers.pop(name, None)
+            self.best_scales.pop(name, None)
+        self.last_hits = []
+        self.near_misses.clear()
+        if self.change_detector:
+            self.change_detector.reset()
+
+    def record_scores(self, hits):
+        """
+        把本次命中的匹配分数计入各状态的统计
+        """
+        for hit in hits:
+            stats = self.score_stats.get(hit.name)
+            if stats is None:
+                self.score_stats[hit.name] = {'count': 1, 'mean': hit.score, 'min': hit.score, 'max': hit.score}
+                continue
+            stats['count'] += 1
+            stats['mean'] += (hit.score - stats['mean']) / stats['count']
+            stats['min'] = min(stats['min'], hit.score)
+            stats['max'] = max(stats['max'], hit.score)
+
+    def record_near_misses(self, hits, now=None):
+        """
+        记录本次检测的近似命中（调用方持有 self.lock）
+        """
+        now = time.monotonic() if now is None else now
+        self.near_misses.extend((now, hit) for hit in hits)
+
+    def take_near_misses(self, name, box, since, until):
+        """
+        取出 [since, until] 期间中心落在 box 内的指定状态的近似命中分数，
+        该状态的其余近似命中一并丢弃
+        返回: [分数, ...]
+        """
+        x, y, w, h = box
+        with self.lock:
+            scores = [hit.score for seen, hit in self.near_misses
+                      if hit.name == name and since <= seen <= until
+                      and x <= hit.position[0] < x + w and y <= hit.position[1] < y + h]
+            kept = [item for item in self.near_misses if item[1].name != name]
+            self.near_misses.clear()
+            self.near_misses.extend(kept)
+        return scores
+
+    def in_cooldown(self, now=None):
+        """
+        是否处于发送后的冷却期
+        """
+        now = time.monotonic() if now is None else now
+        return now < self.cooldown_until
+
+    def start_cooldown(self, seconds):
+        """
+        进入冷却期（发送确认成功后或重试等待），冷却期内不再检测该窗口
+        """
+        self.cooldown_until = time.monotonic() + seconds
+        if self.change_detector:
+            self.change_detector.reset()
+
+    def get_stats(self):
+        """
+        返回该窗口的统计信息
+        """
+        stats = {
+            'title': self.title,
+            'hits': self.hits,
+            'sends': self.sends,
+            'action': self.action.phase,
+            'best_scales': dict(self.best_scales),
+            'scores': {name: {key: round(value, 4) for key, value in stats.items()}
+                       for name, stats in self.score_stats.items()},
+            'roi': {name: tracker.get_stats() for name, tracker in self.roi_trackers.items()},
+        }
+        if self.change_detector:
+            stats['frame_change'] = self.change_detector.get_stats()
+        return stats